@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark : client LlmChat construit à chaque appel vs pool réutilisé.
+
+    python benchmark_llm_clients.py                  # coût de préparation, sans réseau
+    python benchmark_llm_clients.py --live 10        # + appels réels avec GEMINI_API_KEY_1
+
+Hors réseau, on mesure le coût de préparation de chaque tentative Gemini :
+- avant : `LlmChat(...)` + `.with_model(...)` + session uuid
+- après : emprunt d'un client déjà préparé + construction de son remplaçant
+  (session neuve) au retour. C'est le vrai coût par appel : le pool déplace la
+  construction après la réponse, il ne la supprime pas. Le temps avant l'envoi
+  (emprunt seul) est affiché à part.
+Avec --live, les deux variantes envoient le même prompt court et on compare la
+latence de bout en bout. On vérifie aussi que deux appels successifs sur un
+même emplacement du pool reçoivent deux clients distincts.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from llm_client_pool import LlmClientPool
+
+try:
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
+except ImportError:
+    LlmChat = UserMessage = None
+
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+MODEL = "gemini-2.0-flash-exp"
+SYSTEM_MESSAGE = "Tu es un expert biblique et théologien spécialisé dans l'étude des Écritures."
+LIVE_PROMPT = "Réponds uniquement par le mot: Amen"
+
+
+def build_fresh(api_key: str, session_id: str = None):
+    return LlmChat(
+        api_key=api_key,
+        session_id=session_id or f"generation-{uuid.uuid4()}",
+        system_message=SYSTEM_MESSAGE
+    ).with_model("gemini", MODEL)
+
+
+def summarize(label: str, samples_us):
+    ordered = sorted(samples_us)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{label:<28}{statistics.mean(samples_us):>12.1f}{statistics.median(samples_us):>12.1f}{p95:>12.1f}")
+    return statistics.mean(samples_us)
+
+
+async def bench_setup(api_key: str, iterations: int):
+    fresh = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        build_fresh(api_key)
+        fresh.append((time.perf_counter() - started) * 1e6)
+
+    pool = LlmClientPool(lambda key_index, session_id: build_fresh(api_key, session_id), 1, size=1)
+    pool.start()
+    pooled, before_send = [], []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        async with pool.client(0):
+            before_send.append((time.perf_counter() - started) * 1e6)
+        # Emprunt + remplaçant construit au retour : le coût complet d'un appel
+        pooled.append((time.perf_counter() - started) * 1e6)
+
+    print(f"\n{'préparation (µs)':<28}{'moyenne':>12}{'médiane':>12}{'p95':>12}")
+    before = summarize("LlmChat neuf par appel", fresh)
+    after = summarize("pool (emprunt + remplaçant)", pooled)
+    summarize("pool (avant l'envoi)", before_send)
+    print(f"➡️  Écart par appel: {before - after:+.1f} µs "
+          f"(la construction est déplacée après la réponse, pas supprimée)")
+
+
+async def bench_live(api_key: str, calls: int):
+    pool = LlmClientPool(lambda key_index, session_id: build_fresh(api_key, session_id), 1, size=1)
+    pool.start()
+    fresh, pooled = [], []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await build_fresh(api_key).send_message(UserMessage(text=LIVE_PROMPT))
+        fresh.append((time.perf_counter() - started) * 1e6)
+
+        started = time.perf_counter()
+        async with pool.client(0) as chat:
+            await chat.send_message(UserMessage(text=LIVE_PROMPT))
+        pooled.append((time.perf_counter() - started) * 1e6)
+
+    print(f"\n{'appel réel (µs)':<28}{'moyenne':>12}{'médiane':>12}{'p95':>12}")
+    summarize("LlmChat neuf par appel", fresh)
+    summarize("client du pool", pooled)
+
+    # Chaque emprunt doit recevoir un client et une session neufs
+    async with pool.client(0) as first:
+        pass
+    async with pool.client(0) as second:
+        pass
+    isolated = first is not second
+    print(f"🧹 Session neuve à chaque emprunt: {'oui' if isolated else 'NON'}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Coût par appel : LlmChat neuf vs pool de clients")
+    parser.add_argument("--iterations", type=int, default=2000, help="Itérations du benchmark hors réseau")
+    parser.add_argument("--live", type=int, default=0, help="Nombre d'appels réels par variante (0 = aucun)")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    if LlmChat is None:
+        print("❌ emergentintegrations non installé (pip install -r requirements.txt)")
+        return 2
+    api_key = os.environ.get('GEMINI_API_KEY_1', 'cle-factice-pour-le-benchmark')
+    await bench_setup(api_key, args.iterations)
+    if args.live:
+        if 'GEMINI_API_KEY_1' not in os.environ:
+            print("❌ --live nécessite GEMINI_API_KEY_1")
+            return 2
+        await bench_live(api_key, args.live)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,198 @@
+"""
+Client api.bible partagé (connexions HTTP/2 réutilisées).
+
+Avant, chaque fallback ouvrait un nouveau `httpx.AsyncClient` et demandait les
+versets un par un, en série. Ici :
+- un seul client longue durée pour tout le process (pool de connexions, HTTP/2)
+- une plage de versets est récupérée en UN appel `passages` (ex: GEN.1.1-GEN.1.31)
+- si l'appel groupé échoue, repli sur des appels par verset en parallèle,
+  bornés par un sémaphore
+- les textes récupérés sont gardés dans un cache mémoire : un fallback répété
+  sur le même passage ne touche plus le réseau
+"""
+
+import asyncio
+import logging
+import re
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from generation_cache import MemoryCache
+
+
+BIBLE_API_BASE_URL = "https://api.scripture.api.bible/v1"
+
+HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+VERSE_NUMBER_PATTERN = re.compile(r"\[(\d+)\]")
+
+
+class BibleApiQuotaError(Exception):
+    """HTTP 429 renvoyé par api.bible."""
+
+
+def http2_available() -> bool:
+    """HTTP/2 nécessite l'extra `httpx[http2]` (paquet h2)."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def split_numbered_passage(content: str) -> Dict[int, str]:
+    """Découpe un passage texte "[1] ... [2] ..." en {verset: texte}."""
+    content = HTML_TAG_PATTERN.sub("", content)
+    markers = list(VERSE_NUMBER_PATTERN.finditer(content))
+    verses = {}
+    for current, following in zip(markers, markers[1:] + [None]):
+        end = following.start() if following else len(content)
+        text = " ".join(content[current.end():end].split())
+        if text:
+            verses[int(current.group(1))] = text
+    return verses
+
+
+class BibleApiClient:
+    """Client api.bible mutualisé avec cache des textes de versets."""
+
+    def __init__(self, api_key: str, bible_id: str, max_concurrency: int = 8,
+                 verse_cache_bytes: int = 16 * 1024 * 1024, verse_cache_ttl: float = 7 * 24 * 3600):
+        self.api_key = api_key
+        self.bible_id = bible_id
+        self.http2 = http2_available()
+        if not self.http2:
+            logging.warning("⚠️  Paquet h2 absent: client api.bible en HTTP/1.1 (installer httpx[http2])")
+        self._client = httpx.AsyncClient(
+            base_url=BIBLE_API_BASE_URL,
+            headers={"api-key": api_key},
+            http2=self.http2,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=httpx.Timeout(10.0, connect=5.0),
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.verse_cache = MemoryCache(verse_cache_bytes, verse_cache_ttl)
+        self.requests = 0
+        self.passage_requests = 0
+        self.verse_requests = 0
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key and self.bible_id)
+
+    async def _get(self, path: str, **params) -> httpx.Response:
+        async with self._semaphore:
+            self.requests += 1
+            response = await self._client.get(f"/bibles/{self.bible_id}{path}", params=params or None)
+        if response.status_code == 429:
+            raise BibleApiQuotaError("Bible API quota également épuisé")
+        return response
+
+    # ----- Versets -----
+
+    async def _fetch_passage(self, book_id: str, chapter, start_verse: int, end_verse: int) -> Dict[int, str]:
+        self.passage_requests += 1
+        passage_id = f"{book_id}.{chapter}.{start_verse}-{book_id}.{chapter}.{end_verse}"
+        response = await self._get(
+            f"/passages/{passage_id}",
+            **{"content-type": "text", "include-verse-numbers": "true", "include-titles": "false"}
+        )
+        if response.status_code != 200:
+            return {}
+        return split_numbered_passage(response.json().get("data", {}).get("content", ""))
+
+    async def fetch_chapter(self, book_id: str, chapter) -> Dict[int, str]:
+        """{verset: texte} d'un chapitre entier (construction du corpus local)."""
+        response = await self._get(
+            f"/chapters/{book_id}.{chapter}",
+            **{"content-type": "text", "include-verse-numbers": "true", "include-titles": "false"}
+        )
+        if response.status_code != 200:
+            return {}
+        return split_numbered_passage(response.json().get("data", {}).get("content", ""))
+
+    async def _fetch_verse(self, book_id: str, chapter, verse_num: int) -> Optional[str]:
+        self.verse_requests += 1
+        response = await self._get(f"/verses/{book_id}.{chapter}.{verse_num}", **{"content-type": "text"})
+        if response.status_code != 200:
+            return None
+        content = response.json().get("data", {}).get("content", "")
+        return " ".join(HTML_TAG_PATTERN.sub("", content).split()) or None
+
+    async def fetch_verses(self, book_id: str, chapter, verse_numbers: Iterable[int]) -> Dict[int, Optional[str]]:
+        """
+        {verset: texte ou None}. Cache d'abord, puis un appel `passages` couvrant
+        les versets manquants, puis des appels par verset en parallèle pour le reste.
+        """
+        verse_numbers = sorted(set(int(v) for v in verse_numbers))
+        texts: Dict[int, Optional[str]] = {}
+        missing: List[int] = []
+        for verse_num in verse_numbers:
+            cached = self.verse_cache.get(f"{book_id}.{chapter}.{verse_num}")
+            if cached is not None:
+                texts[verse_num] = cached["text"]
+            else:
+                missing.append(verse_num)
+        if not missing:
+            return texts
+
+        fetched: Dict[int, str] = {}
+        if len(missing) > 1:
+            try:
+                passage = await self._fetch_passage(book_id, chapter, missing[0], missing[-1])
+                fetched.update({v: text for v, text in passage.items() if v in missing})
+            except httpx.HTTPError as e:
+                logging.warning(f"[BIBLE API] Appel passage en échec, repli par verset: {e}")
+
+        remaining = [verse_num for verse_num in missing if verse_num not in fetched]
+        if remaining:
+            results = await asyncio.gather(
+                *(self._fetch_verse(book_id, chapter, verse_num) for verse_num in remaining),
+                return_exceptions=True
+            )
+            for verse_num, result in zip(remaining, results):
+                if isinstance(result, BibleApiQuotaError):
+                    raise result
+                if isinstance(result, Exception):
+                    logging.error(f"Erreur récupération verset {verse_num}: {result}")
+                elif result:
+                    fetched[verse_num] = result
+
+        for verse_num in missing:
+            text = fetched.get(verse_num)
+            if text:
+                self.verse_cache.set(f"{book_id}.{chapter}.{verse_num}", {"text": text})
+            texts[verse_num] = text
+        return texts
+
+    # ----- Recherche et santé -----
+
+    async def search(self, query: str, limit: int = 10) -> List[dict]:
+        response = await self._get("/search", query=query, limit=limit)
+        response.raise_for_status()
+        return response.json().get("data", {}).get("verses", [])
+
+    async def check(self) -> dict:
+        """Sonde de santé (même format que les sondes Gemini)."""
+        try:
+            response = await self._get("")
+        except BibleApiQuotaError:
+            return {"is_available": False, "quota_used": 100, "error": "Quota épuisé"}
+        except Exception as e:
+            return {"is_available": False, "quota_used": 0, "error": str(e)[:100]}
+        if response.status_code == 200:
+            # Bible API généralement pas de quota strict
+            return {"is_available": True, "quota_used": 0, "error": None}
+        return {"is_available": False, "quota_used": 0, "error": f"HTTP {response.status_code}"}
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "http2": self.http2,
+            "requests": self.requests,
+            "passage_requests": self.passage_requests,
+            "verse_requests": self.verse_requests,
+            "verse_cache": self.verse_cache.stats(),
+        }
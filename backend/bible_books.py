@@ -0,0 +1,111 @@
+"""
+Table des 66 livres de la Bible (canon protestant, ordre Louis Segond).
+
+Chaque livre : identifiant USFM (celui de api.bible, ex: "GEN"), nom français
+Louis Segond, nom anglais et nombre de chapitres.
+"""
+
+import unicodedata
+from typing import Dict, NamedTuple, Optional
+
+
+class BibleBook(NamedTuple):
+    book_id: str
+    name_fr: str
+    name_en: str
+    chapters: int
+
+
+BIBLE_BOOKS = [
+    # Ancien Testament
+    BibleBook("GEN", "Genèse", "Genesis", 50),
+    BibleBook("EXO", "Exode", "Exodus", 40),
+    BibleBook("LEV", "Lévitique", "Leviticus", 27),
+    BibleBook("NUM", "Nombres", "Numbers", 36),
+    BibleBook("DEU", "Deutéronome", "Deuteronomy", 34),
+    BibleBook("JOS", "Josué", "Joshua", 24),
+    BibleBook("JDG", "Juges", "Judges", 21),
+    BibleBook("RUT", "Ruth", "Ruth", 4),
+    BibleBook("1SA", "1 Samuel", "1 Samuel", 31),
+    BibleBook("2SA", "2 Samuel", "2 Samuel", 24),
+    BibleBook("1KI", "1 Rois", "1 Kings", 22),
+    BibleBook("2KI", "2 Rois", "2 Kings", 25),
+    BibleBook("1CH", "1 Chroniques", "1 Chronicles", 29),
+    BibleBook("2CH", "2 Chroniques", "2 Chronicles", 36),
+    BibleBook("EZR", "Esdras", "Ezra", 10),
+    BibleBook("NEH", "Néhémie", "Nehemiah", 13),
+    BibleBook("EST", "Esther", "Esther", 10),
+    BibleBook("JOB", "Job", "Job", 42),
+    BibleBook("PSA", "Psaumes", "Psalms", 150),
+    BibleBook("PRO", "Proverbes", "Proverbs", 31),
+    BibleBook("ECC", "Ecclésiaste", "Ecclesiastes", 12),
+    BibleBook("SNG", "Cantique des Cantiques", "Song of Songs", 8),
+    BibleBook("ISA", "Ésaïe", "Isaiah", 66),
+    BibleBook("JER", "Jérémie", "Jeremiah", 52),
+    BibleBook("LAM", "Lamentations", "Lamentations", 5),
+    BibleBook("EZK", "Ézéchiel", "Ezekiel", 48),
+    BibleBook("DAN", "Daniel", "Daniel", 12),
+    BibleBook("HOS", "Osée", "Hosea", 14),
+    BibleBook("JOL", "Joël", "Joel", 3),
+    BibleBook("AMO", "Amos", "Amos", 9),
+    BibleBook("OBA", "Abdias", "Obadiah", 1),
+    BibleBook("JON", "Jonas", "Jonah", 4),
+    BibleBook("MIC", "Michée", "Micah", 7),
+    BibleBook("NAM", "Nahum", "Nahum", 3),
+    BibleBook("HAB", "Habacuc", "Habakkuk", 3),
+    BibleBook("ZEP", "Sophonie", "Zephaniah", 3),
+    BibleBook("HAG", "Aggée", "Haggai", 2),
+    BibleBook("ZEC", "Zacharie", "Zechariah", 14),
+    BibleBook("MAL", "Malachie", "Malachi", 4),
+    # Nouveau Testament
+    BibleBook("MAT", "Matthieu", "Matthew", 28),
+    BibleBook("MRK", "Marc", "Mark", 16),
+    BibleBook("LUK", "Luc", "Luke", 24),
+    BibleBook("JHN", "Jean", "John", 21),
+    BibleBook("ACT", "Actes", "Acts", 28),
+    BibleBook("ROM", "Romains", "Romans", 16),
+    BibleBook("1CO", "1 Corinthiens", "1 Corinthians", 16),
+    BibleBook("2CO", "2 Corinthiens", "2 Corinthians", 13),
+    BibleBook("GAL", "Galates", "Galatians", 6),
+    BibleBook("EPH", "Éphésiens", "Ephesians", 6),
+    BibleBook("PHP", "Philippiens", "Philippians", 4),
+    BibleBook("COL", "Colossiens", "Colossians", 4),
+    BibleBook("1TH", "1 Thessaloniciens", "1 Thessalonians", 5),
+    BibleBook("2TH", "2 Thessaloniciens", "2 Thessalonians", 3),
+    BibleBook("1TI", "1 Timothée", "1 Timothy", 6),
+    BibleBook("2TI", "2 Timothée", "2 Timothy", 4),
+    BibleBook("TIT", "Tite", "Titus", 3),
+    BibleBook("PHM", "Philémon", "Philemon", 1),
+    BibleBook("HEB", "Hébreux", "Hebrews", 13),
+    BibleBook("JAS", "Jacques", "James", 5),
+    BibleBook("1PE", "1 Pierre", "1 Peter", 5),
+    BibleBook("2PE", "2 Pierre", "2 Peter", 3),
+    BibleBook("1JN", "1 Jean", "1 John", 5),
+    BibleBook("2JN", "2 Jean", "2 John", 1),
+    BibleBook("3JN", "3 Jean", "3 John", 1),
+    BibleBook("JUD", "Jude", "Jude", 1),
+    BibleBook("REV", "Apocalypse", "Revelation", 22),
+]
+
+BOOKS_BY_ID: Dict[str, BibleBook] = {book.book_id: book for book in BIBLE_BOOKS}
+
+# Ordre canonique (0..65), utilisé pour trier les références
+BOOK_ORDER: Dict[str, int] = {book.book_id: index for index, book in enumerate(BIBLE_BOOKS)}
+
+
+def fold_name(name: str) -> str:
+    """Minuscules, sans accents ni espaces superflus ("Genèse " -> "genese")."""
+    decomposed = unicodedata.normalize("NFKD", name.strip().lower())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split())
+
+
+_BOOKS_BY_NAME: Dict[str, BibleBook] = {}
+for _book in BIBLE_BOOKS:
+    for _name in (_book.book_id, _book.name_fr, _book.name_en):
+        _BOOKS_BY_NAME.setdefault(fold_name(_name), _book)
+
+
+def find_book(name: str) -> Optional[BibleBook]:
+    """Retrouve un livre par son nom français, anglais ou son identifiant USFM."""
+    return _BOOKS_BY_NAME.get(fold_name(name))
@@ -0,0 +1,140 @@
+"""
+Corpus local Louis Segond, mappé en mémoire.
+
+Le fallback Bible API faisait une requête HTTPS par verset, en série. Ici le
+texte complet de la Bible est lu depuis un fichier local :
+- le fichier est ouvert avec `mmap` (les pages sont partagées entre workers et
+  chargées à la demande par l'OS)
+- un seul parcours au démarrage construit l'index (livre, chapitre, verset) ->
+  position du texte dans le fichier
+- un verset ou une plage de versets se lit ensuite en O(1) par verset, sans réseau
+
+Format du fichier (UTF-8, une ligne par verset, ordre canonique) :
+
+    GEN<TAB>1<TAB>1<TAB>Au commencement, Dieu créa les cieux et la terre.
+
+Le livre est l'identifiant USFM de `bible_books.BIBLE_BOOKS`. Les lignes vides
+ou commençant par `#` sont ignorées. Le fichier est produit par
+`build_lsg_corpus.py` (sources USFM ou api.bible).
+"""
+
+import logging
+import mmap
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bible_books import BOOKS_BY_ID
+
+
+class BibleCorpus:
+    """Index (livre, chapitre, verset) -> texte, au-dessus d'un fichier mappé en mémoire."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        # (livre, chapitre, verset) -> (début, fin) du texte dans le fichier
+        self._offsets: Dict[Tuple[str, int, int], Tuple[int, int]] = {}
+        # (livre, chapitre) -> dernier verset du chapitre
+        self._chapter_lengths: Dict[Tuple[str, int], int] = {}
+        self.load_seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self._mmap is not None
+
+    @classmethod
+    def load(cls, path: str) -> "BibleCorpus":
+        """Charge le corpus s'il existe ; sinon retourne un corpus vide (fallback réseau)."""
+        corpus = cls(path)
+        if not os.path.exists(path):
+            logging.warning(f"⚠️  Corpus Louis Segond absent ({path}), fallback réseau Bible API "
+                            f"(le construire avec build_lsg_corpus.py)")
+            return corpus
+        try:
+            corpus._open()
+        except (OSError, ValueError) as e:
+            corpus.close()
+            logging.error(f"❌ Corpus Louis Segond illisible ({path}): {e}")
+        return corpus
+
+    def _open(self):
+        started = time.perf_counter()
+        self._file = open(self.path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._build_index()
+        self.load_seconds = time.perf_counter() - started
+        logging.info(
+            f"📖 Corpus Louis Segond chargé: {len(self._offsets)} versets, "
+            f"{len(self._chapter_lengths)} chapitres en {self.load_seconds * 1000:.0f}ms"
+        )
+
+    def _build_index(self):
+        data = self._mmap
+        size = len(data)
+        position = 0
+        while position < size:
+            line_end = data.find(b"\n", position)
+            if line_end == -1:
+                line_end = size
+            if line_end > position and data[position:position + 1] != b"#":
+                # Seuls les trois premiers champs sont découpés, le texte reste dans le mmap
+                first = data.find(b"\t", position, line_end)
+                second = data.find(b"\t", first + 1, line_end)
+                third = data.find(b"\t", second + 1, line_end)
+                if third == -1:
+                    raise ValueError(f"ligne invalide à l'octet {position}")
+                book = data[position:first].decode("ascii")
+                chapter = int(data[first + 1:second])
+                verse = int(data[second + 1:third])
+                text_end = line_end - 1 if data[line_end - 1:line_end] == b"\r" else line_end
+                self._offsets[(book, chapter, verse)] = (third + 1, text_end)
+                if verse > self._chapter_lengths.get((book, chapter), 0):
+                    self._chapter_lengths[(book, chapter)] = verse
+            position = line_end + 1
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # ----- Lookups -----
+
+    def verse(self, book_id: str, chapter: int, verse: int) -> Optional[str]:
+        span = self._offsets.get((book_id, int(chapter), int(verse)))
+        if span is None:
+            return None
+        start, end = span
+        return self._mmap[start:end].decode("utf-8")
+
+    def chapter_length(self, book_id: str, chapter: int) -> int:
+        """Nombre de versets du chapitre (0 si absent du corpus)."""
+        return self._chapter_lengths.get((book_id, int(chapter)), 0)
+
+    def verse_range(self, book_id: str, chapter: int, start_verse: int, end_verse: int) -> Dict[int, Optional[str]]:
+        """{verset: texte} pour la plage demandée (None pour un verset absent du corpus)."""
+        return {
+            verse: self.verse(book_id, chapter, verse)
+            for verse in range(int(start_verse), int(end_verse) + 1)
+        }
+
+    def iter_verses(self) -> Iterator[Tuple[str, int, int, str]]:
+        """Parcourt tout le corpus : (livre, chapitre, verset, texte)."""
+        for (book, chapter, verse), (start, end) in self._offsets.items():
+            yield book, chapter, verse, self._mmap[start:end].decode("utf-8")
+
+    def stats(self) -> dict:
+        books: List[str] = sorted({book for book, _ in self._chapter_lengths})
+        return {
+            "available": self.available,
+            "path": self.path,
+            "verses": len(self._offsets),
+            "chapters": len(self._chapter_lengths),
+            "books": len(books),
+            "unknown_books": [book for book in books if book not in BOOKS_BY_ID],
+            "load_ms": round(self.load_seconds * 1000, 1),
+        }
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Construit le corpus local Louis Segond (`data/lsg.tsv`) lu par bible_corpus.py.
+
+    python build_lsg_corpus.py usfm fraLSG_usfm.zip     # archive (ou dossier) USFM, hors ligne
+    python build_lsg_corpus.py api-bible                # chapitre par chapitre via api.bible (BIBLE_API_KEY, BIBLE_ID)
+    python build_lsg_corpus.py check                    # vérifie le fichier produit
+
+Sources :
+- `usfm` : les fichiers USFM de la Louis Segond 1910 (domaine public), par
+  exemple l'archive USFM de la traduction `fraLSG` publiée par eBible.org. Un
+  fichier par livre (`\\id GEN`, `\\c 1`, `\\v 1 ...`) ; les notes, renvois,
+  titres et marqueurs de mise en forme sont retirés, seul le texte est gardé.
+- `api-bible` : la Bible configurée pour le fallback réseau (BIBLE_ID), un
+  appel `chapters` par chapitre (1189 appels, dans le quota gratuit du jour).
+
+Le fichier est écrit dans l'ordre canonique de `bible_books.BIBLE_BOOKS`, au
+format décrit dans bible_corpus.py, puis relu par `BibleCorpus` : la commande
+échoue si des livres ou des chapitres manquent. Les workers le chargent au
+prochain démarrage.
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from dotenv import load_dotenv
+
+from bible_books import BIBLE_BOOKS, BOOKS_BY_ID
+from bible_corpus import BibleCorpus
+
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+DEFAULT_OUTPUT = os.environ.get('LSG_CORPUS_PATH', str(ROOT_DIR / 'data' / 'lsg.tsv'))
+USFM_SUFFIXES = (".usfm", ".sfm", ".ptx")
+
+# Notes de bas de page, renvois et variantes : supprimés avec leur contenu
+USFM_NOTE_PATTERN = re.compile(r"\\(f|fe|x|ef|ex)\s.*?\\\1\*", re.DOTALL)
+# \w mot|lemma="..."\w* : on garde le mot
+USFM_ATTRIBUTES_PATTERN = re.compile(r"\|[^\\]*(?=\\[a-z0-9+]+\*)")
+USFM_MARKER_PATTERN = re.compile(r"\\\+?[a-z]+[0-9]*\*?")
+# Paragraphes (le texte continue le verset en cours) et lignes à ignorer (titres, en-têtes)
+USFM_SKIPPED_LINES = ("\\id", "\\ide", "\\h", "\\toc", "\\mt", "\\ms", "\\mr", "\\s", "\\sr", "\\r", "\\d",
+                      "\\cl", "\\cp", "\\sp", "\\rem", "\\usfm", "\\sts", "\\imt", "\\is", "\\ip", "\\ie")
+
+Verses = Dict[Tuple[str, int, int], str]
+
+
+def clean_usfm_text(text: str) -> str:
+    text = USFM_NOTE_PATTERN.sub("", text)
+    text = USFM_ATTRIBUTES_PATTERN.sub("", text)
+    text = USFM_MARKER_PATTERN.sub("", text)
+    return " ".join(text.split())
+
+
+def parse_usfm(content: str) -> Verses:
+    """{(livre, chapitre, verset): texte} d'un fichier USFM (un livre)."""
+    verses: Verses = {}
+    book_id = None
+    chapter = 0
+    current = None
+    for raw_line in content.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        marker = line.split(maxsplit=1)[0]
+        if marker == "\\id":
+            book_id = line.split()[1].upper() if len(line.split()) > 1 else None
+            continue
+        if marker == "\\c":
+            chapter = int(line.split()[1])
+            current = None
+            continue
+        if marker.rstrip("0123456789") in USFM_SKIPPED_LINES:
+            continue
+        # Un marqueur de paragraphe peut précéder le verset sur la même ligne (\p \v 1 ...)
+        for piece in re.split(r"(?=\\v\s)", line):
+            if piece.startswith("\\v "):
+                number, _, text = piece[3:].strip().partition(" ")
+                # Versets groupés ("1-2") : rattachés au premier
+                current = (book_id, chapter, int(re.match(r"\d+", number).group()))
+                verses[current] = text
+            elif current is not None and book_id:
+                verses[current] += " " + piece
+    return {key: cleaned for key, text in verses.items() if key[0] and (cleaned := clean_usfm_text(text))}
+
+
+def read_usfm_sources(path: str) -> Iterator[Tuple[str, str]]:
+    """(nom, contenu) de chaque fichier USFM d'une archive zip ou d'un dossier."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                if name.lower().endswith(USFM_SUFFIXES):
+                    yield name, archive.read(name).decode("utf-8-sig")
+        return
+    for file_path in sorted(Path(path).rglob("*")):
+        if file_path.suffix.lower() in USFM_SUFFIXES:
+            yield file_path.name, file_path.read_text(encoding="utf-8-sig")
+
+
+def load_usfm(path: str) -> Verses:
+    verses: Verses = {}
+    for name, content in read_usfm_sources(path):
+        parsed = parse_usfm(content)
+        books = {book for book, _, _ in parsed}
+        if books and books <= set(BOOKS_BY_ID):
+            verses.update(parsed)
+        elif books:
+            print(f"   ⏭️  {name}: livre hors canon ({', '.join(sorted(books))}), ignoré")
+    return verses
+
+
+async def load_api_bible(concurrency: int) -> Verses:
+    from bible_api_client import BibleApiClient
+
+    client = BibleApiClient(os.environ.get('BIBLE_API_KEY', ''), os.environ.get('BIBLE_ID', ''), concurrency)
+    if not client.configured:
+        raise SystemExit("❌ BIBLE_API_KEY et BIBLE_ID requis pour la source api-bible")
+    chapters = [(book.book_id, chapter) for book in BIBLE_BOOKS for chapter in range(1, book.chapters + 1)]
+    verses: Verses = {}
+    try:
+        for start in range(0, len(chapters), concurrency * 4):
+            batch = chapters[start:start + concurrency * 4]
+            results = await asyncio.gather(*(client.fetch_chapter(book_id, chapter) for book_id, chapter in batch))
+            for (book_id, chapter), texts in zip(batch, results):
+                verses.update({(book_id, chapter, verse): text for verse, text in texts.items()})
+            print(f"   📥 {start + len(batch)}/{len(chapters)} chapitres")
+    finally:
+        await client.aclose()
+    return verses
+
+
+def write_corpus(verses: Verses, output: str) -> int:
+    """Écrit le TSV dans l'ordre canonique (fichier temporaire puis renommage atomique)."""
+    order = {book.book_id: position for position, book in enumerate(BIBLE_BOOKS)}
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=Path(output).parent, suffix=".tmp")
+    with os.fdopen(handle, "w", encoding="utf-8", newline="\n") as out:
+        out.write("# Louis Segond 1910 — livre<TAB>chapitre<TAB>verset<TAB>texte\n")
+        for book_id, chapter, verse in sorted(verses, key=lambda key: (order[key[0]], key[1], key[2])):
+            text = verses[(book_id, chapter, verse)].replace("\t", " ").replace("\n", " ")
+            out.write(f"{book_id}\t{chapter}\t{verse}\t{text}\n")
+    os.replace(temp_path, output)
+    return len(verses)
+
+
+def check_corpus(path: str, books: Iterable = BIBLE_BOOKS) -> List[str]:
+    """Problèmes du corpus relu par BibleCorpus (liste vide : corpus complet)."""
+    corpus = BibleCorpus.load(path)
+    try:
+        if not corpus.available:
+            return [f"corpus illisible ou absent: {path}"]
+        problems = []
+        for book in books:
+            missing = [chapter for chapter in range(1, book.chapters + 1) if corpus.chapter_length(book.book_id, chapter) == 0]
+            if missing:
+                problems.append(f"{book.book_id}: {len(missing)} chapitre(s) manquant(s) (ex: {missing[0]})")
+        stats = corpus.stats()
+        if stats["unknown_books"]:
+            problems.append(f"livres inconnus: {', '.join(stats['unknown_books'])}")
+        print(f"📖 {stats['verses']} versets, {stats['chapters']} chapitres, {stats['books']} livres")
+        return problems
+    finally:
+        corpus.close()
+
+
+# ----- CLI -----
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Construit le corpus local Louis Segond (data/lsg.tsv)")
+    parser.add_argument("source", choices=("usfm", "api-bible", "check"))
+    parser.add_argument("path", nargs="?", help="Archive zip ou dossier USFM (source usfm)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Fichier TSV produit")
+    parser.add_argument("--concurrency", type=int, default=4, help="Appels api.bible simultanés")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.source != "check":
+        if args.source == "usfm":
+            if not args.path:
+                print("❌ Chemin de l'archive ou du dossier USFM requis")
+                return 2
+            verses = load_usfm(args.path)
+        else:
+            verses = await load_api_bible(args.concurrency)
+        if not verses:
+            print("❌ Aucun verset lu")
+            return 1
+        print(f"💾 {write_corpus(verses, args.output)} versets écrits dans {args.output}")
+
+    problems = check_corpus(args.output)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✅ Corpus complet : texte local, concordance et pré-génération verset par verset disponibles")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
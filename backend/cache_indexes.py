@@ -0,0 +1,97 @@
+"""
+Gestion des index MongoDB des collections de cache.
+
+Créés au démarrage du serveur (idempotent) :
+- index unique sur `cache_key` pour chaque collection de cache
+- index secondaires utilisés par les suppressions / filtres (`passage`, `rubrique_number`...)
+
+`index_usage_report` expose les statistiques `$indexStats` et le plan d'exécution
+d'une recherche par `cache_key`, pour vérifier qu'il n'y a plus de COLLSCAN.
+"""
+
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+
+CACHE_INDEXES: Dict[str, List[dict]] = {
+    "rubriques_cache": [
+        {"keys": [("cache_key", ASCENDING)], "name": "cache_key_unique", "unique": True},
+        {"keys": [("passage", ASCENDING), ("rubrique_number", ASCENDING)], "name": "passage_rubrique"},
+        {"keys": [("rubrique_number", ASCENDING)], "name": "rubrique_number"},
+    ],
+    "verses_cache": [
+        {"keys": [("cache_key", ASCENDING)], "name": "cache_key_unique", "unique": True},
+        {"keys": [("passage", ASCENDING), ("start_verse", ASCENDING)], "name": "passage_start_verse"},
+    ],
+    "character_history_cache": [
+        {"keys": [("cache_key", ASCENDING)], "name": "cache_key_unique", "unique": True},
+        {"keys": [("character_name", ASCENDING), ("mode", ASCENDING)], "name": "character_mode"},
+    ],
+}
+
+
+async def ensure_cache_indexes(db) -> Dict[str, List[str]]:
+    """
+    Crée les index manquants. Retourne {collection: [noms d'index créés/présents]}.
+    Si des doublons de `cache_key` empêchent l'index unique, un index non unique
+    est créé à la place (les lookups restent indexés) et un warning est loggé.
+    """
+    report = {}
+    for collection_name, specs in CACHE_INDEXES.items():
+        collection = getattr(db, collection_name)
+        names = []
+        for spec in specs:
+            try:
+                name = await collection.create_index(
+                    spec["keys"], name=spec["name"], unique=spec.get("unique", False), background=True
+                )
+            except (DuplicateKeyError, OperationFailure) as e:
+                if not spec.get("unique"):
+                    logging.error(f"❌ Index {collection_name}.{spec['name']} impossible: {e}")
+                    continue
+                logging.warning(
+                    f"⚠️  Doublons de cache_key dans {collection_name}, index non unique créé à la place: {e}"
+                )
+                name = await collection.create_index(
+                    spec["keys"], name=spec["name"].replace("_unique", ""), background=True
+                )
+            names.append(name)
+        report[collection_name] = names
+        logging.info(f"✅ Index {collection_name}: {', '.join(names)}")
+    return report
+
+
+def _winning_stage(plan: dict) -> str:
+    """Descend dans le plan gagnant jusqu'à l'étape d'accès (IXSCAN / COLLSCAN)."""
+    while plan:
+        if plan.get("stage") in ("IXSCAN", "COLLSCAN", "IDHACK", "EXPRESS_IXSCAN"):
+            return plan["stage"]
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return "UNKNOWN"
+
+
+async def index_usage_report(db) -> Dict[str, dict]:
+    """Statistiques d'utilisation des index + plan d'une recherche par cache_key."""
+    report = {}
+    for collection_name in CACHE_INDEXES:
+        collection = getattr(db, collection_name)
+        usage = {}
+        async for stat in collection.aggregate([{"$indexStats": {}}]):
+            usage[stat["name"]] = {
+                "ops": stat.get("accesses", {}).get("ops", 0),
+                "since": stat.get("accesses", {}).get("since").isoformat()
+                if stat.get("accesses", {}).get("since") else None,
+            }
+        explain = await collection.find({"cache_key": "__explain__"}).explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        # Moteur SBE (MongoDB >= 5) : le plan est imbriqué sous "queryPlan"
+        winning_plan = winning_plan.get("queryPlan", winning_plan)
+        report[collection_name] = {
+            "documents": await collection.estimated_document_count(),
+            "indexes": usage,
+            "cache_key_lookup_stage": _winning_stage(winning_plan),
+        }
+    return report
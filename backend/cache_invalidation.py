@@ -0,0 +1,323 @@
+"""
+Invalidation sélective et non bloquante des caches de génération.
+
+`/api/clear-rubriques-cache` faisait un `delete_many` synchrone sur toute la
+collection (ou un passage exact) : sur un gros cache, la requête bloquait et
+Mongo souffrait. Ici :
+- filtres : livre, plage de chapitres, numéro(s) de rubrique, modèle, version
+  de prompt ; au moins un filtre est obligatoire
+- la suppression tourne en tâche de fond, par lots parcourus dans l'ordre de
+  `cache_key` (index unique), avec une pause entre deux lots
+- l'avancement est enregistré dans `cache_invalidations` (consultable depuis
+  n'importe quel worker)
+- les entrées correspondantes sont retirées des caches mémoire : tout de suite
+  dans le worker qui lance la tâche, et au prochain passage du veilleur
+  (`watch_seconds`) dans les autres workers
+- les entrées antérieures à la normalisation (clé = passage brut, ex:
+  "Genèse 1_3") sont ramenées à leur clé canonique pour appliquer les filtres
+  livre/chapitres : sinon elles survivraient et `get_cached_rubriques` les
+  recopierait sous la clé canonique à la requête suivante
+"""
+
+import asyncio
+import logging
+import os
+import re
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from passage_normalizer import passage_cache_key
+
+
+# Clés canoniques : "GEN.1_3" (rubrique), "GEN.1.3-5_3" (sous-passage), "GEN.1_5_5" (verset)
+CACHE_KEY_PATTERN = re.compile(r"^(?P<book>[0-9A-Z]+)\.(?P<chapter>\d+)(?:[._]|$)")
+# Suffixe numérique d'une clé : "_3" (rubrique), "_1_5" (plage de versets)
+CACHE_KEY_SUFFIX_PATTERN = re.compile(r"(?:_\d+)+$")
+# Clés antérieures à la normalisation ("Genèse 1_3") : tout ce qui n'a pas la forme canonique
+LEGACY_KEY_QUERY = {"$not": re.compile(r"^[0-9A-Z]+\.")}
+
+# Filtres utilisables par collection
+SUPPORTED_FILTERS = {
+    "rubriques_cache": ("book_id", "chapter_from", "chapter_to", "rubrique_numbers", "model", "prompt_version",
+                        "passages"),
+    "verses_cache": ("book_id", "chapter_from", "chapter_to", "model", "prompt_version"),
+    "character_history_cache": ("model", "prompt_version"),
+}
+
+
+def canonical_cache_key(cache_key: str) -> str:
+    """Clé canonique d'une entrée, y compris écrite avant la normalisation ("Genèse 1_3" -> "GEN.1_3")."""
+    if CACHE_KEY_PATTERN.match(cache_key):
+        return cache_key
+    suffix = CACHE_KEY_SUFFIX_PATTERN.search(cache_key)
+    if suffix is None:
+        return passage_cache_key(cache_key)
+    return passage_cache_key(cache_key[:suffix.start()]) + suffix.group()
+
+
+class InvalidationFilter:
+    """Critères d'une invalidation, traduits en requête Mongo et en prédicat pour la mémoire."""
+
+    def __init__(self, book_id: Optional[str] = None, chapter_from: Optional[int] = None,
+                 chapter_to: Optional[int] = None, rubrique_numbers: Optional[List[int]] = None,
+                 model: Optional[str] = None, prompt_version: Optional[str] = None,
+                 passages: Optional[List[str]] = None):
+        self.book_id = book_id
+        self.chapter_from = chapter_from
+        self.chapter_to = chapter_to
+        self.rubrique_numbers = sorted(rubrique_numbers) if rubrique_numbers else None
+        self.model = model
+        self.prompt_version = prompt_version
+        # Champ `passage` exact (formes brute et canonique), pour /api/clear-rubriques-cache
+        self.passages = sorted(passages) if passages else None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "InvalidationFilter":
+        return cls(**{name: data.get(name) for name in SUPPORTED_FILTERS["rubriques_cache"]})
+
+    def as_dict(self) -> dict:
+        return {name: value for name, value in vars(self).items() if value is not None}
+
+    def validate(self, collections: List[str]) -> Optional[str]:
+        """Message d'erreur, ou None si le filtre est utilisable sur ces collections."""
+        active = self.as_dict()
+        if not active:
+            return "Au moins un filtre est requis (book, chapter_from/chapter_to, rubrique_number, model, prompt_version)"
+        if (self.chapter_from is not None or self.chapter_to is not None) and not self.book_id:
+            return "Une plage de chapitres nécessite un livre"
+        for collection in collections:
+            if collection not in SUPPORTED_FILTERS:
+                return f"Collection inconnue: {collection}"
+            unsupported = [name for name in active if name not in SUPPORTED_FILTERS[collection]]
+            if unsupported:
+                return f"Filtre(s) {', '.join(unsupported)} non applicable(s) à {collection}"
+        return None
+
+    @property
+    def has_chapter_range(self) -> bool:
+        return self.chapter_from is not None or self.chapter_to is not None
+
+    def mongo_query(self) -> dict:
+        """
+        Partie du filtre évaluée par Mongo (la plage de chapitres est vérifiée sur la clé).
+        Un filtre de livre relit aussi les clés non canoniques : leur livre n'est connu
+        qu'après analyse du passage (`matches_key`).
+        """
+        query = {}
+        if self.book_id:
+            # Préfixe ancré : parcours de l'index cache_key
+            query["$or"] = [
+                {"cache_key": {"$regex": f"^{re.escape(self.book_id)}\\."}},
+                {"cache_key": LEGACY_KEY_QUERY},
+            ]
+        if self.rubrique_numbers:
+            query["rubrique_number"] = {"$in": self.rubrique_numbers}
+        if self.model:
+            query["model"] = self.model
+        if self.prompt_version:
+            query["prompt_version"] = self.prompt_version
+        if self.passages:
+            query["passage"] = {"$in": self.passages}
+        return query
+
+    def matches_key(self, cache_key: str) -> bool:
+        if not self.book_id:
+            return True
+        match = CACHE_KEY_PATTERN.match(canonical_cache_key(cache_key or ""))
+        if match is None or match.group("book") != self.book_id:
+            return False
+        chapter = int(match.group("chapter"))
+        if self.chapter_from is not None and chapter < self.chapter_from:
+            return False
+        if self.chapter_to is not None and chapter > self.chapter_to:
+            return False
+        return True
+
+    def matches(self, doc: dict) -> bool:
+        """Prédicat équivalent pour les documents des caches mémoire."""
+        if self.rubrique_numbers and doc.get("rubrique_number") not in self.rubrique_numbers:
+            return False
+        if self.model and doc.get("model") != self.model:
+            return False
+        if self.prompt_version and doc.get("prompt_version") != self.prompt_version:
+            return False
+        if self.passages and doc.get("passage") not in self.passages:
+            return False
+        return self.matches_key(doc.get("cache_key", ""))
+
+
+def invalidation_view(task: dict) -> dict:
+    """Représentation publique d'une invalidation."""
+    return {
+        "invalidation_id": task["_id"],
+        "invalidation_status": task["status"],
+        "filter": task["filter"],
+        "collections": task["collections"],
+        "progress": task.get("progress", {}),
+        "created_at": task.get("created_at"),
+        "finished_at": task.get("finished_at"),
+        "error": task.get("error"),
+    }
+
+
+class CacheInvalidator:
+    """Lance les invalidations en arrière-plan et propage l'éviction mémoire entre workers."""
+
+    def __init__(self, collection, stores: Dict[str, object], batch_size: int = 200, pause_seconds: float = 0.2,
+                 watch_seconds: float = 5.0):
+        self.collection = collection
+        self.stores = stores
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.watch_seconds = watch_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._watcher: Optional[asyncio.Task] = None
+        self._watched_since = time.time()
+        self.started = 0
+        self.memory_evicted = 0
+
+    def evict_memory(self, invalidation_filter: InvalidationFilter, collections: List[str]) -> int:
+        evicted = sum(self.stores[name].evict(invalidation_filter.matches) for name in collections)
+        self.memory_evicted += evicted
+        return evicted
+
+    # ----- Lancement et suivi -----
+
+    async def start(self, invalidation_filter: InvalidationFilter, collections: List[str]) -> dict:
+        """Enregistre l'invalidation, vide la mémoire locale et lance la suppression Mongo en arrière-plan."""
+        now = time.time()
+        task = {
+            "_id": uuid.uuid4().hex,
+            "filter": invalidation_filter.as_dict(),
+            "collections": collections,
+            "status": "running",
+            "worker_id": self.worker_id,
+            "progress": {name: {"estimated": None, "scanned": 0, "deleted": 0} for name in collections},
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "updated_ts": now,
+        }
+        await self.collection.insert_one(task)
+        self.evict_memory(invalidation_filter, collections)
+        self._tasks[task["_id"]] = asyncio.ensure_future(self._run(task["_id"], invalidation_filter, collections))
+        self.started += 1
+        logging.info(f"🧹 Invalidation {task['_id']} lancée: {task['filter']} sur {', '.join(collections)}")
+        return task
+
+    async def record(self, invalidation_filter: InvalidationFilter, collections: List[str], deleted: Dict[str, int]) -> dict:
+        """
+        Enregistre une suppression déjà faite par l'appelant (ex: /api/clear-rubriques-cache) :
+        la mémoire locale est vidée tout de suite, celle des autres workers par leur veilleur.
+        Un filtre vide vide toute la mémoire des collections.
+        """
+        now = time.time()
+        task = {
+            "_id": uuid.uuid4().hex,
+            "filter": invalidation_filter.as_dict(),
+            "collections": collections,
+            "status": "done",
+            "worker_id": self.worker_id,
+            "progress": {name: {"estimated": deleted.get(name, 0), "scanned": deleted.get(name, 0),
+                                "deleted": deleted.get(name, 0)} for name in collections},
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "updated_ts": now,
+        }
+        self.evict_memory(invalidation_filter, collections)
+        await self.collection.insert_one(task)
+        return task
+
+    async def get(self, invalidation_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": invalidation_id})
+
+    async def recent(self, limit: int = 20) -> List[dict]:
+        return await self.collection.find({}).sort("updated_ts", -1).limit(limit).to_list(limit)
+
+    async def _progress(self, invalidation_id: str, fields: dict):
+        await self.collection.update_one({"_id": invalidation_id}, {"$set": {**fields, "updated_ts": time.time()}})
+
+    async def _run(self, invalidation_id: str, invalidation_filter: InvalidationFilter, collections: List[str]):
+        query = invalidation_filter.mongo_query()
+        try:
+            for name in collections:
+                store = self.stores[name]
+                estimated = await store.collection.count_documents(query)
+                await self._progress(invalidation_id, {f"progress.{name}.estimated": estimated})
+                scanned = deleted = 0
+                last_key = ""
+                while True:
+                    # Pagination sur cache_key : les documents hors plage de chapitres ne sont pas relus
+                    batch = await store.collection.find(
+                        {**query, "cache_key": {"$gt": last_key}},
+                        {"_id": 0, "cache_key": 1}
+                    ).sort("cache_key", 1).limit(self.batch_size).to_list(self.batch_size)
+                    if not batch:
+                        break
+                    last_key = batch[-1]["cache_key"]
+                    keys = [doc["cache_key"] for doc in batch if invalidation_filter.matches_key(doc["cache_key"])]
+                    if keys:
+                        result = await store.collection.delete_many({**query, "cache_key": {"$in": keys}})
+                        deleted += result.deleted_count
+                        for key in keys:
+                            store.memory.delete(key)
+                    scanned += len(batch)
+                    await self._progress(invalidation_id, {
+                        f"progress.{name}.scanned": scanned, f"progress.{name}.deleted": deleted
+                    })
+                    await asyncio.sleep(self.pause_seconds)
+                logging.info(f"🧹 Invalidation {invalidation_id}: {deleted} entrée(s) supprimée(s) de {name}")
+            # Entrées remises en mémoire pendant la suppression
+            self.evict_memory(invalidation_filter, collections)
+            await self._progress(invalidation_id, {
+                "status": "done", "finished_at": datetime.now(timezone.utc).isoformat()
+            })
+        except asyncio.CancelledError:
+            await self._progress(invalidation_id, {"status": "interrupted", "error": "Worker arrêté"})
+            raise
+        except Exception as e:
+            logging.error(f"❌ Invalidation {invalidation_id} en échec: {e}")
+            await self._progress(invalidation_id, {
+                "status": "failed", "error": str(e), "finished_at": datetime.now(timezone.utc).isoformat()
+            })
+        finally:
+            self._tasks.pop(invalidation_id, None)
+
+    # ----- Propagation aux autres workers -----
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.watch_seconds)
+            try:
+                since, self._watched_since = self._watched_since, time.time()
+                async for task in self.collection.find(
+                    {"updated_ts": {"$gte": since}, "worker_id": {"$ne": self.worker_id}}
+                ):
+                    self.evict_memory(InvalidationFilter.from_dict(task["filter"]), task["collections"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"⚠️  Suivi des invalidations de cache indisponible: {e}")
+
+    def start_watcher(self):
+        if self._watcher is None:
+            self._watcher = asyncio.ensure_future(self._watch())
+
+    async def stop(self):
+        tasks = list(self._tasks.values()) + ([self._watcher] if self._watcher else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._watcher = None
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "running": len(self._tasks),
+            "started": self.started,
+            "memory_evicted": self.memory_evicted,
+            "batch_size": self.batch_size,
+            "pause_seconds": self.pause_seconds,
+        }
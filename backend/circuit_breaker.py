@@ -0,0 +1,155 @@
+"""
+Disjoncteurs par clé Gemini (closed / open / half-open).
+
+Une clé en erreur persistante (clé révoquée, projet désactivé, 500 répétés)
+était réessayée à chaque passe de rotation, et chaque échec coûtait un aller-
+retour LLM complet. Ici :
+- closed : la clé est utilisée normalement ; les échecs consécutifs sont comptés
+  séparément pour les erreurs de quota et les erreurs "dures"
+- open : au-delà du seuil, la clé est écartée de l'ordre des clés, sans appel,
+  pendant `open_seconds` (plus court pour le quota, qui se rétablit seul)
+- half-open : à l'expiration, une seule requête de sonde est autorisée ; un
+  succès referme le disjoncteur, un échec le rouvre pour une durée doublée
+"""
+
+import time
+from typing import Dict, Optional
+
+from gemini_backoff import KeyUnavailable
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(KeyUnavailable):
+    """
+    La clé est écartée par son disjoncteur (ne compte pas comme un échec de la
+    clé) : le moteur de retry passe à la clé suivante sans pénalité ni tentative.
+    """
+
+
+class KeyCircuitBreaker:
+    def __init__(self, hard_threshold: int = 3, quota_threshold: int = 6, hard_open_seconds: float = 120.0,
+                 quota_open_seconds: float = 60.0, max_open_seconds: float = 1800.0):
+        self.hard_threshold = hard_threshold
+        self.quota_threshold = quota_threshold
+        self.hard_open_seconds = hard_open_seconds
+        self.quota_open_seconds = quota_open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state = CLOSED
+        self.hard_failures = 0
+        self.quota_failures = 0
+        self.opened_at = 0.0
+        self.open_seconds = 0.0
+        self.reopen_count = 0
+        self.probe_in_flight = False
+        self.last_reason: Optional[str] = None
+        self.times_opened = 0
+
+    def _refresh(self):
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+
+    def current_state(self) -> str:
+        self._refresh()
+        return self.state
+
+    def is_available(self) -> bool:
+        """Sans effet de bord : la clé peut-elle figurer dans l'ordre des clés ?"""
+        self._refresh()
+        return self.state == CLOSED or (self.state == HALF_OPEN and not self.probe_in_flight)
+
+    def acquire(self) -> bool:
+        """Juste avant l'appel : en half-open, réserve l'unique requête de sonde."""
+        self._refresh()
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def release(self):
+        """Appel annulé (perdant d'un hedge, client parti) : la sonde n'a rien appris."""
+        self.probe_in_flight = False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.hard_failures = 0
+        self.quota_failures = 0
+        self.reopen_count = 0
+        self.probe_in_flight = False
+
+    def record_failure(self, quota: bool, reason: str = ""):
+        self._refresh()
+        self.last_reason = reason[:160] or None
+        if self.state == HALF_OPEN:
+            # Sonde ratée : réouverture plus longue
+            self.reopen_count += 1
+            self._open(quota)
+            return
+        if quota:
+            self.quota_failures += 1
+        else:
+            self.hard_failures += 1
+        if self.hard_failures >= self.hard_threshold or self.quota_failures >= self.quota_threshold:
+            self._open(quota)
+
+    def _open(self, quota: bool):
+        base = self.quota_open_seconds if quota else self.hard_open_seconds
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.open_seconds = min(self.max_open_seconds, base * (2 ** self.reopen_count))
+        self.probe_in_flight = False
+        self.hard_failures = 0
+        self.quota_failures = 0
+        self.times_opened += 1
+
+    def snapshot(self) -> dict:
+        self._refresh()
+        remaining = self.open_seconds - (time.monotonic() - self.opened_at) if self.state == OPEN else 0.0
+        return {
+            "state": self.state,
+            "hard_failures": self.hard_failures,
+            "quota_failures": self.quota_failures,
+            "open_remaining_seconds": round(max(0.0, remaining), 1),
+            "times_opened": self.times_opened,
+            "last_reason": self.last_reason,
+        }
+
+
+class CircuitBreakers:
+    """Un disjoncteur par clé, mêmes seuils pour toutes."""
+
+    def __init__(self, key_count: int, **thresholds):
+        self.breakers: Dict[int, KeyCircuitBreaker] = {
+            key_index: KeyCircuitBreaker(**thresholds) for key_index in range(key_count)
+        }
+        self.skipped = 0
+
+    def is_available(self, key_index: int) -> bool:
+        return self.breakers[key_index].is_available()
+
+    def acquire(self, key_index: int) -> bool:
+        if self.breakers[key_index].acquire():
+            return True
+        self.skipped += 1
+        return False
+
+    def release(self, key_index: int):
+        self.breakers[key_index].release()
+
+    def record_success(self, key_index: int):
+        self.breakers[key_index].record_success()
+
+    def record_failure(self, key_index: int, quota: bool, reason: str = ""):
+        self.breakers[key_index].record_failure(quota, reason)
+
+    def state(self, key_index: int) -> str:
+        return self.breakers[key_index].current_state()
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {f"gemini_{key_index + 1}": breaker.snapshot() for key_index, breaker in self.breakers.items()}
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Dictionnaire zstd partagé du cache : entraînement et benchmark.
+
+    python compression_dictionary.py train                 # entraîne sur les caches Mongo et l'enregistre
+    python compression_dictionary.py benchmark             # taille stockée vs coût de décodage
+    python compression_dictionary.py benchmark --files 'exports/*.md'   # hors ligne, sur des fichiers
+
+Le benchmark sépare les échantillons (80 % pour entraîner un dictionnaire, 20 %
+pour mesurer) afin de ne pas mesurer le dictionnaire sur ses propres données, et
+compare zlib (référence stdlib), zstd sans dictionnaire et zstd avec dictionnaire
+à plusieurs niveaux : taille moyenne stockée, ratio, coût moyen d'encodage et de
+décodage par document, et taille projetée de chaque collection.
+
+Après `train`, redémarrer les workers : les nouvelles écritures utilisent le
+nouveau dictionnaire, les anciens restent chargés pour relire l'existant. Un
+worker pas encore redémarré charge le nouveau dictionnaire à la demande dès
+qu'il lit une entrée écrite avec lui.
+"""
+
+import argparse
+import asyncio
+import glob
+import os
+import random
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from content_codec import ContentCodec, sample_contents, train_dictionary, zstandard
+
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+CACHE_COLLECTIONS = ("rubriques_cache", "verses_cache", "character_history_cache")
+
+
+def open_db():
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    return client, client[os.environ['DB_NAME']]
+
+
+async def load_samples(db, per_collection: int, codec: ContentCodec) -> Dict[str, List[str]]:
+    """Échantillon aléatoire des contenus de chaque collection de cache ($sample)."""
+    samples = {}
+    for name in CACHE_COLLECTIONS:
+        docs = await db[name].aggregate([
+            {"$sample": {"size": per_collection}},
+            {"$project": {"_id": 0, "cache_key": 1, "content": 1, "content_z": 1, "content_dict_id": 1}},
+        ]).to_list(per_collection)
+        samples[name] = sample_contents(docs, codec)
+    return samples
+
+
+def load_files(pattern: str) -> Dict[str, List[str]]:
+    paths = sorted(glob.glob(pattern, recursive=True))
+    return {"fichiers": [Path(path).read_text(encoding="utf-8") for path in paths]}
+
+
+# ----- Benchmark -----
+
+def measure(name: str, docs: List[str], compress, decompress, repeat: int) -> dict:
+    raw = [doc.encode("utf-8") for doc in docs]
+    started = time.perf_counter()
+    stored = [compress(data) for data in raw]
+    encode_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for data in stored:
+            decompress(data)
+    decode_seconds = (time.perf_counter() - started) / repeat
+
+    raw_bytes = sum(len(data) for data in raw)
+    stored_bytes = sum(len(data) for data in stored)
+    return {
+        "method": name,
+        "avg_raw": raw_bytes / len(raw),
+        "avg_stored": stored_bytes / len(stored),
+        "ratio": raw_bytes / stored_bytes,
+        "encode_us": encode_seconds / len(raw) * 1e6,
+        "decode_us": decode_seconds / len(raw) * 1e6,
+    }
+
+
+def benchmark(samples: Dict[str, List[str]], dict_size: int, repeat: int, counts: Dict[str, int]):
+    everything = [doc for docs in samples.values() for doc in docs]
+    if len(everything) < 20:
+        print(f"❌ Trop peu d'échantillons ({len(everything)}) pour un benchmark significatif")
+        return 2
+    random.Random(42).shuffle(everything)
+    split = int(len(everything) * 0.8)
+    training, test = everything[:split], everything[split:]
+
+    methods = [
+        ("aucune", lambda data: data, lambda data: data),
+        ("zlib-6", lambda data: zlib.compress(data, 6), zlib.decompress),
+    ]
+    if zstandard is None:
+        print("⚠️  Paquet zstandard absent : seule la référence zlib est mesurée (pip install zstandard)")
+    else:
+        started = time.perf_counter()
+        dictionary = zstandard.ZstdCompressionDict(train_dictionary(training, dict_size))
+        print(f"📚 Dictionnaire de {len(dictionary.as_bytes()) // 1024} Ko entraîné sur {len(training)} documents "
+              f"en {time.perf_counter() - started:.1f}s, mesuré sur {len(test)} autres")
+        for level in (3, 12):
+            compressor = zstandard.ZstdCompressor(level=level)
+            methods.append((f"zstd-{level}", compressor.compress, zstandard.ZstdDecompressor().decompress))
+        for level in (3, 12, 19):
+            compressor = zstandard.ZstdCompressor(level=level, dict_data=dictionary)
+            decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+            methods.append((f"zstd-{level}+dict", compressor.compress, decompressor.decompress))
+
+    results = [measure(name, test, compress, decompress, repeat) for name, compress, decompress in methods]
+
+    print()
+    print(f"{'méthode':<16}{'octets/doc':>12}{'stocké/doc':>12}{'ratio':>8}{'encode µs':>12}{'décode µs':>12}")
+    for result in results:
+        print(f"{result['method']:<16}{result['avg_raw']:>12.0f}{result['avg_stored']:>12.0f}"
+              f"{result['ratio']:>8.2f}{result['encode_us']:>12.1f}{result['decode_us']:>12.1f}")
+
+    if counts:
+        baseline = results[0]["avg_raw"]
+        print()
+        print("📦 Taille projetée du markdown par collection :")
+        for name, count in counts.items():
+            line = ", ".join(
+                f"{result['method']} {count * result['avg_stored'] / 1024 ** 2:.1f} Mo"
+                for result in results
+            )
+            print(f"   {name} ({count} documents, {count * baseline / 1024 ** 2:.1f} Mo en clair): {line}")
+    return 0
+
+
+# ----- CLI -----
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Dictionnaire zstd partagé du cache de générations")
+    parser.add_argument("command", choices=("train", "benchmark"))
+    parser.add_argument("--samples", type=int, default=int(os.environ.get('ZSTD_DICT_SAMPLES', '2000')),
+                        help="Documents échantillonnés par collection")
+    parser.add_argument("--dict-size", type=int, default=112 * 1024, help="Taille du dictionnaire (octets)")
+    parser.add_argument("--files", default="", help="Motif glob de fichiers markdown (benchmark hors ligne)")
+    parser.add_argument("--repeat", type=int, default=5, help="Répétitions des décodages mesurés")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.files:
+        if args.command == "train":
+            print("❌ --files ne sert qu'au benchmark ; `train` entraîne sur les caches Mongo")
+            return 2
+        return benchmark(load_files(args.files), args.dict_size, args.repeat, {})
+
+    client, db = open_db()
+    try:
+        codec = ContentCodec()
+        await codec.load_dictionaries(db)
+        samples = await load_samples(db, args.samples, codec)
+        for name, docs in samples.items():
+            print(f"🔎 {name}: {len(docs)} documents échantillonnés")
+
+        if args.command == "benchmark":
+            counts = {name: await db[name].estimated_document_count() for name in CACHE_COLLECTIONS}
+            return benchmark(samples, args.dict_size, args.repeat, counts)
+
+        if zstandard is None:
+            print("❌ Paquet zstandard absent (pip install zstandard)")
+            return 2
+        everything = [doc for docs in samples.values() for doc in docs]
+        if len(everything) < 100:
+            print(f"❌ Trop peu de contenus en cache ({len(everything)}) pour entraîner un dictionnaire")
+            return 2
+        dict_id = await codec.store_dictionary(db, train_dictionary(everything, args.dict_size), len(everything))
+        print(f"✅ Dictionnaire {dict_id} enregistré ({len(everything)} documents) — redémarrer les workers")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,263 @@
+"""
+Moteur de concordance biblique : index inversé sur le corpus Louis Segond.
+
+- tokenisation française insensible aux accents et à la casse
+  ("Éternel", "eternel" et "ÉTERNEL" sont le même terme ; "l'homme" -> "l", "homme")
+- postings positionnels : pour chaque terme, les versets où il apparaît et ses
+  positions dans le verset, stockés dans des `array` compacts
+- requêtes : mots libres (tous requis), phrases exactes entre guillemets
+  ("pain de vie"), préfixes (`sanctifi*`)
+- classement BM25, pagination
+
+L'index est construit une fois au démarrage depuis `BibleCorpus.iter_verses()` ;
+une recherche ne fait ensuite aucun appel réseau.
+"""
+
+import heapq
+import logging
+import math
+import re
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+# Ligatures non décomposées par NFKD
+LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "Œ": "oe", "Æ": "ae"})
+
+# Mots outils ignorés dans les mots libres (conservés dans les phrases exactes)
+FRENCH_STOPWORDS = frozenset({
+    "a", "au", "aux", "c", "ce", "ces", "d", "dans", "de", "des", "du", "elle", "en", "et",
+    "il", "ils", "j", "je", "l", "la", "le", "les", "leur", "m", "ma", "mais", "me", "mes",
+    "n", "ne", "nous", "on", "ou", "par", "pas", "pour", "qu", "que", "qui", "s", "sa", "se",
+    "ses", "son", "sur", "t", "te", "tu", "un", "une", "vous", "y",
+})
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def fold_text(text: str) -> str:
+    """Minuscules sans accents ni ligatures ("Éternel" -> "eternel", "cœur" -> "coeur")."""
+    decomposed = unicodedata.normalize("NFKD", text.translate(LIGATURES).lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(fold_text(text))
+
+
+class _Postings:
+    """
+    Postings d'un terme : versets triés, positions à plat (offsets[i]..offsets[i+1])
+    et composante BM25 précalculée (tf normalisé par la longueur du verset).
+    """
+
+    __slots__ = ("doc_ids", "offsets", "positions", "impacts")
+
+    def __init__(self):
+        self.doc_ids = array("I")
+        self.offsets = array("I", [0])
+        self.positions = array("H")
+        self.impacts = array("f")
+
+    def add(self, doc_id: int, positions: List[int]):
+        self.doc_ids.append(doc_id)
+        self.positions.extend(positions)
+        self.offsets.append(len(self.positions))
+
+    def positions_of(self, doc_id: int) -> Optional[array]:
+        index = bisect_left(self.doc_ids, doc_id)
+        if index == len(self.doc_ids) or self.doc_ids[index] != doc_id:
+            return None
+        return self.positions[self.offsets[index]:self.offsets[index + 1]]
+
+
+class ConcordanceIndex:
+    """Index inversé positionnel des versets, classement BM25."""
+
+    def __init__(self):
+        self.refs: List[Tuple[str, int, int]] = []
+        self.texts: List[str] = []
+        self.doc_lengths = array("H")
+        self.average_length = 0.0
+        self._postings: Dict[str, _Postings] = {}
+        self._vocabulary: List[str] = []
+        self.build_seconds = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.refs)
+
+    def build(self, verses: Iterable[Tuple[str, int, int, str]]):
+        """Indexe les versets (livre, chapitre, verset, texte), dans l'ordre canonique."""
+        started = time.perf_counter()
+        refs, texts, lengths = [], [], array("H")
+        postings: Dict[str, _Postings] = {}
+        for doc_id, (book_id, chapter, verse, text) in enumerate(verses):
+            refs.append((book_id, chapter, verse))
+            texts.append(text)
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            term_positions: Dict[str, List[int]] = {}
+            for position, token in enumerate(tokens):
+                term_positions.setdefault(token, []).append(position)
+            for term, positions in term_positions.items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = _Postings()
+                entry.add(doc_id, positions)
+
+        average_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        length_norms = [BM25_K1 * (1 - BM25_B + BM25_B * length / average_length) for length in lengths]
+        for entry in postings.values():
+            offsets = entry.offsets
+            entry.impacts = array("f", (
+                (offsets[index + 1] - offsets[index]) * (BM25_K1 + 1)
+                / (offsets[index + 1] - offsets[index] + length_norms[doc_id])
+                for index, doc_id in enumerate(entry.doc_ids)
+            ))
+
+        self.refs, self.texts, self.doc_lengths = refs, texts, lengths
+        self.average_length = average_length
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+        self.build_seconds = time.perf_counter() - started
+        logging.info(
+            f"🔎 Index de concordance: {len(refs)} versets, {len(postings)} termes "
+            f"en {self.build_seconds:.2f}s"
+        )
+
+    # ----- Requêtes -----
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        start = bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _term_docs(self, terms: List[str]) -> Set[int]:
+        docs: Set[int] = set()
+        for term in terms:
+            entry = self._postings.get(term)
+            if entry is not None:
+                docs.update(entry.doc_ids)
+        return docs
+
+    def _phrase_matches(self, phrase: List[str], doc_id: int) -> bool:
+        term_positions = []
+        for term in phrase:
+            positions = self._postings[term].positions_of(doc_id)
+            if positions is None:
+                return False
+            term_positions.append(positions)
+        return any(
+            all(start + offset in term_positions[offset] for offset in range(1, len(phrase)))
+            for start in term_positions[0]
+        )
+
+    def _idf(self, term: str) -> float:
+        document_frequency = len(self._postings[term].doc_ids)
+        total = len(self.refs)
+        return math.log(1 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def _scores(self, candidates: Set[int], terms: List[str]) -> Dict[int, float]:
+        """Score BM25 des versets candidats, en un passage par liste de postings."""
+        scores = dict.fromkeys(candidates, 0.0)
+        for term in terms:
+            entry = self._postings[term]
+            idf = self._idf(term)
+            if len(candidates) * 8 < len(entry.doc_ids):
+                # Peu de candidats : recherche dichotomique dans les postings
+                for doc_id in candidates:
+                    index = bisect_left(entry.doc_ids, doc_id)
+                    if index < len(entry.doc_ids) and entry.doc_ids[index] == doc_id:
+                        scores[doc_id] += idf * entry.impacts[index]
+            else:
+                for doc_id, impact in zip(entry.doc_ids, entry.impacts):
+                    if doc_id in scores:
+                        scores[doc_id] += idf * impact
+        return scores
+
+    def parse_query(self, query: str) -> Tuple[List[List[str]], List[List[str]]]:
+        """
+        Retourne (phrases, groupes de mots libres).
+        Chaque groupe de mots libres est une liste d'alternatives (expansion d'un préfixe `mot*`).
+        """
+        phrases, words = [], []
+        for quoted, word in QUERY_PATTERN.findall(query):
+            if quoted:
+                tokens = tokenize(quoted)
+                if len(tokens) == 1:
+                    words.append([tokens[0]])
+                elif tokens:
+                    phrases.append(tokens)
+            elif word.endswith("*") and len(tokenize(word)) == 1:
+                prefix = tokenize(word)[0]
+                words.append(self._expand_prefix(prefix) or [prefix])
+            else:
+                words.extend([token] for token in tokenize(word))
+        meaningful = [group for group in words if not (len(group) == 1 and group[0] in FRENCH_STOPWORDS)]
+        if meaningful or phrases:
+            words = meaningful
+        return phrases, words
+
+    def search(self, query: str, page: int = 1, page_size: int = 20) -> dict:
+        """Versets contenant tous les mots et toutes les phrases, classés par BM25."""
+        phrases, word_groups = self.parse_query(query)
+        if not phrases and not word_groups:
+            return {"total": 0, "results": []}
+
+        if any(term not in self._postings for phrase in phrases for term in phrase):
+            return {"total": 0, "results": []}
+
+        # Intersection en partant de l'ensemble le plus petit
+        phrase_terms = list(dict.fromkeys(term for phrase in phrases for term in phrase))
+        candidate_sets = [self._term_docs(group) for group in word_groups]
+        candidate_sets += [self._term_docs([term]) for term in phrase_terms]
+        candidate_sets.sort(key=len)
+        candidates = candidate_sets[0]
+        for docs in candidate_sets[1:]:
+            candidates &= docs
+            if not candidates:
+                break
+
+        for phrase in phrases:
+            candidates = {doc_id for doc_id in candidates if self._phrase_matches(phrase, doc_id)}
+
+        scored_terms = [term for group in word_groups for term in group if term in self._postings]
+        scores = self._scores(candidates, list(dict.fromkeys(scored_terms + phrase_terms)))
+
+        page = max(1, page)
+        top = heapq.nsmallest(
+            page * page_size,
+            ((-score, doc_id) for doc_id, score in scores.items())
+        )
+        results = []
+        for negative_score, doc_id in top[(page - 1) * page_size:]:
+            book_id, chapter, verse = self.refs[doc_id]
+            results.append({
+                "book_id": book_id,
+                "chapter": chapter,
+                "verse": verse,
+                "text": self.texts[doc_id],
+                "score": round(-negative_score, 3),
+            })
+        return {"total": len(candidates), "results": results}
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "verses": len(self.refs),
+            "terms": len(self._postings),
+            "postings": sum(len(entry.doc_ids) for entry in self._postings.values()),
+            "build_seconds": round(self.build_seconds, 2),
+        }
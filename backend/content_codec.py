@@ -0,0 +1,223 @@
+"""
+Compression zstd du markdown généré, avec dictionnaire partagé.
+
+Une rubrique fait 900 à 1500 mots de markdown ; 28 rubriques × 1189 chapitres
+pèsent lourd dans le working set du cache WiredTiger. Les textes générés se
+ressemblent beaucoup (mêmes titres, mêmes formules, mêmes mots théologiques) :
+un dictionnaire zstd entraîné sur nos propres générations compresse bien mieux
+qu'un zstd "à froid" sur un document de quelques Ko.
+
+- écriture : `content` (str) -> `content_z` (bytes zstd) + `content_dict_id`
+- lecture : décompression transparente, la couche mémoire garde le texte clair
+- les dictionnaires sont stockés dans la collection `compression_dictionaries`
+  (tous les workers utilisent les mêmes) ; le plus récent sert à compresser,
+  les anciens restent chargés pour relire les documents déjà écrits
+- un document écrit avec un dictionnaire inconnu (entraîné après le démarrage
+  de ce worker, pendant un redémarrage progressif) charge ce dictionnaire à la
+  demande avant d'être traité comme un miss
+- `zstandard` est optionnel : sans lui, les documents sont écrits en clair et
+  une entrée compressée illisible est traitée comme un cache miss
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+DICTIONARIES_COLLECTION = "compression_dictionaries"
+
+# En dessous, l'en-tête zstd mange le gain
+MIN_COMPRESS_BYTES = 512
+
+# Dictionnaire introuvable dans Mongo : pas de nouvelle recherche avant ce délai
+MISSING_DICTIONARY_RETRY_SECONDS = 60.0
+
+
+def zstd_available() -> bool:
+    return zstandard is not None
+
+
+def train_dictionary(samples: Iterable[str], dict_size: int = 112 * 1024, level: int = 12) -> bytes:
+    """Entraîne un dictionnaire zstd sur des textes générés (plusieurs centaines d'échantillons conseillés)."""
+    if zstandard is None:
+        raise RuntimeError("Paquet zstandard absent (pip install zstandard)")
+    encoded = [sample.encode("utf-8") for sample in samples if sample]
+    return zstandard.train_dictionary(dict_size, encoded, level=level).as_bytes()
+
+
+class ContentCodec:
+    """Compresse/décompresse le champ `content` des documents de cache."""
+
+    def __init__(self, enabled: bool = True, level: int = 12):
+        self.enabled = enabled and zstandard is not None
+        self.level = level
+        self._compressor = None
+        self._decompressors: Dict[int, object] = {}
+        self._db = None
+        self._dictionary_lock = asyncio.Lock()
+        # dict_id -> instant (monotonic) de la dernière recherche infructueuse
+        self._missing_dictionaries: Dict[int, float] = {}
+        self.dict_id = 0
+        self.loaded_on_demand = 0
+        self.encoded = 0
+        self.decoded = 0
+        self.decode_failures = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        if enabled and zstandard is None:
+            logging.warning("⚠️  Paquet zstandard absent: cache stocké sans compression (pip install zstandard)")
+        if self.enabled:
+            self._compressor = zstandard.ZstdCompressor(level=level)
+            self._decompressors[0] = zstandard.ZstdDecompressor()
+
+    def add_dictionary(self, data: bytes, use_for_writes: bool = True) -> int:
+        """Charge un dictionnaire ; retourne son identifiant zstd."""
+        if zstandard is None:
+            return 0
+        dictionary = zstandard.ZstdCompressionDict(data)
+        dict_id = dictionary.dict_id()
+        self._decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        if use_for_writes and self.enabled:
+            self._compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary)
+            self.dict_id = dict_id
+        return dict_id
+
+    async def load_dictionaries(self, db) -> int:
+        """Charge tous les dictionnaires stockés ; le plus récent sert aux écritures."""
+        self._db = db
+        if zstandard is None:
+            return 0
+        count = 0
+        async for entry in db[DICTIONARIES_COLLECTION].find({}, {"_id": 0}).sort("created_at", 1):
+            self.add_dictionary(bytes(entry["data"]))
+            count += 1
+        if count:
+            logging.info(f"🗜️  {count} dictionnaire(s) zstd chargé(s), écriture avec le dictionnaire {self.dict_id}")
+        return count
+
+    async def load_dictionary(self, dict_id: int) -> bool:
+        """Charge depuis Mongo un dictionnaire absent de ce worker (lectures seulement)."""
+        if dict_id in self._decompressors:
+            return True
+        if zstandard is None or self._db is None:
+            return False
+        async with self._dictionary_lock:
+            if dict_id in self._decompressors:
+                return True
+            missing_since = self._missing_dictionaries.get(dict_id)
+            if missing_since is not None and time.monotonic() - missing_since < MISSING_DICTIONARY_RETRY_SECONDS:
+                return False
+            entry = await self._db[DICTIONARIES_COLLECTION].find_one({"dict_id": dict_id}, {"_id": 0, "data": 1})
+            if entry is None:
+                self._missing_dictionaries[dict_id] = time.monotonic()
+                return False
+            self._missing_dictionaries.pop(dict_id, None)
+            self.add_dictionary(bytes(entry["data"]), use_for_writes=False)
+            self.loaded_on_demand += 1
+            logging.info(f"🗜️  Dictionnaire zstd {dict_id} chargé à la demande (écrit par un worker plus récent)")
+            return True
+
+    async def store_dictionary(self, db, data: bytes, samples: int) -> int:
+        """Enregistre un nouveau dictionnaire (utilisé par tous les workers au prochain démarrage)."""
+        dict_id = self.add_dictionary(data)
+        await db[DICTIONARIES_COLLECTION].update_one(
+            {"dict_id": dict_id},
+            {"$set": {
+                "dict_id": dict_id,
+                "data": data,
+                "size": len(data),
+                "samples": samples,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            }},
+            upsert=True
+        )
+        return dict_id
+
+    # ----- Documents -----
+
+    def compress(self, text: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        raw = text.encode("utf-8")
+        if len(raw) < MIN_COMPRESS_BYTES:
+            return None
+        return self._compressor.compress(raw)
+
+    def decompress(self, data: bytes, dict_id: int = 0) -> str:
+        decompressor = self._decompressors.get(dict_id)
+        if decompressor is None:
+            raise LookupError(f"dictionnaire zstd {dict_id} non chargé")
+        return decompressor.decompress(bytes(data)).decode("utf-8")
+
+    def encode(self, doc: dict) -> dict:
+        """Document à écrire dans Mongo (`content` remplacé par `content_z` si la compression vaut le coup)."""
+        content = doc.get("content")
+        if not isinstance(content, str):
+            return doc
+        compressed = self.compress(content)
+        if compressed is None:
+            return doc
+        raw_size = len(content.encode("utf-8"))
+        if len(compressed) >= raw_size:
+            return doc
+        self.encoded += 1
+        self.raw_bytes += raw_size
+        self.stored_bytes += len(compressed)
+        encoded = {key: value for key, value in doc.items() if key != "content"}
+        encoded["content_z"] = compressed
+        encoded["content_dict_id"] = self.dict_id
+        return encoded
+
+    def decode(self, doc: dict) -> Optional[dict]:
+        """Document lu depuis Mongo avec `content` en clair ; None si illisible (traité comme un miss)."""
+        if "content_z" not in doc:
+            return doc
+        try:
+            content = self.decompress(doc["content_z"], doc.get("content_dict_id", 0))
+        except Exception as e:
+            self.decode_failures += 1
+            logging.warning(f"⚠️  Entrée de cache compressée illisible ({doc.get('cache_key')}): {e}")
+            return None
+        self.decoded += 1
+        decoded = {key: value for key, value in doc.items() if key not in ("content_z", "content_dict_id")}
+        decoded["content"] = content
+        return decoded
+
+    async def decode_loading(self, doc: dict) -> Optional[dict]:
+        """Comme `decode`, en chargeant d'abord un dictionnaire inconnu de ce worker."""
+        if "content_z" in doc:
+            dict_id = doc.get("content_dict_id", 0)
+            if dict_id not in self._decompressors:
+                await self.load_dictionary(dict_id)
+        return self.decode(doc)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "level": self.level,
+            "dict_id": self.dict_id,
+            "dictionaries": len(self._decompressors) - (1 if 0 in self._decompressors else 0),
+            "encoded": self.encoded,
+            "decoded": self.decoded,
+            "decode_failures": self.decode_failures,
+            "loaded_on_demand": self.loaded_on_demand,
+            "compression_ratio": round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else None,
+        }
+
+
+def sample_contents(docs: Iterable[dict], codec: Optional[ContentCodec] = None) -> List[str]:
+    """Textes en clair d'une liste de documents de cache (compressés ou non)."""
+    contents = []
+    for doc in docs:
+        if codec is not None:
+            doc = codec.decode(doc)
+        if doc and isinstance(doc.get("content"), str):
+            contents.append(doc["content"])
+    return contents
@@ -0,0 +1,339 @@
+"""
+Moteur de retry/backoff asynchrone pour les appels Gemini.
+
+Remplace l'ancien `time.sleep(1)` de `call_gemini_with_rotation`, qui bloquait
+toute la boucle d'événements uvicorn à chaque erreur de quota. Ici, toutes les
+attentes passent par `asyncio.sleep` :
+- délais exponentiels avec "full jitter" entre deux tentatives
+- cooldown par clé : une clé qui vient d'échouer est ignorée pendant un temps
+  croissant avec ses échecs consécutifs
+- statistiques de retry renvoyées à l'appelant (RetryStats)
+- hedging optionnel : si une tentative n'a pas répondu après `hedge_after`
+  secondes, une seconde requête part sur une autre clé ; la première réponse
+  réussie gagne, l'autre est annulée
+"""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+
+QUOTA_ERROR_MARKERS = ("quota", "rate_limit", "429", "resource_exhausted")
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Retourne True si l'exception correspond à un dépassement de quota Gemini."""
+    error_str = str(error).lower()
+    return any(marker in error_str for marker in QUOTA_ERROR_MARKERS)
+
+
+@dataclass
+class BackoffPolicy:
+    """Délais exponentiels avec full jitter : uniform(0, min(max, base * factor^n))."""
+    base_delay: float = 0.25
+    multiplier: float = 2.0
+    max_delay: float = 4.0
+
+    def compute_delay(self, retry_number: int) -> float:
+        ceiling = min(self.max_delay, self.base_delay * (self.multiplier ** retry_number))
+        return random.uniform(0, ceiling)
+
+
+class KeyCooldowns:
+    """
+    Cooldown par clé Gemini.
+    Chaque échec consécutif double la durée pendant laquelle la clé est ignorée.
+    Les erreurs de quota sont pénalisées plus longtemps que les autres erreurs.
+    """
+
+    def __init__(self, quota_cooldown: float = 30.0, error_cooldown: float = 5.0, max_cooldown: float = 600.0):
+        self.quota_cooldown = quota_cooldown
+        self.error_cooldown = error_cooldown
+        self.max_cooldown = max_cooldown
+        self._cooldown_until: Dict[int, float] = {}
+        self._consecutive_failures: Dict[int, int] = {}
+
+    def penalize(self, key_index: int, quota: bool) -> float:
+        """Met la clé en cooldown et retourne la durée appliquée (secondes)."""
+        failures = self._consecutive_failures.get(key_index, 0) + 1
+        self._consecutive_failures[key_index] = failures
+        base = self.quota_cooldown if quota else self.error_cooldown
+        duration = min(self.max_cooldown, base * (2 ** (failures - 1)))
+        # Jitter de ±20% pour éviter que toutes les clés reviennent en même temps
+        duration *= random.uniform(0.8, 1.2)
+        self._cooldown_until[key_index] = time.monotonic() + duration
+        return duration
+
+    def reset(self, key_index: int):
+        """Un succès remet la clé à zéro."""
+        self._consecutive_failures.pop(key_index, None)
+        self._cooldown_until.pop(key_index, None)
+
+    def extend(self, key_index: int, seconds: float):
+        """Prolonge le cooldown sans toucher au compteur d'échecs (pénalité vue par un autre worker)."""
+        until = time.monotonic() + seconds
+        if until > self._cooldown_until.get(key_index, 0.0):
+            self._cooldown_until[key_index] = until
+
+    def consecutive_failures(self, key_index: int) -> int:
+        return self._consecutive_failures.get(key_index, 0)
+
+    def remaining(self, key_index: int) -> float:
+        until = self._cooldown_until.get(key_index)
+        if until is None:
+            return 0.0
+        return max(0.0, until - time.monotonic())
+
+    def is_cooling(self, key_index: int) -> bool:
+        return self.remaining(key_index) > 0
+
+    def snapshot(self) -> Dict[int, dict]:
+        return {
+            key_index: {
+                "cooldown_remaining_seconds": round(self.remaining(key_index), 1),
+                "consecutive_failures": self._consecutive_failures.get(key_index, 0),
+            }
+            for key_index in set(self._cooldown_until) | set(self._consecutive_failures)
+        }
+
+
+@dataclass
+class RetryStats:
+    """Compteurs d'une exécution, renvoyés à l'appelant."""
+    attempts: int = 0
+    retries: int = 0
+    quota_errors: int = 0
+    other_errors: int = 0
+    keys_tried: List[int] = field(default_factory=list)
+    backoff_seconds: float = 0.0
+    key_index: Optional[int] = None
+    fallback_used: bool = False
+    hedges: int = 0
+    hedge_won: bool = False
+    keys_skipped: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "quota_errors": self.quota_errors,
+            "other_errors": self.other_errors,
+            "keys_tried": [i + 1 for i in self.keys_tried],
+            "backoff_seconds": round(self.backoff_seconds, 3),
+            "key_used": self.key_index + 1 if self.key_index is not None else None,
+            "fallback_used": self.fallback_used,
+            "hedges": self.hedges,
+            "hedge_won": self.hedge_won,
+            "keys_skipped": self.keys_skipped,
+        }
+
+
+class KeyUnavailable(Exception):
+    """
+    La clé a été écartée avant l'envoi (budget local ou partagé épuisé,
+    disjoncteur) : ce n'est ni un échec de la clé, ni une tentative.
+    """
+
+
+class RetriesExhausted(Exception):
+    """Toutes les tentatives ont échoué (ou toutes les clés sont en cooldown trop long)."""
+
+    def __init__(self, stats: RetryStats, last_error: Optional[Exception]):
+        super().__init__(str(last_error) if last_error else "Aucune clé Gemini disponible")
+        self.stats = stats
+        self.last_error = last_error
+
+
+class _AttemptFailed(Exception):
+    """Échec de la dernière tentative d'un appel hedgé, avec la clé concernée."""
+
+    def __init__(self, key_index: int, error: Exception):
+        super().__init__(str(error))
+        self.key_index = key_index
+        self.error = error
+
+
+class GeminiRetryEngine:
+    """
+    Exécute une tentative sur la première clé disponible (hors cooldown),
+    avec backoff non bloquant entre deux tentatives.
+
+    - `attempt(key_index)` : coroutine qui fait l'appel réel
+    - `key_order()` : ordre de préférence des clés (ex: rotation depuis la clé active)
+    - `on_error(key_index, error, quota)` : callback optionnel (logs, rotation)
+    - `retry_after()` : délai avant qu'une clé redevienne disponible quand
+      `key_order()` est vide (None = rien à attendre aujourd'hui)
+    - `hedge_after` : délai avant de doubler une tentative lente sur une autre
+      clé (None = pas de hedging) ; `may_hedge()` consomme le budget de hedging
+    """
+
+    def __init__(self, policy: Optional[BackoffPolicy] = None, cooldowns: Optional[KeyCooldowns] = None,
+                 max_cooldown_wait: float = 5.0):
+        self.policy = policy or BackoffPolicy()
+        self.cooldowns = cooldowns or KeyCooldowns()
+        # Si toutes les clés sont en cooldown, on attend au plus ce délai avant d'abandonner
+        self.max_cooldown_wait = max_cooldown_wait
+        self.total_calls = 0
+        self.total_retries = 0
+        self.total_quota_errors = 0
+        self.total_exhausted = 0
+        self.total_hedges = 0
+        self.total_hedge_wins = 0
+        self.total_keys_skipped = 0
+
+    def _pick_key(self, order: Sequence[int], tried: List[int]) -> Optional[int]:
+        available = [k for k in order if not self.cooldowns.is_cooling(k)]
+        if not available:
+            return None
+        # Préférer une clé pas encore essayée pendant cette exécution
+        for key_index in available:
+            if key_index not in tried:
+                return key_index
+        return available[0]
+
+    async def _record_failure(self, key_index: int, error: Exception, stats: RetryStats,
+                              on_error: Optional[Callable[[int, Exception, bool], Awaitable]]):
+        if isinstance(error, KeyUnavailable):
+            # Aucune requête n'est partie : ni pénalité, ni LED, ni rotation
+            return
+        quota = is_quota_error(error)
+        if quota:
+            stats.quota_errors += 1
+            self.total_quota_errors += 1
+        else:
+            stats.other_errors += 1
+        self.cooldowns.penalize(key_index, quota)
+        if on_error is not None:
+            await on_error(key_index, error, quota)
+
+    async def _hedged_attempt(self, attempt: Callable[[int], Awaitable], key_index: int,
+                              key_order: Callable[[], Sequence[int]], stats: RetryStats, hedge_after: float,
+                              may_hedge: Optional[Callable[[], bool]],
+                              on_error: Optional[Callable[[int, Exception, bool], Awaitable]]):
+        """
+        Tentative sur `key_index`, doublée sur une autre clé si elle n'a pas
+        répondu après `hedge_after` secondes. Retourne (résultat, clé gagnante) ;
+        lève _AttemptFailed si toutes les requêtes lancées ont échoué.
+        """
+        tasks = {asyncio.ensure_future(attempt(key_index)): key_index}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                candidates = [k for k in key_order() if k != key_index and k not in stats.keys_tried]
+                hedge_key = self._pick_key(candidates, stats.keys_tried)
+                if hedge_key is not None and (may_hedge is None or may_hedge()):
+                    logging.info(f"🪁 Clé Gemini #{key_index + 1} lente (> {hedge_after:.1f}s), "
+                                 f"requête doublée sur la clé #{hedge_key + 1}")
+                    stats.hedges += 1
+                    stats.attempts += 1
+                    stats.keys_tried.append(hedge_key)
+                    self.total_hedges += 1
+                    tasks[asyncio.ensure_future(attempt(hedge_key))] = hedge_key
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] != key_index:
+                            stats.hedge_won = True
+                            self.total_hedge_wins += 1
+                        return task.result(), tasks[task]
+                failed = list(done)
+                last = failed.pop() if not pending else None
+                for task in failed:
+                    # L'autre requête est toujours en course : cette clé est pénalisée tout de suite
+                    await self._record_failure(tasks[task], task.exception(), stats, on_error)
+                if last is not None:
+                    raise _AttemptFailed(tasks[last], last.exception())
+        finally:
+            # Perdant (ou appel annulé par le client) : la requête restante est abandonnée
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self, attempt: Callable[[int], Awaitable], key_order: Callable[[], Sequence[int]],
+                  max_attempts: int, on_error: Optional[Callable[[int, Exception, bool], Awaitable]] = None,
+                  retry_after: Optional[Callable[[], Optional[float]]] = None,
+                  hedge_after: Optional[float] = None, may_hedge: Optional[Callable[[], bool]] = None):
+        """
+        Retourne (résultat, RetryStats) ou lève RetriesExhausted.
+        Une clé refusée avant l'envoi (KeyUnavailable) est écartée jusqu'à la
+        prochaine attente, sans compter de tentative.
+        """
+        stats = RetryStats()
+        last_error: Optional[Exception] = None
+        skipped: List[int] = []
+        self.total_calls += 1
+
+        while stats.attempts < max_attempts:
+            order = [k for k in key_order() if k not in skipped]
+            key_index = self._pick_key(order, stats.keys_tried)
+
+            if key_index is None:
+                if order:
+                    wait = min(self.cooldowns.remaining(k) for k in order)
+                else:
+                    wait = retry_after() if retry_after is not None else None
+                    if skipped and not wait:
+                        # Clés refusées avant l'envoi et rien à attendre : inutile de reboucler
+                        break
+                if wait is None or wait > self.max_cooldown_wait:
+                    break
+                logging.info(f"⏳ Toutes les clés Gemini en cooldown, attente {wait:.1f}s (non bloquante)")
+                stats.backoff_seconds += wait
+                await asyncio.sleep(wait)
+                skipped.clear()
+                continue
+
+            stats.attempts += 1
+            stats.keys_tried.append(key_index)
+            try:
+                if hedge_after is None:
+                    result = await attempt(key_index)
+                else:
+                    result, key_index = await self._hedged_attempt(
+                        attempt, key_index, key_order, stats, hedge_after, may_hedge, on_error
+                    )
+                self.cooldowns.reset(key_index)
+                stats.key_index = key_index
+                return result, stats
+            except Exception as e:
+                if isinstance(e, _AttemptFailed):
+                    key_index, e = e.key_index, e.error
+                if isinstance(e, KeyUnavailable):
+                    stats.attempts -= 1
+                    stats.keys_tried.remove(key_index)
+                    stats.keys_skipped += 1
+                    self.total_keys_skipped += 1
+                    skipped.append(key_index)
+                    continue
+                last_error = e
+                await self._record_failure(key_index, e, stats, on_error)
+
+                if stats.attempts >= max_attempts:
+                    break
+                delay = self.policy.compute_delay(stats.retries)
+                stats.retries += 1
+                self.total_retries += 1
+                stats.backoff_seconds += delay
+                await asyncio.sleep(delay)
+
+        self.total_exhausted += 1
+        raise RetriesExhausted(stats, last_error)
+
+    def stats(self) -> dict:
+        return {
+            "total_calls": self.total_calls,
+            "total_retries": self.total_retries,
+            "total_quota_errors": self.total_quota_errors,
+            "total_exhausted": self.total_exhausted,
+            "total_hedges": self.total_hedges,
+            "total_hedge_wins": self.total_hedge_wins,
+            "total_keys_skipped": self.total_keys_skipped,
+            "cooldowns": self.cooldowns.snapshot(),
+        }
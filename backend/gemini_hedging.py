@@ -0,0 +1,115 @@
+"""
+Hedging des appels Gemini : réduction de la latence de queue.
+
+Une réponse lente sur une clé décidait seule de la latence d'un `generate_*`,
+la rotation n'intervenant qu'après une exception. Ici, par endpoint :
+- une fenêtre glissante des latences observées donne un p95 ; une tentative
+  qui dépasse ce délai est doublée sur une autre clé (GeminiRetryEngine)
+- un budget borne le quota supplémentaire : chaque appel crédite `percent` %
+  d'une requête, chaque requête doublée coûte une requête entière ; le hedging
+  ne dépasse donc jamais cette part des appels de l'endpoint
+- sans assez d'échantillons (démarrage), pas de hedging
+"""
+
+import math
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class LatencyWindow:
+    """Dernières latences d'un endpoint (secondes)."""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+class HedgeBudget:
+    """Crédit de requêtes doublées : `percent` % de requête par appel, au plus `burst` en réserve."""
+
+    def __init__(self, percent: int, burst: float = 3.0):
+        self.percent = percent
+        self.burst = burst
+        self.credit = 0.0
+        self.calls = 0
+        self.hedges = 0
+        self.denied = 0
+
+    def record_call(self):
+        self.calls += 1
+        self.credit = min(self.burst, self.credit + self.percent / 100.0)
+
+    def try_spend(self) -> bool:
+        if self.credit >= 1.0:
+            self.credit -= 1.0
+            self.hedges += 1
+            return True
+        self.denied += 1
+        return False
+
+
+class HedgingPolicy:
+    """Délai de hedging (p95) et budget de quota supplémentaire, par endpoint."""
+
+    def __init__(self, budgets: Dict[str, int], enabled: bool = True, quantile: float = 0.95,
+                 min_samples: int = 20, min_delay: float = 2.0, max_delay: float = 60.0, window: int = 200):
+        self.enabled = enabled
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.budgets = {endpoint: HedgeBudget(percent) for endpoint, percent in budgets.items()}
+        self.latencies = {endpoint: LatencyWindow(window) for endpoint in budgets}
+
+    def observe(self, endpoint: Optional[str], seconds: float):
+        if endpoint in self.latencies:
+            self.latencies[endpoint].observe(seconds)
+
+    def hedge_after(self, endpoint: Optional[str]) -> Optional[float]:
+        """Délai avant de doubler une tentative (None = pas de hedging pour cet appel)."""
+        budget = self.budgets.get(endpoint)
+        if not self.enabled or budget is None or budget.percent <= 0:
+            return None
+        latencies = self.latencies[endpoint]
+        if len(latencies) < self.min_samples:
+            return None
+        return min(self.max_delay, max(self.min_delay, latencies.quantile(self.quantile)))
+
+    def start_call(self, endpoint: Optional[str]):
+        """Un appel de l'endpoint crédite son budget de hedging."""
+        if endpoint in self.budgets:
+            self.budgets[endpoint].record_call()
+
+    def may_hedge(self, endpoint: Optional[str]) -> bool:
+        budget = self.budgets.get(endpoint)
+        return budget is not None and budget.try_spend()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "quantile": self.quantile,
+            "endpoints": {
+                endpoint: {
+                    "budget_percent": budget.percent,
+                    "samples": len(self.latencies[endpoint]),
+                    "hedge_after_seconds": (
+                        round(self.hedge_after(endpoint), 2) if self.hedge_after(endpoint) is not None else None
+                    ),
+                    "calls": budget.calls,
+                    "hedges": budget.hedges,
+                    "denied": budget.denied,
+                }
+                for endpoint, budget in self.budgets.items()
+            },
+        }
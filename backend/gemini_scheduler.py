@@ -0,0 +1,155 @@
+"""
+Ordonnanceur des clés Gemini basé sur des token buckets.
+
+Chaque clé possède :
+- un bucket "requêtes par minute" (capacité = RPM, rechargé en continu)
+- un budget quotidien (remis à zéro à minuit heure du Pacifique, comme les quotas Google)
+
+Chaque appel est envoyé à la clé qui a le plus de marge (headroom), et les clés
+dont on sait déjà qu'elles sont épuisées ne sont plus essayées : on n'attend plus
+un 429 pour les écarter.
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+
+QUOTA_RESET_TIMEZONE = ZoneInfo("America/Los_Angeles")
+DAILY_QUOTA_MARKERS = ("per day", "perday", "daily")
+
+
+class TokenBucket:
+    """Bucket à recharge continue : `rate` jetons par seconde, jusqu'à `capacity`."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def try_consume(self, amount: float = 1.0) -> bool:
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    def refund(self, amount: float = 1.0):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self):
+        self._refill()
+        self.tokens = 0.0
+
+    def seconds_until(self, amount: float = 1.0) -> float:
+        self._refill()
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+
+def _quota_day() -> str:
+    return datetime.now(QUOTA_RESET_TIMEZONE).date().isoformat()
+
+
+class GeminiKeyScheduler:
+    """Choisit la clé avec le plus de marge (RPM et budget quotidien)."""
+
+    def __init__(self, key_count: int, requests_per_minute: int = 15, daily_budget: int = 50):
+        self.key_count = key_count
+        self.requests_per_minute = requests_per_minute
+        self.daily_budget = daily_budget
+        self.buckets = [TokenBucket(requests_per_minute, requests_per_minute / 60.0) for _ in range(key_count)]
+        self.daily_used: Dict[int, int] = {i: 0 for i in range(key_count)}
+        self.daily_exhausted: Dict[int, bool] = {i: False for i in range(key_count)}
+        self.quota_day = _quota_day()
+
+    def _roll_day(self):
+        today = _quota_day()
+        if today != self.quota_day:
+            self.quota_day = today
+            self.daily_used = {i: 0 for i in range(self.key_count)}
+            self.daily_exhausted = {i: False for i in range(self.key_count)}
+
+    def current_day(self) -> str:
+        """Jour de quota courant (fuseau de remise à zéro de Google)."""
+        self._roll_day()
+        return self.quota_day
+
+    def daily_remaining(self, key_index: int) -> int:
+        self._roll_day()
+        if self.daily_exhausted[key_index]:
+            return 0
+        return max(0, self.daily_budget - self.daily_used[key_index])
+
+    def headroom(self, key_index: int) -> float:
+        """Marge entre 0 et 1 : le minimum entre le bucket RPM et le budget du jour."""
+        rpm_ratio = self.buckets[key_index].available() / self.requests_per_minute
+        daily_ratio = self.daily_remaining(key_index) / self.daily_budget if self.daily_budget else 0.0
+        return min(rpm_ratio, daily_ratio)
+
+    def is_available(self, key_index: int) -> bool:
+        return self.daily_remaining(key_index) > 0 and self.buckets[key_index].available() >= 1.0
+
+    def ordered_keys(self, preferred: int = 0) -> List[int]:
+        """
+        Clés disponibles triées par marge décroissante.
+        À marge égale, on garde l'ordre de rotation à partir de `preferred`.
+        """
+        rotation = [(preferred + i) % self.key_count for i in range(self.key_count)]
+        available = [k for k in rotation if self.is_available(k)]
+        return sorted(available, key=lambda k: -self.headroom(k))
+
+    def reserve(self, key_index: int) -> bool:
+        """Consomme un jeton et une unité de budget quotidien avant l'appel."""
+        if self.daily_remaining(key_index) <= 0:
+            return False
+        if not self.buckets[key_index].try_consume():
+            return False
+        self.daily_used[key_index] += 1
+        return True
+
+    def refund(self, key_index: int):
+        """Rend le jeton et l'unité de budget d'une réservation refusée par une barrière suivante."""
+        self.buckets[key_index].refund()
+        self.daily_used[key_index] = max(0, self.daily_used[key_index] - 1)
+
+    def record_quota_error(self, key_index: int, error: Optional[Exception] = None):
+        """Un 429 vide le bucket RPM ; un quota journalier marque la clé épuisée jusqu'à demain."""
+        self.buckets[key_index].drain()
+        error_str = str(error).lower() if error else ""
+        if any(marker in error_str for marker in DAILY_QUOTA_MARKERS):
+            self._roll_day()
+            self.daily_exhausted[key_index] = True
+
+    def seconds_until_available(self, keys: Optional[Iterable[int]] = None) -> Optional[float]:
+        """Délai avant qu'une clé (parmi `keys`) récupère un jeton (None si toutes épuisées pour la journée)."""
+        waits = [
+            self.buckets[k].seconds_until()
+            for k in (range(self.key_count) if keys is None else keys)
+            if self.daily_remaining(k) > 0
+        ]
+        return min(waits) if waits else None
+
+    def snapshot(self) -> Dict[int, dict]:
+        return {
+            key_index: {
+                "rpm_tokens": round(self.buckets[key_index].available(), 2),
+                "daily_used": self.daily_used[key_index],
+                "daily_remaining": self.daily_remaining(key_index),
+                "headroom": round(self.headroom(key_index), 3),
+            }
+            for key_index in range(self.key_count)
+        }
@@ -0,0 +1,107 @@
+"""
+Streaming Gemini (API REST `streamGenerateContent?alt=sse`) et helpers SSE.
+
+`LlmChat.send_message` attend la réponse complète. Pour les endpoints de
+streaming, on appelle directement l'API REST de Gemini avec les mêmes clés,
+et les morceaux de texte sont relayés au client dès leur arrivée.
+`check_gemini_model` (models.get) valide une clé sans génération, donc sans
+consommer de quota : c'est la sonde de santé des clés.
+"""
+
+import json
+import re
+from typing import AsyncIterator, Iterator, List, Tuple
+
+import httpx
+
+
+GEMINI_STREAM_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent"
+GEMINI_MODEL_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}"
+
+VERSE_HEADER_PATTERN = re.compile(r"\*\*VERSET\s+(\d+)\*\*")
+
+
+class GeminiStreamError(Exception):
+    """Erreur HTTP renvoyée par l'API de streaming (le message contient le code, ex: 429)."""
+
+
+def redact_key(message: str, api_key: str) -> str:
+    """Retire la clé d'un message d'erreur (il finit dans last_error, les logs et les LED)."""
+    return message.replace(api_key, "***") if api_key else message
+
+
+async def stream_gemini_text(client: httpx.AsyncClient, api_key: str, prompt: str,
+                             system_message: str, model: str) -> AsyncIterator[str]:
+    """Produit les morceaux de texte de la réponse Gemini au fil de l'eau."""
+    body = {
+        "systemInstruction": {"parts": [{"text": system_message}]},
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+    }
+    try:
+        # Clé dans l'en-tête : httpx journalise l'URL complète de chaque requête au niveau INFO
+        async with client.stream(
+            "POST",
+            GEMINI_STREAM_URL.format(model=model),
+            params={"alt": "sse"},
+            headers={"x-goog-api-key": api_key},
+            json=body,
+        ) as response:
+            if response.status_code >= 400:
+                detail = (await response.aread()).decode("utf-8", errors="replace")[:300]
+                raise GeminiStreamError(f"HTTP {response.status_code}: {redact_key(detail, api_key)}")
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = json.loads(line[len("data:"):].strip())
+                for candidate in payload.get("candidates", []):
+                    for part in candidate.get("content", {}).get("parts", []):
+                        text = part.get("text")
+                        if text:
+                            yield text
+    except httpx.HTTPError as e:
+        raise GeminiStreamError(f"{type(e).__name__}: {redact_key(str(e), api_key)}") from None
+
+
+async def check_gemini_model(client: httpx.AsyncClient, api_key: str, model: str) -> dict:
+    """Métadonnées du modèle (models.get) : lève GeminiStreamError si la clé est refusée."""
+    try:
+        response = await client.get(GEMINI_MODEL_URL.format(model=model), headers={"x-goog-api-key": api_key})
+    except httpx.HTTPError as e:
+        raise GeminiStreamError(f"{type(e).__name__}: {redact_key(str(e), api_key)}") from None
+    if response.status_code >= 400:
+        raise GeminiStreamError(f"HTTP {response.status_code}: {redact_key(response.text[:300], api_key)}")
+    return response.json()
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Formate un événement Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class VerseSectionSplitter:
+    """
+    Découpe le texte streamé en sections `**VERSET n**`.
+    Une section est émise dès que l'en-tête du verset suivant arrive
+    (la dernière est émise par `flush`).
+    """
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, text: str) -> Iterator[Tuple[int, str]]:
+        self.buffer += text
+        headers = list(VERSE_HEADER_PATTERN.finditer(self.buffer))
+        # Toutes les sections sauf la dernière sont complètes
+        for current, following in zip(headers, headers[1:]):
+            yield int(current.group(1)), self.buffer[current.start():following.start()].rstrip("-\n ")
+        if len(headers) > 1:
+            self.buffer = self.buffer[headers[-1].start():]
+
+    def flush(self) -> List[Tuple[int, str]]:
+        match = VERSE_HEADER_PATTERN.search(self.buffer)
+        if not match:
+            return []
+        section = self.buffer[match.start():].rstrip("-\n ")
+        self.buffer = ""
+        return [(int(match.group(1)), section)]
@@ -0,0 +1,258 @@
+"""
+Couche de cache des générations (rubriques, versets, personnages).
+
+Deux niveaux :
+1. MemoryCache : LRU en mémoire, borné en octets, avec TTL
+2. La collection MongoDB correspondante (source de vérité)
+
+Un cache hit sur un passage chaud (Genèse 1, Jean 3...) est servi depuis la
+mémoire du process, sans aller-retour Motor ni décodage BSON du markdown.
+
+Fraîcheur (stale-while-revalidate) : chaque collection a une durée de
+fraîcheur. Une entrée plus ancienne (d'après `created_at`) reste servie
+immédiatement, mais est signalée "stale" pour que l'appelant lance sa
+régénération en arrière-plan ; le nouvel upsert remplace le document d'un
+seul coup, les lecteurs voient l'ancienne ou la nouvelle version, jamais un
+mélange.
+
+Le markdown peut être stocké compressé dans Mongo (voir content_codec) : la
+compression est faite à l'écriture, la décompression à la lecture Mongo, et
+la couche mémoire garde toujours le texte clair.
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from metrics import CACHE_LOOKUPS, STAGE_SECONDS
+
+
+ENTRY_OVERHEAD_BYTES = 256
+
+
+def estimate_size(doc: dict) -> int:
+    """Taille approximative d'une entrée (le markdown domine largement)."""
+    size = ENTRY_OVERHEAD_BYTES
+    for value in doc.values():
+        if isinstance(value, str):
+            size += len(value.encode("utf-8"))
+        else:
+            size += 16
+    return size
+
+
+class MemoryCache:
+    """LRU borné en octets avec expiration (TTL) des entrées."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        doc, size, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return doc
+
+    def set(self, key: str, doc: dict):
+        size = estimate_size(doc)
+        if size > self.max_bytes:
+            # Une entrée plus grosse que tout le cache n'est pas mise en mémoire
+            self._remove(key)
+            return
+        self._remove(key)
+        self._entries[key] = (doc, size, time.monotonic() + self.ttl_seconds)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.current_bytes -= entry[1]
+        return True
+
+    def delete(self, key: str) -> bool:
+        return self._remove(key)
+
+    def invalidate(self, predicate: Callable[[dict], bool]) -> int:
+        """Supprime toutes les entrées dont le document vérifie `predicate`."""
+        keys = [key for key, (doc, _, _) in self._entries.items() if predicate(doc)]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        self.current_bytes = 0
+        return count
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class GenerationCache:
+    """Cache à deux niveaux devant une collection Motor indexée par `cache_key`."""
+
+    def __init__(self, collection, name: str, memory: MemoryCache, fresh_seconds: float = 0, codec=None,
+                 prompt_versions=None):
+        self.collection = collection
+        self.name = name
+        self.memory = memory
+        self.codec = codec
+        # Versions courantes des prompts (prompt_versions.PromptVersions) : une entrée générée
+        # avec un autre prompt ou un autre modèle est périmée
+        self.prompt_versions = prompt_versions
+        # 0 : les entrées ne deviennent jamais périmées avec l'âge
+        self.fresh_seconds = fresh_seconds
+        self.mongo_hits = 0
+        self.mongo_misses = 0
+        self.stale_hits = 0
+        self.version_stale_hits = 0
+
+    def age_seconds(self, doc: dict) -> Optional[float]:
+        """Âge d'une entrée d'après `created_at` (None si absent ou illisible)."""
+        try:
+            created_at = datetime.fromisoformat(doc["created_at"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - created_at).total_seconds()
+
+    def is_stale(self, doc: dict) -> bool:
+        """Entrée à régénérer : version de prompt dépassée, ou plus vieille que la durée de fraîcheur."""
+        if self.prompt_versions is not None:
+            expected = self.prompt_versions.for_doc(self.name, doc)
+            if expected is not None and doc.get("prompt_version") != expected:
+                self.version_stale_hits += 1
+                return True
+        if not self.fresh_seconds:
+            return False
+        age = self.age_seconds(doc)
+        # Entrée sans date (anciens documents) : considérée périmée
+        stale = age is None or age > self.fresh_seconds
+        if stale:
+            self.stale_hits += 1
+        return stale
+
+    async def get(self, cache_key: str) -> Optional[dict]:
+        with STAGE_SECONDS.time(stage="cache_lookup", collection=self.name):
+            doc = self.memory.get(cache_key)
+            if doc is not None:
+                CACHE_LOOKUPS.inc(collection=self.name, result="memory_hit")
+                return doc
+            doc = await self._decode(await self.collection.find_one({"cache_key": cache_key}, {"_id": 0}))
+            if doc is None:
+                self.mongo_misses += 1
+                CACHE_LOOKUPS.inc(collection=self.name, result="miss")
+                return None
+            self.mongo_hits += 1
+            CACHE_LOOKUPS.inc(collection=self.name, result="mongo_hit")
+            self.memory.set(cache_key, doc)
+            return doc
+
+    async def get_many(self, cache_keys: List[str]) -> Dict[str, dict]:
+        """Lookup groupé : la mémoire d'abord, puis une seule requête Mongo `$in`."""
+        started = time.perf_counter()
+        found = {}
+        missing = []
+        for cache_key in cache_keys:
+            doc = self.memory.get(cache_key)
+            if doc is not None:
+                found[cache_key] = doc
+            else:
+                missing.append(cache_key)
+        CACHE_LOOKUPS.inc(len(found), collection=self.name, result="memory_hit")
+        if missing:
+            mongo_hits = 0
+            async for doc in self.collection.find({"cache_key": {"$in": missing}}, {"_id": 0}):
+                doc = await self._decode(doc)
+                if doc is None:
+                    continue
+                found[doc["cache_key"]] = doc
+                self.memory.set(doc["cache_key"], doc)
+                mongo_hits += 1
+            self.mongo_hits += mongo_hits
+            self.mongo_misses += len(missing) - mongo_hits
+            CACHE_LOOKUPS.inc(mongo_hits, collection=self.name, result="mongo_hit")
+            CACHE_LOOKUPS.inc(len(missing) - mongo_hits, collection=self.name, result="miss")
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="cache_lookup", collection=self.name)
+        return found
+
+    async def _decode(self, doc: Optional[dict]) -> Optional[dict]:
+        if doc is None or self.codec is None:
+            return doc
+        return await self.codec.decode_loading(doc)
+
+    async def put(self, cache_key: str, doc: dict):
+        """Upsert Mongo (contenu compressé si possible) puis mise à jour de la mémoire."""
+        stored = self.codec.encode(doc) if self.codec is not None else doc
+        # Le champ de l'autre format est retiré : un document n'a jamais `content` et `content_z`
+        if "content_z" in stored:
+            update = {"$set": stored, "$unset": {"content": ""}}
+        else:
+            update = {"$set": stored, "$unset": {"content_z": "", "content_dict_id": ""}}
+        with STAGE_SECONDS.time(stage="mongo_upsert", collection=self.name):
+            await self.collection.update_one({"cache_key": cache_key}, update, upsert=True)
+        self.memory.set(cache_key, dict(doc))
+
+    def evict(self, predicate: Optional[Callable[[dict], bool]] = None) -> int:
+        """Invalide la mémoire (tout, ou les entrées vérifiant `predicate`)."""
+        if predicate is None:
+            return self.memory.clear()
+        return self.memory.invalidate(predicate)
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "mongo_hits": self.mongo_hits,
+            "mongo_misses": self.mongo_misses,
+            "fresh_seconds": self.fresh_seconds,
+            "stale_hits": self.stale_hits,
+            "version_stale_hits": self.version_stale_hits,
+        }
+
+
+def build_cache_layers(db, max_bytes_by_collection: Dict[str, int], ttl_seconds: float,
+                       fresh_seconds_by_collection: Optional[Dict[str, float]] = None,
+                       codec=None, prompt_versions=None) -> Dict[str, GenerationCache]:
+    """Crée une GenerationCache par collection de cache (codec et versions de prompts partagés)."""
+    fresh_seconds_by_collection = fresh_seconds_by_collection or {}
+    return {
+        name: GenerationCache(
+            getattr(db, name), name, MemoryCache(max_bytes, ttl_seconds),
+            fresh_seconds_by_collection.get(name, 0), codec, prompt_versions
+        )
+        for name, max_bytes in max_bytes_by_collection.items()
+    }
@@ -0,0 +1,266 @@
+"""
+File de jobs de génération (MongoDB) pour les générations longues.
+
+L'histoire d'un personnage en mode 'regenerate' (1200-1500 mots) dépasse souvent
+les timeouts du frontend / de Vercel, et le travail était perdu quand le client
+se déconnectait. Ici :
+- la soumission insère le job dans `generation_jobs` et répond tout de suite
+  avec son identifiant ; le client interroge ou s'abonne (SSE) ensuite
+- les workers (dans chaque process uvicorn) réclament les jobs de façon
+  atomique (find_one_and_update) avec un bail, prolongé pendant la génération
+- un job dont le bail a expiré (process tué, redéploiement) est repris par un
+  autre worker ; un job en erreur est remis en file avec un délai croissant,
+  puis passe en échec après `max_attempts` tentatives
+- le handler écrit le résultat dans les caches habituels, puis dans le job :
+  le client peut revenir plus tard, même après une déconnexion
+- les jobs terminés expirent (index TTL sur `expire_at`)
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, ReturnDocument
+
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def job_view(job: dict) -> dict:
+    """Représentation publique d'un job (sans les champs internes de la file)."""
+    return {
+        "job_id": job["_id"],
+        "kind": job["kind"],
+        "job_status": job["status"],
+        "attempts": job.get("attempts", 0),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+    }
+
+
+class GenerationJobQueue:
+    """File de jobs persistée dans Mongo, consommée par un pool de workers asyncio."""
+
+    def __init__(self, collection, concurrency: int = 2, lease_seconds: float = 180, max_attempts: int = 3,
+                 retry_delay_seconds: float = 30, poll_seconds: float = 2.0, retention_seconds: float = 7 * 24 * 3600):
+        self.collection = collection
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers: Dict[str, Callable[[dict], Awaitable[dict]]] = {}
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        self.running = 0
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.reclaimed = 0
+
+    def register(self, kind: str, handler: Callable[[dict], Awaitable[dict]]):
+        """Associe un type de job à son handler `async (params) -> résultat`."""
+        self._handlers[kind] = handler
+
+    @property
+    def kinds(self) -> List[str]:
+        return sorted(self._handlers)
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            [("status", ASCENDING), ("available_at", ASCENDING)], name="status_available", background=True
+        )
+        await self.collection.create_index(
+            [("dedupe_key", ASCENDING), ("status", ASCENDING)], name="dedupe_status", background=True
+        )
+        await self.collection.create_index("expire_at", name="expire_at_ttl", expireAfterSeconds=0, background=True)
+
+    # ----- Soumission et consultation -----
+
+    async def submit(self, kind: str, params: dict, dedupe_key: Optional[str] = None) -> Tuple[dict, bool]:
+        """
+        Ajoute un job. Retourne (job, deduplicated) : si un job identique (même
+        `dedupe_key`) est déjà en file ou en cours, c'est lui qui est retourné.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Type de job inconnu: {kind}")
+        if dedupe_key:
+            existing = await self.collection.find_one(
+                {"dedupe_key": dedupe_key, "status": {"$in": list(ACTIVE_STATUSES)}}
+            )
+            if existing is not None:
+                self.deduplicated += 1
+                return existing, True
+
+        job = {
+            "_id": uuid.uuid4().hex,
+            "kind": kind,
+            "params": params,
+            "dedupe_key": dedupe_key,
+            "status": "queued",
+            "attempts": 0,
+            "available_at": time.time(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        await self.collection.insert_one(job)
+        self.submitted += 1
+        self._wakeup.set()
+        logging.info(f"📥 Job {kind} en file: {job['_id']}")
+        return job, False
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": job_id})
+
+    async def counts(self) -> Dict[str, int]:
+        counts = {status: 0 for status in ACTIVE_STATUSES + ("done", "failed")}
+        async for row in self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+    # ----- Workers -----
+
+    async def claim(self) -> Optional[dict]:
+        """Réclame atomiquement le plus ancien job disponible (ou dont le bail a expiré)."""
+        now = time.time()
+        claimed = {
+            "status": "running",
+            "worker_id": self.worker_id,
+            "lease_expires_at": now + self.lease_seconds,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        }
+        previous = await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "available_at": {"$lte": now}},
+                {"status": "running", "lease_expires_at": {"$lt": now}},
+            ]},
+            {"$set": claimed, "$inc": {"attempts": 1}},
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.BEFORE,
+        )
+        if previous is None:
+            return None
+        if previous["status"] == "running":
+            # Worker précédent disparu sans rendre le job (process tué, redéploiement)
+            self.reclaimed += 1
+            logging.warning(f"♻️  Job {previous['_id']} repris après expiration du bail de {previous.get('worker_id')}")
+        return {**previous, **claimed, "attempts": previous.get("attempts", 0) + 1}
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self.collection.update_one(
+                {"_id": job_id, "worker_id": self.worker_id, "status": "running"},
+                {"$set": {"lease_expires_at": time.time() + self.lease_seconds}}
+            )
+
+    def _finished_fields(self) -> dict:
+        now = datetime.now(timezone.utc)
+        return {"finished_at": now.isoformat(), "expire_at": now + timedelta(seconds=self.retention_seconds)}
+
+    async def _run(self, job: dict):
+        handler = self._handlers.get(job["kind"])
+        if handler is None or job["attempts"] > self.max_attempts:
+            error = "Type de job inconnu" if handler is None else "Nombre maximal de tentatives atteint"
+            await self.collection.update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": "failed", "error": error, **self._finished_fields()}}
+            )
+            self.failed += 1
+            return
+
+        self.running += 1
+        heartbeat = asyncio.ensure_future(self._heartbeat(job["_id"]))
+        try:
+            result = await handler(job["params"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if job["attempts"] < self.max_attempts:
+                self.retried += 1
+                delay = self.retry_delay_seconds * job["attempts"]
+                logging.warning(f"⚠️  Job {job['_id']} en échec (tentative {job['attempts']}), nouvel essai dans {delay:.0f}s: {e}")
+                await self.collection.update_one(
+                    {"_id": job["_id"]},
+                    {"$set": {"status": "queued", "available_at": time.time() + delay, "error": str(e)}}
+                )
+            else:
+                self.failed += 1
+                logging.error(f"❌ Job {job['_id']} abandonné après {job['attempts']} tentatives: {e}")
+                await self.collection.update_one(
+                    {"_id": job["_id"]},
+                    {"$set": {"status": "failed", "error": str(e), **self._finished_fields()}}
+                )
+            return
+        finally:
+            heartbeat.cancel()
+            self.running -= 1
+
+        self.completed += 1
+        await self.collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "done", "result": result, "error": None, **self._finished_fields()},
+             "$unset": {"lease_expires_at": ""}}
+        )
+        logging.info(f"✅ Job {job['kind']} terminé: {job['_id']}")
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"❌ File de jobs indisponible: {e}")
+                job = None
+            if job is None:
+                # Réveil immédiat sur une soumission locale, sinon sondage périodique
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    def start(self):
+        if self._workers or self.concurrency <= 0:
+            return
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+        logging.info(f"🧵 {self.concurrency} worker(s) de jobs démarré(s) ({self.worker_id})")
+
+    async def stop(self):
+        """Arrête les workers ; leurs jobs en cours sont remis en file immédiatement."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self.collection.update_many(
+            {"worker_id": self.worker_id, "status": "running"},
+            {"$set": {"status": "queued", "available_at": time.time()}, "$inc": {"attempts": -1}}
+        )
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "workers": len(self._workers),
+            "running": self.running,
+            "kinds": self.kinds,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "reclaimed": self.reclaimed,
+        }
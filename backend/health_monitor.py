@@ -0,0 +1,219 @@
+"""
+Surveillance de santé des clés Gemini et de la Bible API en arrière-plan.
+
+Avant, /api/health envoyait un vrai prompt "Hi" à Gemini pour chaque clé, l'une
+après l'autre, à chaque poll des pages frontend (toutes les 10s). Ici :
+- une tâche de fond sonde les clés EN PARALLÈLE, à son propre rythme
+- le trafic réel (succès / 429) met à jour l'état des clés passivement, et une
+  clé utilisée récemment n'a pas besoin d'être sondée
+- /api/health renvoie un snapshot précalculé, sans aucun appel réseau
+- /api/health/stream pousse ce snapshot uniquement quand une LED change de
+  couleur/statut ou quand la clé active tourne (`wait_for_change`)
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+
+def led_status(quota_used_percent: float, is_available: bool):
+    """Retourne la couleur et le statut selon le quota utilisé"""
+    if not is_available or quota_used_percent >= 100:
+        return "red", "quota_exceeded", "Quota épuisé"
+    elif quota_used_percent >= 90:
+        return "red", "critical", "Critique"
+    elif quota_used_percent >= 70:
+        return "yellow", "warning", "Attention"
+    else:
+        return "green", "available", "Disponible"
+
+
+class KeyHealthMonitor:
+    """
+    État de santé précalculé des clés.
+    - `probe_key(key_index)` : sonde active d'une clé, sans génération (retourne is_available/quota_used/error)
+    - `probe_bible()` : sonde de la Bible API
+    - `usage_counts` : dictionnaire partagé des succès par clé
+    """
+
+    def __init__(self, key_count: int, probe_key: Callable[[int], Awaitable[dict]],
+                 probe_bible: Callable[[], Awaitable[dict]], usage_counts: Dict[int, int],
+                 daily_budget: int, interval: float = 900.0):
+        self.key_count = key_count
+        self.probe_key = probe_key
+        self.probe_bible = probe_bible
+        self.usage_counts = usage_counts
+        self.daily_budget = daily_budget
+        self.interval = interval
+        self.keys: Dict[int, dict] = {
+            i: {"is_available": True, "quota_exhausted": False, "error": None, "checked_at": None, "source": "initial"}
+            for i in range(key_count)
+        }
+        self.last_traffic: Dict[int, float] = {}
+        self.last_used: Dict[int, str] = {}
+        self.bible = {"is_available": False, "quota_used": 0, "error": "Vérification en cours"}
+        self.probe_rounds = 0
+        self.last_probe_at: Optional[str] = None
+        self.apis: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Transitions d'état : version incrémentée + réveil des abonnés SSE
+        self.active_key_index = 0
+        self.version = 0
+        self._signature = None
+        self._changed = asyncio.Event()
+        self._rebuild()
+
+    # ----- Apprentissage passif depuis le trafic réel -----
+
+    def record_success(self, key_index: int):
+        now = datetime.now(timezone.utc).isoformat()
+        self.last_traffic[key_index] = time.monotonic()
+        self.last_used[key_index] = now
+        self.keys[key_index] = {
+            "is_available": True, "quota_exhausted": False, "error": None, "checked_at": now, "source": "traffic"
+        }
+        self._rebuild()
+
+    def record_failure(self, key_index: int, error: Exception, quota: bool):
+        now = datetime.now(timezone.utc).isoformat()
+        self.last_traffic[key_index] = time.monotonic()
+        error_str = str(error).lower()
+        if quota:
+            state = {"is_available": False, "quota_exhausted": True, "error": "Quota épuisé"}
+        elif "invalid" in error_str or "api_key" in error_str:
+            state = {"is_available": False, "quota_exhausted": False, "error": "Clé invalide"}
+        else:
+            # Autre erreur, on suppose que la clé est utilisable
+            state = {"is_available": True, "quota_exhausted": False, "error": str(error)[:100]}
+        self.keys[key_index] = {**state, "checked_at": now, "source": "traffic"}
+        self._rebuild()
+
+    # ----- Sondes actives -----
+
+    async def _probe_one(self, key_index: int):
+        result = await self.probe_key(key_index)
+        self.keys[key_index] = {
+            "is_available": result["is_available"],
+            "quota_exhausted": not result["is_available"] and result["quota_used"] >= 100,
+            "error": result["error"],
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+            "source": "probe",
+        }
+
+    async def probe_all(self):
+        """Sonde en parallèle les clés sans trafic réel récent, et la Bible API."""
+        now = time.monotonic()
+        stale = [
+            i for i in range(self.key_count)
+            if now - self.last_traffic.get(i, float("-inf")) >= self.interval
+        ]
+        results = await asyncio.gather(
+            *(self._probe_one(i) for i in stale), self.probe_bible(), return_exceptions=True
+        )
+        bible_result = results[-1]
+        if isinstance(bible_result, Exception):
+            self.bible = {"is_available": False, "quota_used": 0, "error": str(bible_result)[:100]}
+        else:
+            self.bible = bible_result
+        self.probe_rounds += 1
+        self.last_probe_at = datetime.now(timezone.utc).isoformat()
+        self._rebuild()
+        logging.info(f"🩺 Sonde santé: {len(stale)} clé(s) Gemini vérifiée(s) en parallèle")
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logging.error(f"❌ Sonde santé en échec: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ----- Snapshot -----
+
+    def _key_entry(self, key_index: int) -> dict:
+        state = self.keys[key_index]
+        usage_count = self.usage_counts.get(key_index, 0)
+        if state["quota_exhausted"]:
+            quota_used = 100
+        else:
+            quota_used = round(min(100, (usage_count / self.daily_budget) * 100), 1) if self.daily_budget else 0
+        color, status, status_text = led_status(quota_used, state["is_available"])
+        return {
+            "name": f"Gemini Key {key_index + 1}",
+            "color": color,
+            "status": status,
+            "status_text": status_text,
+            "quota_used": quota_used,
+            "quota_remaining": 100 - quota_used,
+            "usage_count": usage_count,
+            "is_available": state["is_available"],
+            "error": state["error"],
+            "last_used": self.last_used.get(key_index),
+            "checked_at": state["checked_at"],
+            "source": state["source"],
+        }
+
+    def _rebuild(self):
+        apis = {f"gemini_{i + 1}": self._key_entry(i) for i in range(self.key_count)}
+        color, status, status_text = led_status(self.bible["quota_used"], self.bible["is_available"])
+        apis["bible_api"] = {
+            "name": "Bible API",
+            "color": color,
+            "status": status,
+            "status_text": status_text,
+            "quota_used": self.bible["quota_used"],
+            "quota_remaining": 100 - self.bible["quota_used"],
+            "is_available": self.bible["is_available"],
+            "error": self.bible["error"],
+            "last_used": None,
+        }
+        self.apis = apis
+        self._check_transition()
+
+    def snapshot(self) -> Dict[str, dict]:
+        return self.apis
+
+    # ----- Notifications de transitions -----
+
+    def set_active_key(self, key_index: int):
+        """La rotation de la clé active est une transition (LED "active" côté frontend)."""
+        if key_index != self.active_key_index:
+            self.active_key_index = key_index
+            self._check_transition()
+
+    def _check_transition(self):
+        signature = (
+            self.active_key_index,
+            tuple((name, api["color"], api["status"]) for name, api in self.apis.items()),
+        )
+        if signature != self._signature:
+            self._signature = signature
+            self.version += 1
+            # Réveiller tous les abonnés puis préparer l'événement suivant
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    async def wait_for_change(self, known_version: int, timeout: float) -> bool:
+        """Attend une transition postérieure à `known_version` (False si timeout)."""
+        if self.version != known_version:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
@@ -0,0 +1,499 @@
+"""
+État des clés Gemini partagé entre les workers uvicorn.
+
+Avec `--workers N`, chaque process avait sa propre rotation : il réessayait des
+clés que ses voisins savaient déjà épuisées et les LED différaient d'un worker
+à l'autre. Ici, l'état de chaque clé (usage, budget du jour, cooldown, dernière
+erreur) vit dans un store partagé, mis à jour de façon atomique :
+
+- `local`  : en mémoire du process (un seul worker, comportement historique)
+- `mongo`  : collection `gemini_key_state`, mises à jour atomiques
+             (find_one_and_update, pipeline conditionnel pour le budget du jour)
+- `shm`    : segment de mémoire partagée + verrou fcntl (plusieurs workers sur
+             une seule machine, sans aller-retour réseau)
+
+La réservation d'une unité de budget quotidien est faite dans le store : deux
+workers ne peuvent pas dépasser ensemble le budget d'une clé. `SharedKeyState`
+recopie périodiquement l'état partagé dans le scheduler, les cooldowns et les
+compteurs d'usage locaux (ordre des clés, LED).
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+import struct
+import tempfile
+import time
+from datetime import date
+from typing import Callable, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+
+ERROR_MAX_CHARS = 160
+
+
+def empty_state() -> dict:
+    return {
+        "usage_count": 0,
+        "daily_used": 0,
+        "quota_day": None,
+        "exhausted_day": None,
+        "cooldown_until": 0.0,
+        "consecutive_failures": 0,
+        "last_error": None,
+        "last_error_quota": False,
+        "last_error_at": 0.0,
+        "last_success_at": 0.0,
+    }
+
+
+# ----- Transitions (appliquées telles quelles par les stores local et shm) -----
+
+def _reserve(state: dict, day: str, budget: int) -> bool:
+    if state["exhausted_day"] == day:
+        return False
+    if state["quota_day"] != day:
+        state["quota_day"] = day
+        state["daily_used"] = 0
+    if state["daily_used"] >= budget:
+        return False
+    state["daily_used"] += 1
+    return True
+
+
+def _success(state: dict, now: float):
+    state["usage_count"] += 1
+    state["cooldown_until"] = 0.0
+    state["consecutive_failures"] = 0
+    state["last_success_at"] = now
+
+
+def _failure(state: dict, now: float, error: str, quota: bool, cooldown_until: float,
+             consecutive_failures: int, exhausted_day: Optional[str]):
+    state["last_error"] = error[:ERROR_MAX_CHARS]
+    state["last_error_quota"] = quota
+    state["last_error_at"] = now
+    state["cooldown_until"] = max(state["cooldown_until"], cooldown_until)
+    state["consecutive_failures"] = max(state["consecutive_failures"], consecutive_failures)
+    if exhausted_day:
+        state["exhausted_day"] = exhausted_day
+
+
+class LocalKeyStateStore:
+    """État en mémoire du process (un seul worker)."""
+
+    backend = "local"
+
+    def __init__(self, key_count: int):
+        self.key_count = key_count
+        self._states = {key_index: empty_state() for key_index in range(key_count)}
+        self._active_key = 0
+
+    async def load(self) -> Tuple[Dict[int, dict], int]:
+        return {key_index: dict(state) for key_index, state in self._states.items()}, self._active_key
+
+    async def try_reserve(self, key_index: int, day: str, budget: int) -> Optional[dict]:
+        state = self._states[key_index]
+        return dict(state) if _reserve(state, day, budget) else None
+
+    async def record_success(self, key_index: int) -> dict:
+        _success(self._states[key_index], time.time())
+        return dict(self._states[key_index])
+
+    async def record_failure(self, key_index: int, error: str, quota: bool, cooldown_until: float,
+                             consecutive_failures: int, exhausted_day: Optional[str]) -> dict:
+        state = self._states[key_index]
+        _failure(state, time.time(), error, quota, cooldown_until, consecutive_failures, exhausted_day)
+        return dict(state)
+
+    async def set_active_key(self, key_index: int):
+        self._active_key = key_index
+
+    async def close(self):
+        pass
+
+
+class MongoKeyStateStore:
+    """Un document par clé dans `gemini_key_state` (+ un document pour la clé active)."""
+
+    backend = "mongo"
+
+    def __init__(self, collection, key_count: int):
+        self.collection = collection
+        self.key_count = key_count
+
+    @staticmethod
+    def _id(key_index: int) -> str:
+        return f"gemini_{key_index}"
+
+    @staticmethod
+    def _state(doc: Optional[dict]) -> dict:
+        state = empty_state()
+        if doc:
+            state.update({field: doc[field] for field in state if field in doc})
+        return state
+
+    async def load(self) -> Tuple[Dict[int, dict], int]:
+        states = {key_index: empty_state() for key_index in range(self.key_count)}
+        active_key = 0
+        async for doc in self.collection.find({}):
+            if doc["_id"] == "active":
+                active_key = doc.get("key_index", 0)
+            elif doc.get("key_index") in states:
+                states[doc["key_index"]] = self._state(doc)
+        return states, active_key
+
+    async def try_reserve(self, key_index: int, day: str, budget: int) -> Optional[dict]:
+        # Filtre + incrément dans la même opération : le budget ne peut pas être dépassé à plusieurs
+        reservation = (
+            {
+                "_id": self._id(key_index),
+                "exhausted_day": {"$ne": day},
+                "$or": [{"quota_day": {"$ne": day}}, {"daily_used": {"$lt": budget}}],
+            },
+            [{"$set": {
+                "key_index": key_index,
+                "daily_used": {"$cond": [{"$eq": ["$quota_day", day]}, {"$add": ["$daily_used", 1]}, 1]},
+                "quota_day": day,
+            }}],
+        )
+        try:
+            doc = await self.collection.find_one_and_update(
+                *reservation, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Soit le budget du jour est épuisé (le document existe sans vérifier le filtre),
+            # soit un autre worker vient de créer le document de la clé : Mongo ne rejoue pas
+            # l'upsert (filtre $ne/$or), on retente donc une fois sans upsert.
+            # Seul un refus de cette seconde tentative est un budget épuisé.
+            doc = await self.collection.find_one_and_update(
+                *reservation, return_document=ReturnDocument.AFTER
+            )
+            if doc is None:
+                return None
+        return self._state(doc)
+
+    async def record_success(self, key_index: int) -> dict:
+        doc = await self.collection.find_one_and_update(
+            {"_id": self._id(key_index)},
+            {
+                "$set": {"key_index": key_index, "cooldown_until": 0.0, "consecutive_failures": 0,
+                         "last_success_at": time.time()},
+                "$inc": {"usage_count": 1},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return self._state(doc)
+
+    async def record_failure(self, key_index: int, error: str, quota: bool, cooldown_until: float,
+                             consecutive_failures: int, exhausted_day: Optional[str]) -> dict:
+        fields = {"key_index": key_index, "last_error": error[:ERROR_MAX_CHARS], "last_error_quota": quota,
+                  "last_error_at": time.time()}
+        if exhausted_day:
+            fields["exhausted_day"] = exhausted_day
+        doc = await self.collection.find_one_and_update(
+            {"_id": self._id(key_index)},
+            {"$set": fields, "$max": {"cooldown_until": cooldown_until, "consecutive_failures": consecutive_failures}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return self._state(doc)
+
+    async def set_active_key(self, key_index: int):
+        await self.collection.update_one({"_id": "active"}, {"$set": {"key_index": key_index}}, upsert=True)
+
+    async def close(self):
+        pass
+
+
+class SharedMemoryKeyStateStore:
+    """
+    Segment de mémoire partagée (une machine, plusieurs workers).
+    Chaque opération se fait sous un verrou fcntl exclusif : lecture, transition, écriture.
+    """
+
+    backend = "shm"
+
+    HEADER = struct.Struct("<ii")  # clé active, nombre de clés
+    # usage, budget du jour, jour (ordinal), jour épuisé (ordinal), échecs consécutifs,
+    # dernière erreur quota, cooldown jusqu'à, dernière erreur à, dernier succès à, dernière erreur
+    ENTRY = struct.Struct(f"<qqiii?ddd{ERROR_MAX_CHARS * 4}s")
+
+    def __init__(self, name: str, key_count: int):
+        from multiprocessing import resource_tracker, shared_memory
+
+        self.key_count = key_count
+        size = self.HEADER.size + self.ENTRY.size * key_count
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.HEADER.pack_into(self._shm.buf, 0, 0, key_count)
+            for key_index in range(key_count):
+                self._write(key_index, empty_state())
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=name)
+            if self.HEADER.unpack_from(self._shm.buf, 0)[1] != key_count or self._shm.size < size:
+                raise RuntimeError(f"Segment {name} créé pour un autre nombre de clés (changer KEY_STATE_SHM_NAME)")
+        # Le segment doit survivre à la sortie d'un worker (sinon le resource_tracker le supprime)
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._lock_file = open(os.path.join(tempfile.gettempdir(), f"{name}.lock"), "a+")
+
+    # ----- Encodage -----
+
+    @staticmethod
+    def _day_to_int(day: Optional[str]) -> int:
+        return date.fromisoformat(day).toordinal() if day else 0
+
+    @staticmethod
+    def _int_to_day(value: int) -> Optional[str]:
+        return date.fromordinal(value).isoformat() if value else None
+
+    def _offset(self, key_index: int) -> int:
+        return self.HEADER.size + self.ENTRY.size * key_index
+
+    def _read(self, key_index: int) -> dict:
+        (usage_count, daily_used, quota_day, exhausted_day, consecutive_failures, last_error_quota,
+         cooldown_until, last_error_at, last_success_at, last_error) = self.ENTRY.unpack_from(
+            self._shm.buf, self._offset(key_index))
+        last_error = last_error.rstrip(b"\0").decode("utf-8", errors="ignore") or None
+        return {
+            "usage_count": usage_count,
+            "daily_used": daily_used,
+            "quota_day": self._int_to_day(quota_day),
+            "exhausted_day": self._int_to_day(exhausted_day),
+            "cooldown_until": cooldown_until,
+            "consecutive_failures": consecutive_failures,
+            "last_error": last_error,
+            "last_error_quota": last_error_quota,
+            "last_error_at": last_error_at,
+            "last_success_at": last_success_at,
+        }
+
+    def _write(self, key_index: int, state: dict):
+        self.ENTRY.pack_into(
+            self._shm.buf, self._offset(key_index),
+            state["usage_count"], state["daily_used"], self._day_to_int(state["quota_day"]),
+            self._day_to_int(state["exhausted_day"]), state["consecutive_failures"], state["last_error_quota"],
+            state["cooldown_until"], state["last_error_at"], state["last_success_at"],
+            (state["last_error"] or "").encode("utf-8")[:ERROR_MAX_CHARS * 4],
+        )
+
+    def _update(self, key_index: int, transition: Callable[[dict], object]) -> Tuple[dict, object]:
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            state = self._read(key_index)
+            result = transition(state)
+            self._write(key_index, state)
+            return state, result
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    # ----- Opérations -----
+
+    async def load(self) -> Tuple[Dict[int, dict], int]:
+        fcntl.flock(self._lock_file, fcntl.LOCK_SH)
+        try:
+            states = {key_index: self._read(key_index) for key_index in range(self.key_count)}
+            active_key = self.HEADER.unpack_from(self._shm.buf, 0)[0]
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        return states, active_key
+
+    async def try_reserve(self, key_index: int, day: str, budget: int) -> Optional[dict]:
+        state, reserved = self._update(key_index, lambda s: _reserve(s, day, budget))
+        return state if reserved else None
+
+    async def record_success(self, key_index: int) -> dict:
+        return self._update(key_index, lambda s: _success(s, time.time()))[0]
+
+    async def record_failure(self, key_index: int, error: str, quota: bool, cooldown_until: float,
+                             consecutive_failures: int, exhausted_day: Optional[str]) -> dict:
+        return self._update(key_index, lambda s: _failure(
+            s, time.time(), error, quota, cooldown_until, consecutive_failures, exhausted_day
+        ))[0]
+
+    async def set_active_key(self, key_index: int):
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            self.HEADER.pack_into(self._shm.buf, 0, key_index, self.key_count)
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    async def close(self):
+        self._lock_file.close()
+        self._shm.close()
+
+
+def create_key_state_store(backend: str, key_count: int, db=None, shm_name: str = "bible_gemini_keys"):
+    """Store d'état des clés selon KEY_STATE_BACKEND (local, mongo, shm) ; repli sur local en cas d'échec."""
+    try:
+        if backend == "mongo":
+            return MongoKeyStateStore(db.gemini_key_state, key_count)
+        if backend == "shm":
+            return SharedMemoryKeyStateStore(shm_name, key_count)
+    except Exception as e:
+        logging.error(f"❌ Store d'état des clés '{backend}' indisponible, état local au process: {e}")
+        return LocalKeyStateStore(key_count)
+    if backend != "local":
+        logging.warning(f"⚠️  KEY_STATE_BACKEND inconnu: {backend}, état local au process")
+    return LocalKeyStateStore(key_count)
+
+
+class SharedKeyState:
+    """
+    Relie le store partagé aux structures locales : scheduler (budget du jour,
+    clés épuisées), cooldowns du moteur de retry et compteurs d'usage (LED).
+    """
+
+    def __init__(self, store, scheduler, cooldowns, usage_counts: Dict[int, int],
+                 refresh_interval: float = 2.0, on_event: Optional[Callable[[int, Optional[str], bool], None]] = None):
+        self.store = store
+        self.scheduler = scheduler
+        self.cooldowns = cooldowns
+        self.usage_counts = usage_counts
+        self.refresh_interval = refresh_interval
+        # on_event(key_index, erreur ou None, quota) : événement vu par un autre worker (LED)
+        self.on_event = on_event
+        self.active_key = 0
+        self._seen_event_at: Dict[int, float] = {}
+        # Clés dont le budget partagé du jour est épuisé par l'ensemble des workers (clé -> jour)
+        self._budget_exhausted: Dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.store_errors = 0
+        self.refusals = 0
+
+    @property
+    def shared(self) -> bool:
+        return self.store.backend != "local"
+
+    def apply(self, key_index: int, state: dict):
+        """Recopie l'état partagé d'une clé dans les structures locales."""
+        day = self.scheduler.current_day()
+        if state["quota_day"] == day:
+            self.scheduler.daily_used[key_index] = max(self.scheduler.daily_used[key_index], state["daily_used"])
+            if state["daily_used"] >= self.scheduler.daily_budget:
+                self._budget_exhausted[key_index] = day
+        if state["exhausted_day"] == day:
+            self.scheduler.daily_exhausted[key_index] = True
+        remaining = state["cooldown_until"] - time.time()
+        if remaining > 0:
+            self.cooldowns.extend(key_index, remaining)
+        elif state["last_success_at"] > state["last_error_at"]:
+            # Un autre worker a réussi avec cette clé depuis la dernière erreur
+            self.cooldowns.reset(key_index)
+        self.usage_counts[key_index] = max(self.usage_counts.get(key_index, 0), state["usage_count"])
+
+        last_event_at = max(state["last_error_at"], state["last_success_at"])
+        if self.on_event is not None and last_event_at > self._seen_event_at.get(key_index, 0.0):
+            self._seen_event_at[key_index] = last_event_at
+            if state["last_success_at"] >= state["last_error_at"]:
+                self.on_event(key_index, None, False)
+            else:
+                self.on_event(key_index, state["last_error"] or "Erreur", state["last_error_quota"])
+
+    async def _guard(self, operation, default=None):
+        """Le store partagé ne doit jamais faire échouer un appel Gemini."""
+        try:
+            return await operation
+        except Exception as e:
+            self.store_errors += 1
+            logging.warning(f"⚠️  État partagé des clés indisponible: {e}")
+            return default
+
+    def is_available(self, key_index: int) -> bool:
+        """Faux si le budget partagé du jour de la clé est épuisé (la clé sort de l'ordre des clés)."""
+        return self._budget_exhausted.get(key_index) != self.scheduler.current_day()
+
+    async def reserve(self, key_index: int) -> bool:
+        """
+        Réserve atomiquement une unité du budget quotidien partagé de la clé.
+        Un refus est une décision d'ordonnancement, pas une erreur : rien n'est
+        publié dans le store, la clé est seulement écartée jusqu'à demain.
+        """
+        day = self.scheduler.current_day()
+        unavailable = object()
+        state = await self._guard(self.store.try_reserve(key_index, day, self.scheduler.daily_budget), unavailable)
+        if state is unavailable:
+            return True
+        if state is None:
+            # Budget épuisé par l'ensemble des workers
+            self.refusals += 1
+            self._budget_exhausted[key_index] = day
+            return False
+        self.apply(key_index, state)
+        return True
+
+    async def record_success(self, key_index: int):
+        state = await self._guard(self.store.record_success(key_index))
+        if state is not None:
+            self._seen_event_at[key_index] = state["last_success_at"]
+            self.apply(key_index, state)
+
+    async def record_failure(self, key_index: int, error: Exception, quota: bool):
+        day = self.scheduler.current_day()
+        state = await self._guard(self.store.record_failure(
+            key_index, str(error), quota,
+            time.time() + self.cooldowns.remaining(key_index),
+            self.cooldowns.consecutive_failures(key_index),
+            day if self.scheduler.daily_exhausted[key_index] else None,
+        ))
+        if state is not None:
+            self._seen_event_at[key_index] = state["last_error_at"]
+            self.apply(key_index, state)
+
+    async def set_active_key(self, key_index: int):
+        self.active_key = key_index
+        if self.shared:
+            await self._guard(self.store.set_active_key(key_index))
+
+    async def refresh(self) -> int:
+        """Recharge l'état de toutes les clés ; retourne la clé active partagée."""
+        states, active_key = await self.store.load()
+        for key_index, state in states.items():
+            if key_index < self.scheduler.key_count:
+                self.apply(key_index, state)
+        self.active_key = active_key
+        self.refreshes += 1
+        return active_key
+
+    async def _loop(self, on_refresh: Optional[Callable[[int], None]]):
+        while True:
+            try:
+                active_key = await self.refresh()
+                if on_refresh is not None:
+                    on_refresh(active_key)
+            except Exception as e:
+                self.store_errors += 1
+                logging.warning(f"⚠️  Rafraîchissement de l'état partagé des clés en échec: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self, on_refresh: Optional[Callable[[int], None]] = None):
+        """Rafraîchissement périodique (inutile avec le store local)."""
+        if self._task is None and self.shared:
+            self._task = asyncio.ensure_future(self._loop(on_refresh))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.store.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.store.backend,
+            "refresh_interval_seconds": self.refresh_interval,
+            "refreshes": self.refreshes,
+            "store_errors": self.store_errors,
+            "active_key_index": self.active_key + 1,
+            "budget_refusals": self.refusals,
+            "budget_exhausted_keys": [key_index + 1 for key_index in range(self.scheduler.key_count)
+                                      if not self.is_available(key_index)],
+        }
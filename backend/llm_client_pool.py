@@ -0,0 +1,86 @@
+"""
+Pool de clients LlmChat par clé Gemini.
+
+Chaque tentative construisait un `LlmChat(...).with_model(...)` neuf avec une
+session uuid. Ici, `size` clients par clé sont préparés à l'avance et prêtés
+aux appels :
+- la file de clients d'une clé borne aussi la concurrence sur cette clé (un
+  appel attend qu'un client se libère)
+- LlmChat conserve l'historique de sa session et n'expose pas d'API documentée
+  pour le vider : un client ne sert qu'à un seul appel. Quand il est rendu
+  (succès, erreur ou annulation), il est remplacé par un client neuf, avec une
+  nouvelle session, construit par le constructeur documenté. Les prompts d'une
+  requête ne peuvent donc pas fuir dans la suivante.
+- la construction se fait au retour du client, après la réponse : la tentative
+  suivante n'attend pas la préparation avant l'envoi, mais chaque appel paie
+  toujours une construction (déplacée, pas supprimée ; quelques µs hors réseau,
+  cf. benchmark_llm_clients.py). LlmChat n'accepte ni client HTTP ni transport
+  partagé : la réutilisation des connexions reste celle de la bibliothèque.
+"""
+
+import asyncio
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from typing import Callable, Dict
+
+
+class LlmClientPool:
+    """
+    `factory(key_index, session_id)` construit un client configuré (modèle,
+    message système) ; `size` clients par clé, prêtés via `client(key_index)`.
+    """
+
+    def __init__(self, factory: Callable[[int, str], object], key_count: int, size: int = 4):
+        self.factory = factory
+        self.key_count = key_count
+        self.size = size
+        self._idle: Dict[int, asyncio.Queue] = {}
+        self.created = 0
+        self.borrowed = 0
+        self.waited = 0
+
+    def _build(self, key_index: int, slot: int):
+        self.created += 1
+        # Session neuve à chaque client : aucun historique partagé entre deux appels
+        return self.factory(key_index, f"pool-{key_index + 1}-{slot}-{uuid.uuid4().hex[:8]}")
+
+    def start(self):
+        """Prépare tous les clients (au démarrage, dans la boucle d'événements)."""
+        if self._idle:
+            return
+        idle = {}
+        for key_index in range(self.key_count):
+            idle[key_index] = asyncio.Queue()
+            for slot in range(self.size):
+                idle[key_index].put_nowait((slot, self._build(key_index, slot)))
+        self._idle = idle
+        logging.info(f"🔌 Pool LlmChat: {self.size} client(s) × {self.key_count} clé(s)")
+
+    @asynccontextmanager
+    async def client(self, key_index: int):
+        """Prête un client neuf de la clé (attend si tous sont occupés) et prépare son remplaçant."""
+        if not self._idle:
+            self.start()
+        queue = self._idle[key_index]
+        if queue.empty():
+            self.waited += 1
+        slot, chat = await queue.get()
+        self.borrowed += 1
+        try:
+            yield chat
+        finally:
+            queue.put_nowait((slot, self._build(key_index, slot)))
+
+    def in_use(self, key_index: int) -> int:
+        queue = self._idle.get(key_index)
+        return self.size - queue.qsize() if queue is not None else 0
+
+    def stats(self) -> dict:
+        return {
+            "clients_per_key": self.size,
+            "created": self.created,
+            "borrowed": self.borrowed,
+            "waited": self.waited,
+            "in_use": {f"gemini_{key_index + 1}": self.in_use(key_index) for key_index in self._idle},
+        }
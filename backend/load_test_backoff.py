@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test de charge du moteur de backoff Gemini (gemini_backoff.py)
+Vérifie que la latence des cache hits reste plate pendant la rotation des clés.
+
+Scénario simulé (aucun appel réseau) :
+- 14 clés, dont 10 renvoient immédiatement une erreur 429
+- N générations concurrentes qui font tourner les clés
+- en parallèle, un flux de "cache hits" (lecture Mongo simulée à 1 ms)
+
+Compare l'ancien comportement (time.sleep bloquant) au moteur asynchrone.
+Le p95 ne suffit pas : quelques cache hits bloqués pendant toute une rotation
+n'y apparaissent pas. On vérifie donc le pire cas (aucun cache hit au-delà de
+MAX_CACHE_HIT_MS) et que l'ancien comportement échoue bien à ce seuil.
+Usage: python load_test_backoff.py
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+from gemini_backoff import BackoffPolicy, GeminiRetryEngine, KeyCooldowns, RetriesExhausted
+
+TOTAL_KEYS = 14
+EXHAUSTED_KEYS = 10
+CONCURRENT_GENERATIONS = 20
+CACHE_HITS = 300
+CACHE_HIT_COST = 0.001        # Lecture Mongo simulée
+GEMINI_LATENCY = 0.05         # Réponse Gemini simulée
+LEGACY_SLEEP = 0.05           # time.sleep(1) de l'ancien code, réduit pour le test
+MAX_CACHE_HIT_MS = 100.0      # Aucun cache hit ne doit attendre la rotation des clés
+
+
+def print_test_header(test_name):
+    """Print a formatted test header"""
+    print(f"\n{'='*60}")
+    print(f"🧪 TEST: {test_name}")
+    print(f"{'='*60}")
+
+
+def print_test_result(success, message):
+    """Print formatted test result"""
+    status = "✅ PASS" if success else "❌ FAIL"
+    print(f"{status}: {message}")
+
+
+async def fake_gemini(key_index):
+    await asyncio.sleep(GEMINI_LATENCY)
+    if key_index < EXHAUSTED_KEYS:
+        raise Exception("429 RESOURCE_EXHAUSTED: quota exceeded")
+    return f"contenu généré avec clé #{key_index + 1}"
+
+
+async def legacy_generation(state):
+    """Reproduit l'ancienne boucle : rotation + time.sleep bloquant."""
+    for _ in range(TOTAL_KEYS):
+        key_index = state["index"]
+        try:
+            return await fake_gemini(key_index)
+        except Exception:
+            state["index"] = (state["index"] + 1) % TOTAL_KEYS
+            time.sleep(LEGACY_SLEEP)
+    raise Exception("toutes les clés épuisées")
+
+
+async def engine_generation(engine, state):
+    def key_order():
+        return [(state["index"] + i) % TOTAL_KEYS for i in range(TOTAL_KEYS)]
+
+    async def on_error(key_index, error, quota):
+        state["index"] = (key_index + 1) % TOTAL_KEYS
+
+    result, stats = await engine.run(fake_gemini, key_order, TOTAL_KEYS, on_error=on_error)
+    return stats
+
+
+async def cache_hit_stream(latencies):
+    for _ in range(CACHE_HITS):
+        start = time.perf_counter()
+        await asyncio.sleep(CACHE_HIT_COST)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def summarize(latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return statistics.median(ordered), p95, ordered[-1]
+
+
+async def run_scenario(label, make_generation):
+    latencies = []
+    started = time.perf_counter()
+    generations = [asyncio.create_task(make_generation()) for _ in range(CONCURRENT_GENERATIONS)]
+    await cache_hit_stream(latencies)
+    results = await asyncio.gather(*generations, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    p50, p95, worst = summarize(latencies)
+    delayed = sum(1 for latency in latencies if latency > MAX_CACHE_HIT_MS)
+    print(f"{label}: cache hit p50={p50:.2f}ms p95={p95:.2f}ms max={worst:.2f}ms "
+          f"> {MAX_CACHE_HIT_MS:.0f}ms: {delayed}/{len(latencies)} (durée totale {elapsed:.2f}s)")
+    return results, worst, delayed
+
+
+async def main():
+    print_test_header("Latence des cache hits pendant la rotation des clés")
+
+    legacy_state = {"index": 0}
+    _, legacy_worst, legacy_delayed = await run_scenario("Ancien time.sleep", lambda: legacy_generation(legacy_state))
+
+    engine = GeminiRetryEngine(
+        policy=BackoffPolicy(base_delay=0.01, max_delay=0.1),
+        cooldowns=KeyCooldowns(quota_cooldown=5.0),
+    )
+    engine_state = {"index": 0}
+    results, engine_worst, engine_delayed = await run_scenario("Moteur asynchrone", lambda: engine_generation(engine, engine_state))
+
+    failures = [r for r in results if isinstance(r, (Exception, RetriesExhausted))]
+    retries = [r.retries for r in results if not isinstance(r, Exception)]
+
+    success = True
+    if failures:
+        print_test_result(False, f"{len(failures)} générations ont échoué")
+        success = False
+    else:
+        print_test_result(True, f"{len(results)} générations réussies, retries moyens={statistics.mean(retries):.1f}")
+
+    if engine_delayed == 0:
+        print_test_result(True, f"max cache hit {engine_worst:.2f}ms <= {MAX_CACHE_HIT_MS}ms")
+    else:
+        print_test_result(False, f"{engine_delayed} cache hit(s) > {MAX_CACHE_HIT_MS}ms (max {engine_worst:.2f}ms)")
+        success = False
+
+    # Le test doit détecter la régression qu'il surveille : l'ancien time.sleep doit échouer
+    if legacy_delayed > 0:
+        print_test_result(True, f"seuil discriminant : l'ancien time.sleep bloque {legacy_delayed} cache hit(s) "
+                                f"(max {legacy_worst:.2f}ms)")
+    else:
+        print_test_result(False, f"l'ancien time.sleep passe le seuil de {MAX_CACHE_HIT_MS}ms : le test ne détecte rien")
+        success = False
+
+    print(f"\nStatistiques moteur: {engine.stats()['total_retries']} retries, "
+          f"{engine.stats()['total_quota_errors']} erreurs de quota")
+    return success
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,225 @@
+"""
+Métriques du pipeline de génération au format texte Prometheus (exposition 0.0.4).
+
+Implémentation minimale sans dépendance : compteurs, jauges (valeur fixée ou
+calculée au moment du scrape) et histogrammes à buckets cumulés, avec labels.
+Les métriques partagées par plusieurs modules (étapes du pipeline, caches) sont
+déclarées ici sur le registre global `REGISTRY`, exposé par GET /metrics.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# Secondes : des cache hits mémoire (ms) aux générations Gemini longues (minutes)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name}: labels attendus {self.label_names}, reçus {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> List[Tuple[str, Tuple[str, ...], Tuple, float]]:
+        """[(suffixe, noms de labels, valeurs, valeur)]"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        documentation = self.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+        lines = [f"# HELP {self.name} {documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        return [("_total", self.label_names, key, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Jauge fixée par le code, ou calculée au scrape par `function` ({valeurs de labels: valeur} ou un nombre)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 function: Optional[Callable[[], object]] = None):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.function = function
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Incrémente pendant la durée du bloc (opérations en cours)."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        values = dict(self._values)
+        if self.function is not None:
+            computed = self.function()
+            if isinstance(computed, dict):
+                values.update({tuple(str(v) for v in key): value for key, value in computed.items()})
+            else:
+                values[()] = computed
+        return [("", self.label_names, key, value) for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # {labels: [comptes par bucket (non cumulés), somme, total]}
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Mesure la durée du bloc (fonctionne autour d'un `await`)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        samples = []
+        bucket_names = self.label_names + ("le",)
+        for key, (counts, total_sum, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", bucket_names, key + (_format_value(bound),), cumulative))
+            samples.append(("_bucket", bucket_names, key + ("+Inf",), count))
+            samples.append(("_sum", self.label_names, key, total_sum))
+            samples.append(("_count", self.label_names, key, count))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrique déjà déclarée: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+              function: Optional[Callable[[], object]] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names, function))
+
+    def histogram(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ----- Métriques partagées du pipeline -----
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "generation_stage_duration_seconds",
+    "Durée des étapes du pipeline (cache_lookup, gemini_call, mongo_upsert)",
+    ("stage", "collection")
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    "cache_lookups",
+    "Lookups de cache par collection et résultat (memory_hit, mongo_hit, miss)",
+    ("collection", "result")
+)
+
+
+def cache_hit_ratios() -> Dict[Tuple[str], float]:
+    """Ratio de hits (mémoire + Mongo) par collection, calculé au scrape."""
+    totals: Dict[str, List[float]] = {}
+    for (collection, result), value in CACHE_LOOKUPS._values.items():
+        hits_and_total = totals.setdefault(collection, [0, 0])
+        hits_and_total[1] += value
+        if result != "miss":
+            hits_and_total[0] += value
+    return {(collection,): hits / total for collection, (hits, total) in totals.items() if total}
+
+
+REGISTRY.gauge("cache_hit_ratio", "Ratio de cache hits par collection depuis le démarrage", ("collection",),
+               function=cache_hit_ratios)
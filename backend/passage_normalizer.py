@@ -0,0 +1,200 @@
+"""
+Normalisation des références bibliques saisies par l'utilisateur.
+
+"Genèse 1", "genese 1", "Gn 1", "Gen. 1" et "Genèse  1" désignent le même
+chapitre mais produisaient des clés de cache différentes (et donc autant de
+générations Gemini). Ici, toute saisie est ramenée à une référence canonique :
+
+    parse_passage("Gn 1:3-5")   -> Passage(GEN, 1, 3, 5)
+    parse_passage("Jude 3")     -> Passage(JUD, 1, 3, 3)   (livre d'un seul chapitre)
+    .chapter_key                -> "GEN.1"
+    .cache_key                  -> "GEN.1.3-5"
+    .display                    -> "Genèse 1:3-5"
+
+Les alias couvrent les 66 livres : noms et abréviations usuelles françaises
+(Louis Segond, TOB, Bible de Jérusalem) et anglaises, avec ou sans accents,
+points, espaces, et chiffres romains / ordinaux pour les livres numérotés.
+"""
+
+import re
+from typing import Dict, NamedTuple, Optional
+
+from bible_books import BIBLE_BOOKS, BibleBook, fold_name
+
+
+# Abréviations et variantes, en plus du nom français, du nom anglais et de l'identifiant USFM
+BOOK_ALIASES: Dict[str, tuple] = {
+    "GEN": ("gn", "ge", "gen"),
+    "EXO": ("ex", "exo", "exod"),
+    "LEV": ("lv", "le", "lev", "levitique"),
+    "NUM": ("nb", "nu", "nomb", "nombre", "num"),
+    "DEU": ("dt", "de", "deut"),
+    "JOS": ("js", "jos", "josh"),
+    "JDG": ("jg", "jug", "judg", "jdg"),
+    "RUT": ("rt", "ru", "rth"),
+    "1SA": ("1 s", "1 sa", "1 sam", "1 sm"),
+    "2SA": ("2 s", "2 sa", "2 sam", "2 sm"),
+    "1KI": ("1 r", "1 ro", "1 roi", "1 kgs", "1 ki", "1 rois"),
+    "2KI": ("2 r", "2 ro", "2 roi", "2 kgs", "2 ki", "2 rois"),
+    "1CH": ("1 ch", "1 chr", "1 chron", "1 chroniques"),
+    "2CH": ("2 ch", "2 chr", "2 chron", "2 chroniques"),
+    "EZR": ("esd", "ezr", "esdr"),
+    "NEH": ("ne", "neh", "nehemie"),
+    "EST": ("est", "esth", "es th"),
+    "JOB": ("jb",),
+    "PSA": ("ps", "psa", "psaume", "psalm", "pss"),
+    "PRO": ("pr", "pro", "prov", "proverbe"),
+    "ECC": ("ec", "ecc", "eccl", "qo", "qoh", "qohelet", "eccles"),
+    "SNG": ("ct", "cant", "cantique", "ca", "song", "sos", "song of solomon", "cantique des cantiques"),
+    "ISA": ("es", "esa", "is", "isa", "isaie", "esaie"),
+    "JER": ("jr", "je", "jer", "jerem"),
+    "LAM": ("lm", "la", "lam"),
+    "EZK": ("ez", "eze", "ezk", "ezek", "ezech"),
+    "DAN": ("dn", "da", "dan"),
+    "HOS": ("os", "hos"),
+    "JOL": ("jl", "joe", "joel"),
+    "AMO": ("am", "amo"),
+    "OBA": ("ab", "abd", "ob", "obad"),
+    "JON": ("jon", "jnh"),
+    "MIC": ("mi", "mic", "mich"),
+    "NAM": ("na", "nah", "nam"),
+    "HAB": ("ha", "hab"),
+    "ZEP": ("so", "soph", "zep", "zeph"),
+    "HAG": ("ag", "agg", "hag"),
+    "ZEC": ("za", "zac", "zach", "zec", "zech"),
+    "MAL": ("ml", "mal"),
+    "MAT": ("mt", "mat", "matt", "matth"),
+    "MRK": ("mc", "mr", "mk", "mrk"),
+    "LUK": ("lc", "lu", "lk", "luk"),
+    "JHN": ("jn", "jean", "joh", "jhn"),
+    "ACT": ("ac", "act", "actes des apotres"),
+    "ROM": ("rm", "ro", "rom"),
+    "1CO": ("1 co", "1 cor"),
+    "2CO": ("2 co", "2 cor"),
+    "GAL": ("ga", "gal"),
+    "EPH": ("ep", "eph"),
+    "PHP": ("ph", "phi", "phil", "php"),
+    "COL": ("col", "cl"),
+    "1TH": ("1 th", "1 thes", "1 thess"),
+    "2TH": ("2 th", "2 thes", "2 thess"),
+    "1TI": ("1 tm", "1 ti", "1 tim"),
+    "2TI": ("2 tm", "2 ti", "2 tim"),
+    "TIT": ("tt", "ti", "tit"),
+    "PHM": ("phm", "phlm", "philem"),
+    "HEB": ("he", "heb", "hb"),
+    "JAS": ("jc", "jq", "jac", "jas", "jm"),
+    "1PE": ("1 p", "1 pi", "1 pe", "1 pet", "1 pierre"),
+    "2PE": ("2 p", "2 pi", "2 pe", "2 pet", "2 pierre"),
+    "1JN": ("1 jn", "1 jean", "1 jo", "1 john"),
+    "2JN": ("2 jn", "2 jean", "2 jo", "2 john"),
+    "3JN": ("3 jn", "3 jean", "3 jo", "3 john"),
+    "JUD": ("jd", "jude", "jud"),
+    "REV": ("ap", "apo", "apoc", "rev", "re", "rv", "revelations"),
+}
+
+# Préfixes des livres numérotés : "I Jean", "1er Jean", "Première épître de Jean"...
+ORDINAL_PREFIXES = (
+    (re.compile(r"^(?:iii|3e|3eme|troisieme)\s*"), "3 "),
+    (re.compile(r"^(?:ii|2e|2eme|2nd|deuxieme|seconde?|second)\s+"), "2 "),
+    (re.compile(r"^(?:i|1er|1re|1ere|premier|premiere|first)\s+"), "1 "),
+    (re.compile(r"^([123])\s*"), r"\1 "),
+)
+EPISTLE_WORDS = re.compile(r"\b(?:epitre|lettre|livre|evangile|(?:de|du|des|aux|a|selon|of|the)\b)\s*")
+CHAPTER_WORDS = re.compile(r"\s*\b(?:chapitre|chap|ch|chapter)\.?$")
+
+PASSAGE_PATTERN = re.compile(
+    r"^\s*(?P<book>.*?[^\d\s].*?)\s*(?P<chapter>\d+)"
+    r"(?:\s*[:.,v]\s*(?P<start>\d+)(?:\s*(?:-|–|—|à|a)\s*(?P<end>\d+))?"
+    # "Jude 3-5" : plage de versets d'un livre d'un seul chapitre
+    r"|\s*(?:-|–|—|à)\s*(?P<range_end>\d+))?\s*$"
+)
+
+
+def _alias_key(name: str) -> str:
+    key = fold_name(name).replace(".", " ").strip()
+    for pattern, replacement in ORDINAL_PREFIXES:
+        if pattern.match(key):
+            key = pattern.sub(replacement, key, count=1)
+            break
+    return " ".join(key.split())
+
+
+_ALIASES: Dict[str, BibleBook] = {}
+for _book in BIBLE_BOOKS:
+    for _name in (_book.book_id, _book.name_fr, _book.name_en) + BOOK_ALIASES.get(_book.book_id, ()):
+        _ALIASES.setdefault(_alias_key(_name), _book)
+
+
+def resolve_book(name: str) -> Optional[BibleBook]:
+    """Livre correspondant à un nom, une abréviation ou un identifiant USFM (None si inconnu)."""
+    key = _alias_key(CHAPTER_WORDS.sub("", fold_name(name)))
+    book = _ALIASES.get(key)
+    if book is None:
+        # "Évangile selon Jean", "Première épître de Pierre"...
+        book = _ALIASES.get(_alias_key(EPISTLE_WORDS.sub("", key)))
+    return book
+
+
+class Passage(NamedTuple):
+    book: BibleBook
+    chapter: int
+    start_verse: Optional[int] = None
+    end_verse: Optional[int] = None
+
+    @property
+    def chapter_key(self) -> str:
+        return f"{self.book.book_id}.{self.chapter}"
+
+    @property
+    def cache_key(self) -> str:
+        if self.start_verse is None:
+            return self.chapter_key
+        if self.end_verse == self.start_verse:
+            return f"{self.chapter_key}.{self.start_verse}"
+        return f"{self.chapter_key}.{self.start_verse}-{self.end_verse}"
+
+    @property
+    def display(self) -> str:
+        label = f"{self.book.name_fr} {self.chapter}"
+        if self.start_verse is None:
+            return label
+        if self.end_verse == self.start_verse:
+            return f"{label}:{self.start_verse}"
+        return f"{label}:{self.start_verse}-{self.end_verse}"
+
+
+def parse_passage(text: str) -> Optional[Passage]:
+    """Référence canonique d'une saisie ("Gn 1", "1 Jean 3:16", "Ps 23.1-4"...), None si invalide."""
+    match = PASSAGE_PATTERN.match(text or "")
+    if not match:
+        return None
+    book = resolve_book(match.group("book"))
+    chapter = int(match.group("chapter"))
+    if book is None:
+        return None
+    start_verse = int(match.group("start")) if match.group("start") else None
+    end_verse = int(match.group("end")) if match.group("end") else start_verse
+    range_end = match.group("range_end")
+    if book.chapters == 1 and start_verse is None and (chapter > 1 or range_end):
+        # Livre d'un seul chapitre : "Jude 3" et "Jude 3-5" désignent des versets du chapitre 1
+        start_verse, end_verse, chapter = chapter, int(range_end) if range_end else chapter, 1
+    elif range_end:
+        # Plage de chapitres ("Gn 1-3") : pas une référence de passage unique
+        return None
+    if not 1 <= chapter <= book.chapters:
+        return None
+    if start_verse is not None and (start_verse < 1 or end_verse < start_verse):
+        return None
+    return Passage(book, chapter, start_verse, end_verse)
+
+
+def passage_cache_key(text: str) -> str:
+    """Clé canonique d'un passage ; une saisie non reconnue est seulement repliée (casse, accents, espaces)."""
+    passage = parse_passage(text)
+    return passage.cache_key if passage else fold_name(text)
+
+
+def display_passage(text: str) -> str:
+    """Forme d'affichage canonique ("gn 1" -> "Genèse 1"), ou la saisie telle quelle si non reconnue."""
+    passage = parse_passage(text)
+    return passage.display if passage else " ".join((text or "").split())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Pré-génération hors ligne du canon complet (caches chauds avant l'arrivée des utilisateurs).
+
+Parcourt les 1 189 chapitres × 28 rubriques, puis les groupes de versets de
+l'étude verset par verset, et remplit les mêmes caches que server.py
+(rubriques_cache, verses_cache). Les passages déjà en cache sont sautés.
+
+- Quota : seul le surplus quotidien des GEMINI_KEYS est utilisé. Chaque clé garde
+  --reserve-per-key requêtes pour le trafic réel ; une fois le surplus du jour
+  consommé, le job attend la remise à zéro des quotas (minuit, heure du Pacifique)
+  ou s'arrête avec --once.
+- Reprise : la progression (dernière unité traitée, compteurs, quota consommé
+  du jour) est enregistrée dans la collection Mongo `pregeneration_jobs`.
+  Relancer la même commande reprend là où le job s'était arrêté.
+- Le contenu de secours (Bible API) n'est jamais mis en cache par ce job.
+
+Usage:
+    python pregenerate.py                       # tout le canon
+    python pregenerate.py --books JHN,PSA,GEN   # livres prioritaires d'abord
+    python pregenerate.py --skip-verses --once  # rubriques seulement, s'arrête quand le surplus est épuisé
+    python pregenerate.py --dry-run             # compte les unités restantes sans appeler Gemini
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Iterator, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+
+import server
+from bible_books import BIBLE_BOOKS, BOOKS_BY_ID
+from gemini_scheduler import QUOTA_RESET_TIMEZONE
+from passage_normalizer import Passage
+from verse_sections import missing_verse_runs, split_verse_sections
+
+DEFAULT_RESERVE_PER_KEY = int(os.environ.get('PREGEN_RESERVED_PER_KEY', '15'))
+QUOTA_WAIT_SECONDS = 600
+
+
+class WorkUnit(NamedTuple):
+    """Une unité de travail : une rubrique d'un chapitre, ou un groupe de versets."""
+    key: str
+    passage: Passage
+    rubrique_number: Optional[int] = None
+    first_verse: Optional[int] = None
+    last_verse: Optional[int] = None
+
+
+class QuotaSpent(Exception):
+    """Le surplus quotidien est consommé (ou Gemini refuse toutes les clés)."""
+
+
+def quota_day() -> str:
+    return datetime.now(QUOTA_RESET_TIMEZONE).date().isoformat()
+
+
+def iter_units(book_ids: List[str], rubriques: bool, verses: bool, verse_batch: int) -> Iterator[WorkUnit]:
+    """Unités dans un ordre déterministe : livre, chapitre, rubriques puis versets."""
+    for book_id in book_ids:
+        book = BOOKS_BY_ID[book_id]
+        for chapter in range(1, book.chapters + 1):
+            passage = Passage(book, chapter)
+            if rubriques:
+                for rubrique_number in sorted(server.RUBRIQUE_PROMPTS):
+                    yield WorkUnit(f"{passage.chapter_key}:rubrique:{rubrique_number}", passage, rubrique_number)
+            if verses:
+                verse_count = server.bible_corpus.chapter_length(book_id, chapter)
+                for first_verse in range(1, verse_count + 1, verse_batch):
+                    last_verse = min(verse_count, first_verse + verse_batch - 1)
+                    yield WorkUnit(
+                        f"{passage.chapter_key}:versets:{first_verse}-{last_verse}",
+                        passage, first_verse=first_verse, last_verse=last_verse
+                    )
+
+
+class PregenerationJob:
+    """Job reprenable, checkpointé dans `pregeneration_jobs`."""
+
+    def __init__(self, name: str, spare_budget: int, once: bool):
+        self.name = name
+        self.spare_budget = spare_budget
+        self.once = once
+        self.collection = server.db.pregeneration_jobs
+        self.state = {}
+
+    async def load(self):
+        self.state = await self.collection.find_one({"_id": self.name}) or {
+            "_id": self.name,
+            "cursor": None,
+            "generated": 0,
+            "cached": 0,
+            "failed": 0,
+            "quota_day": quota_day(),
+            "quota_used": 0,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self._roll_quota_day()
+
+    async def checkpoint(self, cursor: Optional[str] = None, **increments):
+        if cursor is not None:
+            self.state["cursor"] = cursor
+        for field, amount in increments.items():
+            self.state[field] = self.state.get(field, 0) + amount
+        self.state["updated_at"] = datetime.now(timezone.utc).isoformat()
+        await self.collection.replace_one({"_id": self.name}, self.state, upsert=True)
+
+    def _roll_quota_day(self):
+        today = quota_day()
+        if self.state.get("quota_day") != today:
+            self.state["quota_day"] = today
+            self.state["quota_used"] = 0
+
+    async def wait_for_quota(self):
+        """Bloque jusqu'à ce qu'il reste du surplus de quota pour aujourd'hui."""
+        while True:
+            self._roll_quota_day()
+            if self.state["quota_used"] < self.spare_budget:
+                return
+            if self.once:
+                raise QuotaSpent(f"surplus du jour consommé ({self.state['quota_used']}/{self.spare_budget})")
+            logging.info(f"⏳ Surplus du jour consommé, nouvelle vérification dans {QUOTA_WAIT_SECONDS}s")
+            await asyncio.sleep(QUOTA_WAIT_SECONDS)
+
+    async def generate(self, prompt: str) -> str:
+        """Appel Gemini sans fallback Bible API ; le quota consommé est checkpointé."""
+        try:
+            content, stats = await server.call_gemini_with_stats(prompt, use_bible_api_fallback=False)
+        except HTTPException as e:
+            raise QuotaSpent(e.detail)
+        self.state["quota_used"] += max(1, stats.attempts - stats.quota_errors)
+        return content
+
+    # ----- Unités -----
+
+    async def run_rubrique(self, unit: WorkUnit) -> bool:
+        """Retourne True si une génération a eu lieu, False si déjà en cache."""
+        passage = unit.passage.display
+        cached = (await server.get_cached_rubriques(passage, [unit.rubrique_number])).get(unit.rubrique_number)
+        # Les entrées périmées sont régénérées ici plutôt qu'à la demande d'un utilisateur
+        if cached and not server.rubriques_store.is_stale(cached):
+            return False
+        await self.wait_for_quota()
+        content = await self.generate(server.RUBRIQUE_PROMPTS[unit.rubrique_number].format(passage=passage))
+        await server.save_rubrique_cache(
+            server.rubrique_cache_key(passage, unit.rubrique_number), passage, unit.rubrique_number,
+            server.RUBRIQUE_TITLES.get(unit.rubrique_number, ""), content
+        )
+        return True
+
+    async def run_verses(self, unit: WorkUnit) -> bool:
+        chapter_key = unit.passage.chapter_key
+        cached, stale_verses = await server.get_cached_verse_sections(chapter_key, unit.first_verse, unit.last_verse)
+        missing = [v for v in range(unit.first_verse, unit.last_verse + 1) if v not in cached or v in stale_verses]
+        if not missing:
+            return False
+        for first_verse, last_verse in missing_verse_runs(missing):
+            await self.wait_for_quota()
+            prompt = server.build_verse_by_verse_prompt(
+                unit.passage.book.name_fr, str(unit.passage.chapter), first_verse, last_verse
+            )
+            content = await self.generate(prompt)
+            await server.save_verse_sections(chapter_key, {
+                verse: section for verse, section in split_verse_sections(content).items()
+                if first_verse <= verse <= last_verse
+            })
+        return True
+
+    async def run(self, units: List[WorkUnit], concurrency: int):
+        cursor = self.state.get("cursor")
+        if cursor and any(unit.key == cursor for unit in units):
+            # Reprise : les unités jusqu'au curseur inclus sont déjà traitées
+            resume_at = next(i for i, unit in enumerate(units) if unit.key == cursor) + 1
+            logging.info(f"↩️  Reprise du job {self.name} après {cursor} ({resume_at}/{len(units)})")
+            units = units[resume_at:]
+
+        # Le curseur n'avance que sur un préfixe d'unités terminées (reprise sûre en concurrence)
+        done = [False] * len(units)
+        next_pending = 0
+        next_unit = 0
+
+        async def process(index: int, unit: WorkUnit):
+            nonlocal next_pending
+            counters = {}
+            try:
+                if unit.rubrique_number is not None:
+                    generated = await self.run_rubrique(unit)
+                else:
+                    generated = await self.run_verses(unit)
+                counters = {"generated": 1} if generated else {"cached": 1}
+                if generated:
+                    logging.info(f"✅ {unit.key} généré (quota du jour: {self.state['quota_used']}/{self.spare_budget})")
+            except QuotaSpent:
+                raise
+            except Exception as e:
+                logging.error(f"❌ {unit.key} en échec: {e}")
+                counters = {"failed": 1}
+            done[index] = True
+            advanced = None
+            while next_pending < len(units) and done[next_pending]:
+                advanced = units[next_pending].key
+                next_pending += 1
+            await self.checkpoint(advanced, **counters)
+
+        async def worker():
+            nonlocal next_unit
+            while next_unit < len(units):
+                index = next_unit
+                next_unit += 1
+                await process(index, units[index])
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(max(1, concurrency))]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-génération des rubriques et études verset par verset")
+    parser.add_argument("--job-name", default="canon", help="identifiant du checkpoint Mongo (défaut: canon)")
+    parser.add_argument("--books", default="", help="livres USFM à traiter, dans l'ordre (ex: JHN,PSA,GEN)")
+    parser.add_argument("--skip-rubriques", action="store_true", help="ne pas générer les 28 rubriques")
+    parser.add_argument("--skip-verses", action="store_true", help="ne pas générer l'étude verset par verset")
+    parser.add_argument("--verse-batch", type=int, default=5, help="versets par génération (défaut: 5)")
+    parser.add_argument("--reserve-per-key", type=int, default=DEFAULT_RESERVE_PER_KEY,
+                        help="requêtes quotidiennes laissées au trafic réel par clé")
+    parser.add_argument("--concurrency", type=int, default=2, help="générations simultanées (défaut: 2)")
+    parser.add_argument("--once", action="store_true", help="s'arrêter quand le surplus du jour est consommé")
+    parser.add_argument("--reset", action="store_true", help="repartir du début (les caches existants restent sautés)")
+    parser.add_argument("--dry-run", action="store_true", help="afficher le plan sans appeler Gemini")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    book_ids = [b.strip().upper() for b in args.books.split(",") if b.strip()] or [b.book_id for b in BIBLE_BOOKS]
+    unknown = [b for b in book_ids if b not in BOOKS_BY_ID]
+    if unknown:
+        print(f"❌ Livres inconnus: {', '.join(unknown)}")
+        return 2
+    if not server.GEMINI_KEYS:
+        print("❌ Aucune clé GEMINI_API_KEY_* configurée")
+        return 2
+    if not args.skip_verses and not server.bible_corpus.available:
+        logging.warning("⚠️  Corpus local absent: nombre de versets par chapitre inconnu, versets ignorés")
+
+    spare_per_key = max(0, server.GEMINI_DAILY_BUDGET_PER_KEY - args.reserve_per_key)
+    spare_budget = spare_per_key * len(server.GEMINI_KEYS)
+    # Le scheduler local ne distribue que le surplus de chaque clé
+    server.gemini_scheduler.daily_budget = spare_per_key
+
+    units = list(iter_units(book_ids, not args.skip_rubriques, not args.skip_verses, args.verse_batch))
+    job = PregenerationJob(args.job_name, spare_budget, args.once)
+    await job.load()
+    # Sans marquage, les entrées antérieures au versionnement des prompts seraient toutes périmées
+    await server.tag_unversioned_cache_entries()
+    # Sans les dictionnaires, les entrées compressées avec dictionnaire seraient vues comme absentes
+    await server.load_compression_dictionaries()
+    if args.reset:
+        job.state["cursor"] = None
+
+    print(f"📋 Job {args.job_name}: {len(units)} unités, surplus quotidien {spare_budget} requêtes "
+          f"({spare_per_key}/clé × {len(server.GEMINI_KEYS)} clés), déjà consommé: {job.state['quota_used']}")
+    if args.dry_run:
+        print(f"   Curseur: {job.state.get('cursor') or 'début'}")
+        return 0
+
+    try:
+        await job.run(units, args.concurrency)
+    except QuotaSpent as e:
+        print(f"⏸️  Job interrompu ({e}) — relancer la même commande pour reprendre")
+        return 1
+    finally:
+        await job.checkpoint()
+        await server.bible_api_client.aclose()
+        await server.gemini_http_client.aclose()
+        server.client.close()
+
+    print(f"🎉 Job terminé: {job.state['generated']} générées, {job.state['cached']} déjà en cache, "
+          f"{job.state['failed']} en échec")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,99 @@
+"""
+Versions des prompts de génération.
+
+Chaque entrée de cache est marquée `prompt_version` : une empreinte du modèle
+et du prompt rendu avec des valeurs témoins (le texte du template, sans le
+passage ni le personnage). Modifier un template de `RUBRIQUE_PROMPTS` change la
+version de cette seule rubrique : ses entrées deviennent périmées (servies puis
+régénérées en arrière-plan), les autres rubriques et collections ne bougent pas.
+
+- une version par (collection, variante) : numéro de rubrique, mode de
+  l'histoire d'un personnage, ou variante unique pour les versets
+- les entrées antérieures au versionnement sont marquées une fois avec la
+  version courante (elles ont été générées avec ces prompts)
+"""
+
+import hashlib
+import logging
+from typing import Dict, Hashable, Optional
+
+
+def prompt_version(rendered_template: str, model: str) -> str:
+    """Empreinte courte (modèle + prompt rendu)."""
+    return hashlib.sha1(f"{model}\n{rendered_template}".encode("utf-8")).hexdigest()[:12]
+
+
+class PromptVersions:
+    """
+    Versions courantes par collection de cache. `variant_fields` donne, pour
+    chaque collection, le champ du document qui désigne la variante (None : une
+    seule variante pour toute la collection).
+    """
+
+    def __init__(self, model: str, variant_fields: Dict[str, Optional[str]]):
+        self.model = model
+        self.variant_fields = variant_fields
+        self._versions: Dict[str, Dict[Hashable, str]] = {name: {} for name in variant_fields}
+
+    def register(self, collection: str, variant: Hashable, rendered_template: str) -> str:
+        version = prompt_version(rendered_template, self.model)
+        self._versions[collection][variant] = version
+        return version
+
+    def current(self, collection: str, variant: Hashable = None) -> Optional[str]:
+        return self._versions.get(collection, {}).get(variant)
+
+    def for_doc(self, collection: str, doc: dict) -> Optional[str]:
+        """Version attendue pour un document de cache (None : variante non versionnée)."""
+        field = self.variant_fields.get(collection)
+        return self.current(collection, doc.get(field) if field else None)
+
+    def fields(self, collection: str, variant: Hashable = None) -> dict:
+        """Champs à écrire dans un nouveau document de cache."""
+        return {"prompt_version": self.current(collection, variant), "model": self.model}
+
+    async def tag_unversioned(self, db) -> Dict[str, int]:
+        """Marque les entrées sans `prompt_version` avec la version courante (idempotent)."""
+        tagged = {}
+        for collection, versions in self._versions.items():
+            field = self.variant_fields[collection]
+            count = 0
+            for variant, version in versions.items():
+                query = {"prompt_version": {"$exists": False}}
+                if field:
+                    query[field] = variant
+                result = await db[collection].update_many(
+                    query, {"$set": {"prompt_version": version, "model": self.model}}
+                )
+                count += result.modified_count
+            tagged[collection] = count
+            if count:
+                logging.info(f"🏷️  {count} entrée(s) de {collection} marquée(s) avec la version de prompt courante")
+        return tagged
+
+    async def outdated_counts(self, db) -> Dict[str, dict]:
+        """Entrées à jour / périmées par variante (une agrégation par collection)."""
+        report = {}
+        for collection, versions in self._versions.items():
+            field = self.variant_fields[collection]
+            rows = db[collection].aggregate([
+                {"$group": {"_id": {"variant": f"${field}" if field else None, "version": "$prompt_version"},
+                            "count": {"$sum": 1}}}
+            ])
+            variants = {}
+            async for row in rows:
+                variant = row["_id"].get("variant")
+                current = versions.get(variant)
+                entry = variants.setdefault(str(variant), {"current_version": current, "up_to_date": 0, "outdated": 0})
+                entry["up_to_date" if row["_id"].get("version") == current else "outdated"] += row["count"]
+            report[collection] = variants
+        return report
+
+    def snapshot(self) -> dict:
+        return {
+            "model": self.model,
+            "versions": {
+                collection: {str(variant): version for variant, version in versions.items()}
+                for collection, versions in self._versions.items()
+            },
+        }
@@ -1,6 +1,8 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Match
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
@@ -11,7 +13,32 @@ import uuid
 from datetime import datetime, timezone
 import time
 import random
+import asyncio
+import hashlib
+import httpx
 from emergentintegrations.llm.chat import LlmChat, UserMessage
+from gemini_backoff import GeminiRetryEngine, KeyUnavailable, RetriesExhausted, RetryStats, is_quota_error
+from gemini_scheduler import GeminiKeyScheduler
+from gemini_hedging import HedgingPolicy
+from circuit_breaker import CircuitBreakers, CircuitOpenError
+from llm_client_pool import LlmClientPool
+from prompt_versions import PromptVersions
+from cache_invalidation import CacheInvalidator, InvalidationFilter, invalidation_view
+from singleflight import SingleFlight
+from generation_cache import build_cache_layers
+from content_codec import ContentCodec
+from generation_jobs import GenerationJobQueue, job_view
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, STAGE_SECONDS
+from cache_indexes import ensure_cache_indexes, index_usage_report
+from gemini_stream import VerseSectionSplitter, check_gemini_model, sse_event, stream_gemini_text
+from health_monitor import KeyHealthMonitor
+from key_state import SharedKeyState, create_key_state_store
+from bible_books import BOOKS_BY_ID, fold_name
+from bible_corpus import BibleCorpus
+from bible_api_client import BibleApiClient
+from concordance import ConcordanceIndex
+from passage_normalizer import display_passage, parse_passage, passage_cache_key, resolve_book
+from verse_sections import compose_verse_sections, missing_verse_runs, split_verse_sections, verse_cache_key
 
 
 ROOT_DIR = Path(__file__).parent
@@ -46,10 +73,143 @@ GEMINI_KEYS = [key for key in GEMINI_KEYS if key]
 BIBLE_ID = os.environ.get('BIBLE_ID', '')
 BIBLE_API_KEY = os.environ.get('BIBLE_API_KEY', '')
 
+# Client api.bible partagé (HTTP/2, pool de connexions, cache des textes de versets)
+BIBLE_API_CONCURRENCY = int(os.environ.get('BIBLE_API_CONCURRENCY', '8'))
+bible_api_client = BibleApiClient(BIBLE_API_KEY, BIBLE_ID or 'de4e12af7f28f599-02', BIBLE_API_CONCURRENCY)
+
+# Corpus local Louis Segond (mmap) : texte des versets sans appel réseau
+LSG_CORPUS_PATH = os.environ.get('LSG_CORPUS_PATH', str(ROOT_DIR / 'data' / 'lsg.tsv'))
+bible_corpus = BibleCorpus.load(LSG_CORPUS_PATH)
+
+# Index inversé de concordance, construit au démarrage depuis le corpus local
+CONCORDANCE_PAGE_SIZE = int(os.environ.get('CONCORDANCE_PAGE_SIZE', '50'))
+CONCORDANCE_MAX_PAGE_SIZE = 200
+concordance_index = ConcordanceIndex()
+
+# Modèle et message système communs à toutes les générations
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+GEMINI_SYSTEM_MESSAGE = "Tu es un expert biblique et théologien spécialisé dans l'étude des Écritures."
+
+# Clients LlmChat préparés à l'avance (un client et une session neufs par appel, construits au retour) ; le nombre
+# de clients par clé borne aussi les appels concurrents sur une clé
+GEMINI_CLIENTS_PER_KEY = int(os.environ.get('GEMINI_CLIENTS_PER_KEY', '4'))
+
+def build_llm_chat(key_index: int, session_id: str):
+    return LlmChat(
+        api_key=GEMINI_KEYS[key_index],
+        session_id=session_id,
+        system_message=GEMINI_SYSTEM_MESSAGE
+    ).with_model("gemini", GEMINI_MODEL)
+
+gemini_clients = LlmClientPool(build_llm_chat, len(GEMINI_KEYS), GEMINI_CLIENTS_PER_KEY)
+
 # Index de la clé actuellement utilisée
 current_gemini_key_index = 0
 gemini_key_usage_count = {i: 0 for i in range(len(GEMINI_KEYS))}
 
+# Moteur de retry/backoff non bloquant (cooldown par clé + délais exponentiels avec jitter)
+gemini_retry_engine = GeminiRetryEngine()
+
+# Ordonnanceur token bucket : RPM et budget quotidien par clé (quotas gratuits Gemini)
+GEMINI_RPM_PER_KEY = int(os.environ.get('GEMINI_RPM_PER_KEY', '15'))
+GEMINI_DAILY_BUDGET_PER_KEY = int(os.environ.get('GEMINI_DAILY_BUDGET_PER_KEY', '50'))
+gemini_scheduler = GeminiKeyScheduler(len(GEMINI_KEYS), GEMINI_RPM_PER_KEY, GEMINI_DAILY_BUDGET_PER_KEY)
+
+# État des clés partagé entre workers uvicorn (local, mongo ou shm) : usage, budget du jour,
+# cooldown et dernière erreur. Les buckets RPM restent propres à chaque process.
+KEY_STATE_BACKEND = os.environ.get('KEY_STATE_BACKEND', 'local')
+KEY_STATE_REFRESH_SECONDS = int(os.environ.get('KEY_STATE_REFRESH_SECONDS', '2'))
+KEY_STATE_SHM_NAME = os.environ.get('KEY_STATE_SHM_NAME', 'bible_gemini_keys')
+
+# Disjoncteur par clé : au-delà du seuil d'échecs consécutifs (plus tolérant pour le quota),
+# la clé est écartée sans appel, puis une seule requête de sonde est tentée (half-open)
+gemini_breakers = CircuitBreakers(
+    len(GEMINI_KEYS),
+    hard_threshold=int(os.environ.get('BREAKER_HARD_FAILURES', '3')),
+    quota_threshold=int(os.environ.get('BREAKER_QUOTA_FAILURES', '6')),
+    hard_open_seconds=int(os.environ.get('BREAKER_HARD_OPEN_SECONDS', '120')),
+    quota_open_seconds=int(os.environ.get('BREAKER_QUOTA_OPEN_SECONDS', '60')),
+)
+
+# Hedging optionnel : une tentative plus lente que le p95 de l'endpoint est doublée sur une
+# autre clé ; le budget (en % des appels de l'endpoint) borne le quota supplémentaire consommé
+GEMINI_HEDGING = os.environ.get('GEMINI_HEDGING', 'off')
+gemini_hedging = HedgingPolicy({
+    "rubrique": int(os.environ.get('HEDGE_BUDGET_RUBRIQUE_PERCENT', '10')),
+    "verses": int(os.environ.get('HEDGE_BUDGET_VERSES_PERCENT', '10')),
+    "character_history": int(os.environ.get('HEDGE_BUDGET_CHARACTERS_PERCENT', '5')),
+}, enabled=GEMINI_HEDGING == 'on', min_samples=int(os.environ.get('HEDGE_MIN_SAMPLES', '20')))
+
+# Fusion des générations identiques en cours (clé = "<collection>:<cache_key>")
+generation_flights = SingleFlight()
+
+# Cache mémoire LRU/TTL devant les collections de cache MongoDB
+MEMORY_CACHE_TTL_SECONDS = int(os.environ.get('MEMORY_CACHE_TTL_SECONDS', '3600'))
+# Compression zstd du markdown dans Mongo ('off' pour écrire en clair ; lecture des deux formats)
+CACHE_COMPRESSION = os.environ.get('CACHE_COMPRESSION', 'zstd')
+CACHE_COMPRESSION_LEVEL = int(os.environ.get('CACHE_COMPRESSION_LEVEL', '12'))
+content_codec = ContentCodec(CACHE_COMPRESSION == 'zstd', CACHE_COMPRESSION_LEVEL)
+# Version des prompts (empreinte modèle + template rendu) par rubrique / mode : une entrée
+# générée avec un autre prompt est périmée, sans toucher aux autres entrées
+prompt_versions = PromptVersions(GEMINI_MODEL, {
+    "rubriques_cache": "rubrique_number",
+    "verses_cache": None,
+    "character_history_cache": "mode",
+})
+cache_layers = build_cache_layers(db, {
+    "rubriques_cache": int(os.environ.get('MEMORY_CACHE_RUBRIQUES_MB', '64')) * 1024 * 1024,
+    "verses_cache": int(os.environ.get('MEMORY_CACHE_VERSES_MB', '32')) * 1024 * 1024,
+    "character_history_cache": int(os.environ.get('MEMORY_CACHE_CHARACTERS_MB', '16')) * 1024 * 1024,
+}, MEMORY_CACHE_TTL_SECONDS, {
+    # Durée de fraîcheur par collection (0 = jamais périmé) : au-delà, l'entrée est
+    # servie immédiatement et régénérée en arrière-plan (stale-while-revalidate)
+    "rubriques_cache": int(os.environ.get('RUBRIQUES_FRESH_DAYS', '180')) * 24 * 3600,
+    "verses_cache": int(os.environ.get('VERSES_FRESH_DAYS', '180')) * 24 * 3600,
+    "character_history_cache": int(os.environ.get('CHARACTERS_FRESH_DAYS', '90')) * 24 * 3600,
+}, content_codec, prompt_versions)
+rubriques_store = cache_layers["rubriques_cache"]
+verses_store = cache_layers["verses_cache"]
+character_history_store = cache_layers["character_history_cache"]
+
+# Invalidations sélectives en arrière-plan (lots parcourus par cache_key, pause entre deux lots)
+INVALIDATION_BATCH_SIZE = int(os.environ.get('INVALIDATION_BATCH_SIZE', '200'))
+INVALIDATION_PAUSE_MS = int(os.environ.get('INVALIDATION_PAUSE_MS', '200'))
+cache_invalidator = CacheInvalidator(
+    db.cache_invalidations, cache_layers, INVALIDATION_BATCH_SIZE, INVALIDATION_PAUSE_MS / 1000
+)
+
+# File de jobs Mongo pour les générations longues (le client récupère le résultat plus tard)
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '180'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+generation_jobs = GenerationJobQueue(db.generation_jobs, JOB_WORKERS, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS)
+
+# Métriques Prometheus exposées par GET /metrics (étapes cache/Mongo déclarées dans metrics.py)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Latence par endpoint (jusqu'aux en-têtes pour les flux SSE)", ("endpoint", "method")
+)
+HTTP_REQUESTS = REGISTRY.counter("http_requests", "Requêtes par endpoint et code HTTP", ("endpoint", "method", "status"))
+GEMINI_KEY_REQUESTS = REGISTRY.counter(
+    "gemini_key_requests", "Appels Gemini par clé et résultat (success, quota_429, error)", ("key", "outcome")
+)
+FALLBACK_ACTIVATIONS = REGISTRY.counter(
+    "fallback_activations", "Bascules de secours (bible_api, stream_to_blocking)", ("kind",)
+)
+GEMINI_HEDGES = REGISTRY.counter(
+    "gemini_hedges", "Requêtes Gemini doublées par endpoint (won = la seconde clé a répondu en premier)",
+    ("endpoint", "result")
+)
+GEMINI_CALLS_IN_FLIGHT = REGISTRY.gauge("gemini_calls_in_flight", "Appels Gemini en cours (hors streaming)")
+REGISTRY.gauge("generations_in_flight", "Générations single-flight en cours (y compris en arrière-plan)",
+               function=lambda: generation_flights.in_flight())
+REGISTRY.gauge("generation_jobs_running", "Jobs de génération en cours dans ce process",
+               function=lambda: generation_jobs.running)
+REGISTRY.gauge("gemini_key_breaker_open", "Disjoncteur par clé (0 = closed, 1 = open, 0.5 = half-open)", ("key",),
+               function=lambda: {(key_index + 1,): {"closed": 0, "open": 1, "half_open": 0.5}[gemini_breakers.state(key_index)]
+                                 for key_index in range(len(GEMINI_KEYS))})
+REGISTRY.gauge("gemini_key_daily_used", "Requêtes du jour par clé (budget local du scheduler)", ("key",),
+               function=lambda: {(key_index + 1,): used for key_index, used in gemini_scheduler.daily_used.items()})
+
 # Fonction pour obtenir la clé Gemini active avec rotation automatique
 async def get_gemini_key():
     """Retourne la clé Gemini active et gère la rotation."""
@@ -64,66 +224,144 @@ async def rotate_gemini_key():
     """Passe à la clé Gemini suivante."""
     global current_gemini_key_index
     current_gemini_key_index = (current_gemini_key_index + 1) % len(GEMINI_KEYS)
+    health_monitor.set_active_key(current_gemini_key_index)
+    await key_state.set_active_key(current_gemini_key_index)
     logging.info(f"Rotation vers clé Gemini #{current_gemini_key_index + 1}")
     return current_gemini_key_index
 
+def gemini_key_order():
+    """
+    Ordre de préférence des clés : la plus grande marge d'abord, hors clés
+    épuisées (budget local ou partagé entre workers) ou disjonctées.
+    """
+    return [
+        key_index for key_index in gemini_scheduler.ordered_keys(preferred=current_gemini_key_index)
+        if key_state.is_available(key_index) and gemini_breakers.is_available(key_index)
+    ]
+
+def gemini_retry_after():
+    """Délai avant qu'une clé utilisable récupère un jeton (None : rien à attendre)."""
+    return gemini_scheduler.seconds_until_available([
+        key_index for key_index in range(len(GEMINI_KEYS))
+        if key_state.is_available(key_index) and gemini_breakers.is_available(key_index)
+    ])
+
+async def reserve_gemini_key(key_index: int):
+    """
+    Barrières avant un appel : disjoncteur, budget local, budget partagé.
+    Le budget n'est consommé que si toutes acceptent (sinon il est rendu).
+    Un refus lève KeyUnavailable (CircuitOpenError pour le disjoncteur) :
+    aucune requête n'est partie, ce n'est donc ni un 429 ni une erreur de la clé.
+    """
+    if not gemini_breakers.acquire(key_index):
+        # Sonde half-open déjà en cours sur cette clé (appel concurrent)
+        raise CircuitOpenError(f"Clé Gemini #{key_index + 1} disjonctée")
+    if not gemini_scheduler.reserve(key_index):
+        gemini_breakers.release(key_index)
+        raise KeyUnavailable(f"Budget local épuisé pour clé Gemini #{key_index + 1}")
+    try:
+        reserved = await key_state.reserve(key_index)
+    except asyncio.CancelledError:
+        gemini_scheduler.refund(key_index)
+        gemini_breakers.release(key_index)
+        raise
+    if not reserved:
+        gemini_scheduler.refund(key_index)
+        gemini_breakers.release(key_index)
+        raise KeyUnavailable(f"Budget partagé épuisé pour clé Gemini #{key_index + 1}")
+
 async def call_gemini_with_rotation(prompt: str, max_retries: int = None, use_bible_api_fallback: bool = True) -> str:
     """
     Appelle Gemini avec rotation automatique en cas de quota dépassé.
     Si toutes les clés Gemini sont épuisées, bascule sur Bible API.
     """
+    content, _ = await call_gemini_with_stats(prompt, max_retries, use_bible_api_fallback)
+    return content
+
+async def call_gemini_with_stats(prompt: str, max_retries: int = None, use_bible_api_fallback: bool = True,
+                                 endpoint: Optional[str] = None):
+    """
+    Comme call_gemini_with_rotation, mais retourne (contenu, RetryStats).
+    Les attentes entre tentatives sont des asyncio.sleep : la boucle d'événements
+    continue de servir les autres requêtes (cache hits inclus) pendant la rotation.
+    `endpoint` (rubrique, verses, character_history) active le hedging de cet
+    endpoint si GEMINI_HEDGING=on ; sans endpoint (pré-génération), pas de hedging.
+    """
     if max_retries is None:
         max_retries = len(GEMINI_KEYS)
     
-    last_gemini_error = None
-    
-    # Essayer toutes les clés Gemini
-    for attempt in range(max_retries):
+    async def attempt(key_index: int):
+        global current_gemini_key_index
+        await reserve_gemini_key(key_index)
+        # La clé choisie (hors cooldown) devient la clé active
+        current_gemini_key_index = key_index
+        health_monitor.set_active_key(key_index)
+        logging.info(f"Tentative avec clé Gemini #{key_index + 1}")
+        
+        # Envoyer le message avec un client du pool de la clé
+        user_message = UserMessage(text=prompt)
+        started = time.perf_counter()
         try:
-            api_key, key_index = await get_gemini_key()
-            
-            logging.info(f"Tentative {attempt + 1}/{max_retries} avec clé Gemini #{key_index + 1}")
-            
-            # Initialiser le chat Gemini
-            chat = LlmChat(
-                api_key=api_key,
-                session_id=f"generation-{uuid.uuid4()}",
-                system_message="Tu es un expert biblique et théologien spécialisé dans l'étude des Écritures."
-            ).with_model("gemini", "gemini-2.0-flash-exp")
-            
-            # Envoyer le message
-            user_message = UserMessage(text=prompt)
-            response = await chat.send_message(user_message)
-            
-            # NE COMPTER QUE LES SUCCÈS (pas les échecs)
-            gemini_key_usage_count[key_index] += 1
-            
-            logging.info(f"✅ Succès avec clé Gemini #{key_index + 1} (usage: {gemini_key_usage_count[key_index]})")
-            return response
-            
+            async with gemini_clients.client(key_index) as chat:
+                response = await chat.send_message(user_message)
+        except asyncio.CancelledError:
+            # Perdant d'un hedge : sa durée est une borne basse, utile pour ne pas sous-estimer le p95
+            gemini_hedging.observe(endpoint, time.perf_counter() - started)
+            gemini_breakers.release(key_index)
+            raise
         except Exception as e:
-            error_str = str(e).lower()
-            last_gemini_error = e
-            
-            # Vérifier si c'est une erreur de quota
-            if "quota" in error_str or "rate_limit" in error_str or "429" in error_str or "resource_exhausted" in error_str:
-                logging.warning(f"⚠️  Quota atteint pour clé Gemini #{key_index + 1}, rotation vers clé suivante...")
-                await rotate_gemini_key()
-                time.sleep(1)
-                continue
-            else:
-                logging.error(f"❌ Erreur avec clé Gemini #{key_index + 1}: {e}")
-                await rotate_gemini_key()
-                continue
+            gemini_breakers.record_failure(key_index, is_quota_error(e), str(e))
+            raise
+        gemini_hedging.observe(endpoint, time.perf_counter() - started)
+        gemini_breakers.record_success(key_index)
+        
+        # NE COMPTER QUE LES SUCCÈS (pas les échecs)
+        gemini_key_usage_count[key_index] += 1
+        health_monitor.record_success(key_index)
+        GEMINI_KEY_REQUESTS.inc(key=key_index + 1, outcome="success")
+        await key_state.record_success(key_index)
+        
+        logging.info(f"✅ Succès avec clé Gemini #{key_index + 1} (usage: {gemini_key_usage_count[key_index]})")
+        return response
+    
+    async def on_error(key_index: int, error: Exception, quota: bool):
+        health_monitor.record_failure(key_index, error, quota)
+        GEMINI_KEY_REQUESTS.inc(key=key_index + 1, outcome="quota_429" if quota else "error")
+        if quota:
+            logging.warning(f"⚠️  Quota atteint pour clé Gemini #{key_index + 1}, rotation vers clé suivante...")
+            gemini_scheduler.record_quota_error(key_index, error)
+        else:
+            logging.error(f"❌ Erreur avec clé Gemini #{key_index + 1}: {error}")
+        # Cooldown déjà appliqué par le moteur : il est publié aux autres workers
+        await key_state.record_failure(key_index, error, quota)
+        await rotate_gemini_key()
+    
+    gemini_hedging.start_call(endpoint)
+    try:
+        with GEMINI_CALLS_IN_FLIGHT.track(), STAGE_SECONDS.time(stage="gemini_call", collection=""):
+            content, stats = await gemini_retry_engine.run(
+                attempt, gemini_key_order, max_retries,
+                on_error=on_error, retry_after=gemini_retry_after,
+                hedge_after=gemini_hedging.hedge_after(endpoint),
+                may_hedge=lambda: gemini_hedging.may_hedge(endpoint)
+            )
+        if stats.hedges:
+            GEMINI_HEDGES.inc(endpoint=endpoint, result="won" if stats.hedge_won else "lost")
+        return content, stats
+    except RetriesExhausted as exhausted:
+        stats = exhausted.stats
+        last_gemini_error = exhausted.last_error
     
     # Toutes les clés Gemini sont épuisées, essayer Bible API en fallback
-    if use_bible_api_fallback and BIBLE_API_KEY and BIBLE_ID:
+    if use_bible_api_fallback and (bible_corpus.available or (BIBLE_API_KEY and BIBLE_ID)):
         logging.warning(f"⚠️  Toutes les clés Gemini épuisées, tentative avec Bible API (clé #5)...")
         try:
             # Générer du contenu avec Bible API comme fallback
+            FALLBACK_ACTIVATIONS.inc(kind="bible_api")
             fallback_content = await generate_with_bible_api_fallback(prompt)
             logging.info(f"✅ Succès avec Bible API (clé #5) en fallback")
-            return fallback_content
+            stats.fallback_used = True
+            return fallback_content, stats
         except Exception as bible_error:
             logging.error(f"❌ Bible API également épuisée: {bible_error}")
             raise HTTPException(
@@ -137,6 +375,152 @@ async def call_gemini_with_rotation(prompt: str, max_retries: int = None, use_bi
         detail=f"Toutes les clés Gemini ont atteint leur quota. Dernière erreur: {str(last_gemini_error)}"
     )
 
+# Client HTTP partagé pour le streaming Gemini (API REST, connexions réutilisées)
+gemini_http_client = httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0))
+
+async def open_gemini_stream(prompt: str):
+    """
+    Ouvre un stream Gemini avec rotation des clés.
+    On change de clé tant qu'aucun texte n'a été reçu (quota, erreur réseau...) ;
+    une fois le premier morceau reçu, la réponse est relayée jusqu'au bout.
+    Retourne (retry_stats, chunks) où chunks est un itérateur asynchrone de texte
+    (à fermer avec aclose() si on l'abandonne avant la fin).
+    Lève RetriesExhausted si aucune clé n'a pu démarrer le stream.
+    """
+    global current_gemini_key_index
+    stats = RetryStats()
+    last_error = None
+    skipped = []
+    
+    while stats.attempts < len(GEMINI_KEYS):
+        candidates = [
+            k for k in gemini_key_order()
+            if k not in stats.keys_tried and k not in skipped and not gemini_retry_engine.cooldowns.is_cooling(k)
+        ]
+        if not candidates:
+            break
+        key_index = candidates[0]
+        try:
+            await reserve_gemini_key(key_index)
+        except KeyUnavailable:
+            # Refus avant l'envoi : clé suivante, sans compter de tentative
+            skipped.append(key_index)
+            stats.keys_skipped += 1
+            continue
+        stats.attempts += 1
+        stats.keys_tried.append(key_index)
+        current_gemini_key_index = key_index
+        health_monitor.set_active_key(key_index)
+        
+        stream = stream_gemini_text(gemini_http_client, GEMINI_KEYS[key_index], prompt, GEMINI_SYSTEM_MESSAGE, GEMINI_MODEL)
+        try:
+            first_chunk = await stream.__anext__()
+        except asyncio.CancelledError:
+            gemini_breakers.release(key_index)
+            raise
+        except StopAsyncIteration:
+            last_error = Exception(f"Réponse vide de la clé Gemini #{key_index + 1}")
+            gemini_breakers.record_failure(key_index, False, str(last_error))
+            continue
+        except Exception as e:
+            last_error = e
+            quota = is_quota_error(e)
+            gemini_breakers.record_failure(key_index, quota, str(e))
+            gemini_retry_engine.cooldowns.penalize(key_index, quota)
+            health_monitor.record_failure(key_index, e, quota)
+            GEMINI_KEY_REQUESTS.inc(key=key_index + 1, outcome="quota_429" if quota else "error")
+            if quota:
+                logging.warning(f"⚠️  Quota atteint pour clé Gemini #{key_index + 1} (stream), rotation...")
+                gemini_scheduler.record_quota_error(key_index, e)
+            else:
+                logging.error(f"❌ Erreur stream avec clé Gemini #{key_index + 1}: {e}")
+            await key_state.record_failure(key_index, e, quota)
+            await rotate_gemini_key()
+            await asyncio.sleep(gemini_retry_engine.policy.compute_delay(stats.retries))
+            stats.retries += 1
+            continue
+        
+        gemini_retry_engine.cooldowns.reset(key_index)
+        gemini_breakers.record_success(key_index)
+        gemini_key_usage_count[key_index] += 1
+        health_monitor.record_success(key_index)
+        GEMINI_KEY_REQUESTS.inc(key=key_index + 1, outcome="success")
+        await key_state.record_success(key_index)
+        logging.info(f"✅ Stream démarré avec clé Gemini #{key_index + 1}")
+        stats.key_index = key_index
+        
+        async def chunks():
+            try:
+                yield first_chunk
+                async for chunk in stream:
+                    yield chunk
+            finally:
+                # Ferme la réponse httpx (et rend la connexion) même si le lecteur abandonne
+                await stream.aclose()
+        
+        return stats, chunks()
+    
+    raise RetriesExhausted(stats, last_error)
+
+async def stream_generation(prompt: str):
+    """
+    Itérateur asynchrone de (texte, retry_stats).
+    Si aucun stream ne peut démarrer, bascule sur la génération classique
+    (avec fallback Bible API) et renvoie tout le contenu en un seul morceau.
+    """
+    try:
+        retry_stats, chunks = await open_gemini_stream(prompt)
+    except RetriesExhausted as exhausted:
+        logging.warning(f"⚠️  Streaming Gemini indisponible ({exhausted}), génération classique")
+        FALLBACK_ACTIVATIONS.inc(kind="stream_to_blocking")
+        content, retry_stats = await call_gemini_with_stats(prompt)
+        yield content, retry_stats
+        return
+    try:
+        async for chunk in chunks:
+            yield chunk, retry_stats
+    finally:
+        await chunks.aclose()
+
+async def consume_stream_generation(prompt: str, emit) -> tuple:
+    """
+    Génération streamée pour SingleFlight.stream : relaie chaque morceau à `emit`
+    et retourne (contenu complet, retry_stats), comme call_gemini_with_stats.
+    """
+    parts = []
+    retry_stats = None
+    generation = stream_generation(prompt)
+    try:
+        async for chunk, retry_stats in generation:
+            parts.append(chunk)
+            emit(chunk)
+    finally:
+        await generation.aclose()
+    return "".join(parts), retry_stats
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def api_used_label(stats) -> str:
+    """Libellé "api_used" d'une génération, d'après la clé réellement utilisée."""
+    if stats.fallback_used:
+        return "bible_api_fallback"
+    return f"gemini_{stats.key_index + 1}"
+
+async def fetch_verse_texts(book_id: str, chapter, start_verse: int, end_verse: int) -> dict:
+    """
+    Texte Louis Segond des versets {verset: texte ou None}.
+    Lu dans le corpus local (mmap) ; seuls les versets absents du corpus sont
+    demandés à la Bible API (un appel groupé, puis cache des textes).
+    """
+    verse_texts = bible_corpus.verse_range(book_id, chapter, start_verse, end_verse)
+    missing = [verse_num for verse_num, text in verse_texts.items() if text is None]
+    if not missing or not (BIBLE_API_KEY and BIBLE_ID):
+        return verse_texts
+    
+    logging.info(f"[BIBLE API] {len(missing)} verset(s) absent(s) du corpus local, récupération réseau")
+    verse_texts.update(await bible_api_client.fetch_verses(book_id, chapter, missing))
+    return verse_texts
+
 async def generate_with_bible_api_fallback(prompt: str) -> str:
     """
     Génère du contenu en utilisant Bible API comme source de texte biblique.
@@ -165,89 +549,67 @@ async def generate_with_bible_api_fallback(prompt: str) -> str:
     
     logging.info(f"[BIBLE API] Récupération: {book_name} {chapter}:{start_verse}-{end_verse}")
     
-    # Mapper les noms français vers les IDs Bible API
-    book_mapping = {
-        "genèse": "GEN", "exode": "EXO", "lévitique": "LEV", "nombres": "NUM",
-        "deutéronome": "DEU", "josué": "JOS", "juges": "JDG", "ruth": "RUT",
-        "1 samuel": "1SA", "2 samuel": "2SA", "1 rois": "1KI", "2 rois": "2KI",
-        "matthieu": "MAT", "marc": "MRK", "luc": "LUK", "jean": "JHN",
-        "actes": "ACT", "romains": "ROM", "1 corinthiens": "1CO", "2 corinthiens": "2CO",
-        "jacques": "JAS", "1 pierre": "1PE", "2 pierre": "2PE", "apocalypse": "REV"
-    }
+    book = resolve_book(book_name)
+    book_id = book.book_id if book else "GEN"
     
-    book_id = book_mapping.get(book_name.lower(), "GEN")
+    # Texte des versets : corpus local d'abord, Bible API pour les manquants
+    verse_texts = await fetch_verse_texts(book_id, chapter, start_verse, end_verse)
     
-    # Construire le contenu verset par verset avec Bible API
+    # Construire le contenu verset par verset
     content_parts = []
     
-    async with httpx.AsyncClient() as client:
-        for verse_num in range(start_verse, end_verse + 1):
-            try:
-                # Récupérer le texte du verset via Bible API
-                verse_id = f"{book_id}.{chapter}.{verse_num}"
-                response = await client.get(
-                    f"https://api.scripture.api.bible/v1/bibles/{BIBLE_ID}/verses/{verse_id}",
-                    headers={"api-key": BIBLE_API_KEY},
-                    params={"content-type": "text"},
-                    timeout=10.0
-                )
+    for verse_num in range(start_verse, end_verse + 1):
+        verse_text = verse_texts.get(verse_num)
+        if verse_text:
+            # Créer le contenu structuré avec Bible API - Contenu unique par verset
+            # Variations basées sur le numéro de verset pour éviter les répétitions
+            
+            # Variations pour CHAPITRE (basées sur le numéro de verset)
+            chapitre_variations = [
+                f"Le verset {verse_num} ouvre une section importante du chapitre {chapter} de {book_name}. Placé stratégiquement au début de la péricope, il établit le cadre pour les enseignements qui suivent et introduit les thèmes centraux que l'auteur développera progressivement.",
+                f"Situé au cœur du chapitre {chapter}, le verset {verse_num} marque un tournant dans la narration de {book_name}. Ce verset crée un pont entre les sections précédentes et suivantes, enrichissant la compréhension globale du message divin.",
+                f"Le verset {verse_num} du chapitre {chapter} de {book_name} amplifie le thème principal développé depuis le début. L'auteur biblique utilise ce verset pour approfondir l'enseignement et préparer les développements théologiques ultérieurs.",
+                f"Dans la structure du chapitre {chapter}, le verset {verse_num} occupe une position clé. Il fait écho aux versets antérieurs tout en anticipant la conclusion, créant une cohérence narrative et doctrinale remarquable dans {book_name}.",
+                f"Le verset {verse_num} représente un sommet dans la progression du chapitre {chapter} de {book_name}. L'auteur inspiré concentre ici des vérités essentielles qui éclairent l'ensemble du passage et révèlent la sagesse divine.",
+            ]
+            
+            # Variations pour CONTEXTE HISTORIQUE
+            contexte_variations = [
+                f"Le verset {verse_num} de {book_name} {chapter} s'inscrit dans l'Alliance mosaïque et reflète les réalités du Proche-Orient ancien. Les pratiques sociales, les structures familiales et les systèmes religieux de l'époque imprègnent ce texte. L'étude des manuscrits hébreux anciens révèle que certains mots-clés de ce verset portent des connotations juridiques et cultuelles spécifiques à la culture israélite. Les découvertes archéologiques confirment l'authenticité du contexte décrit.",
+                f"Rédigé dans un contexte de tension politique et spirituelle, le verset {verse_num} de {book_name} {chapter} témoigne des défis auxquels le peuple de Dieu faisait face. Les influences des nations environnantes, les pressions culturelles et les tentations idolâtres forment l'arrière-plan de ce passage. Les termes originaux utilisés ici révèlent une polémique contre les faux cultes et un appel à la fidélité à l'Alliance.",
+                f"Le verset {verse_num} s'enracine dans la période de transition où Israël passait d'une structure tribale à une monarchie unifiée. Ce contexte socio-politique a profondément marqué la rédaction de {book_name} {chapter}. Les coutumes mentionnées reflètent les codes légaux du Pentateuque et les traditions patriarcales. L'analyse comparative avec les textes extra-bibliques de l'époque éclaire certaines expressions idiomatiques.",
+                f"Écrit pendant l'exil ou immédiatement après, le verset {verse_num} de {book_name} {chapter} porte les marques de cette expérience traumatisante pour le peuple juif. La dispersion, la perte du Temple et les questionnements théologiques intenses se reflètent dans le vocabulaire employé. Les concepts théologiques développés ici répondent aux défis de maintenir la foi en contexte hostile.",
+                f"Le verset {verse_num} appartient à la littérature sapientiale/prophétique de l'Ancien Testament, ancrée dans les traditions orales transmises de génération en génération. Le contexte de {book_name} {chapter} révèle les préoccupations pastorales et didactiques de l'époque. Les formulations poétiques et les parallélismes hébraïques enrichissent la densité théologique du message.",
+            ]
+            
+            # Variations pour PARTIE THÉOLOGIQUE
+            theologie_variations = [
+                f"Le verset {verse_num} révèle la souveraineté absolue de Dieu sur l'histoire humaine et sa providence bienveillante. Ce texte établit un fondement doctrinal majeur concernant la nature divine : Dieu est à la fois transcendant et immanent, saint et miséricordieux. La théologie de l'Alliance est centrale ici, montrant comment Dieu se lie à son peuple par des promesses irrévocables.\n\n**Application pratique :** Face aux incertitudes modernes, ce verset {verse_num} nous appelle à une confiance radicale en Dieu. Concrètement, cela signifie abandonner nos stratégies de contrôle pour embrasser la dépendance spirituelle. Dans nos décisions quotidiennes - professionnelles, familiales, financières - nous sommes invités à rechercher d'abord la volonté divine plutôt que notre propre sagesse.\n\n**Références croisées :** Ce thème trouve des parallèles remarquables dans Psaume 46:2-4 (Dieu comme refuge), Proverbes 3:5-6 (confiance vs compréhension humaine), Jérémie 29:11 (plans de paix), Romains 8:28 (concours de toutes choses au bien), et Jacques 1:5 (demander la sagesse divine).",
+                
+                f"Ce verset {verse_num} dévoile la dimension christologique de l'Ancien Testament, préfigurant l'œuvre rédemptrice du Messie. La typologie biblique révèle comment les événements historiques annoncent les réalités spirituelles du Nouveau Testament. L'emphase sur la justice et la miséricorde divines anticipe la croix où ces deux attributs se rencontrent parfaitement.\n\n**Application pratique :** Le verset {verse_num} nous enseigne l'équilibre entre vérité et grâce dans nos relations. Au travail, cela se traduit par une intégrité sans compromis couplée à une attitude de pardon. En famille, nous devons maintenir des standards moraux tout en offrant une grâce restauratrice. Nos communautés ecclésiales doivent incarner cette double dimension.\n\n**Références croisées :** Voir Ésaïe 53:4-6 (substitution pénale), Jean 1:14 (grâce et vérité), Romains 3:21-26 (justice satisfaite), 2 Corinthiens 5:21 (échange divin), et 1 Pierre 2:24 (porter nos péchés).",
+                
+                f"Le verset {verse_num} explore la doctrine de la sanctification progressive du croyant. Il établit que la transformation spirituelle est une œuvre divine qui requiert néanmoins notre coopération active. La tension entre l'indicatif (ce que Dieu a fait) et l'impératif (comment nous devons répondre) structure l'éthique biblique présentée ici.\n\n**Application pratique :** Concrètement, ce verset {verse_num} nous appelle à cultiver des disciplines spirituelles régulières : lecture biblique matinale, prière contemplative, jeûne périodique, service communautaire. Dans nos luttes contre le péché, il nous rappelle de nous approprier notre identité en Christ plutôt que de compter sur notre volonté personnelle. La transformation vient de l'intérieur vers l'extérieur.\n\n**Références croisées :** Philippiens 2:12-13 (opérer son salut), Galates 5:16-25 (marche par l'Esprit vs chair), Romains 12:1-2 (renouvellement de l'intelligence), 2 Corinthiens 3:18 (transformation de gloire en gloire), Colossiens 3:1-17 (dépouiller/revêtir).",
+                
+                f"Ce verset {verse_num} met en lumière l'ecclésiologie biblique - la nature et la mission de l'Église. Il souligne l'appel corporatif du peuple de Dieu à être lumière dans les ténèbres et sel de la terre. La dimension communautaire de la foi transcende l'individualisme moderne, rappelant que nous sommes un corps avec des membres interdépendants.\n\n**Application pratique :** Le verset {verse_num} nous défie à vivre l'Église au-delà du dimanche matin. Pratiquement, cela implique : participer à un groupe de maison hebdomadaire, exercer nos dons spirituels au service des autres, pratiquer la correction fraternelle avec amour, porter les fardeaux mutuels dans l'intercession, et partager nos ressources matérielles avec ceux dans le besoin.\n\n**Références croisées :** Actes 2:42-47 (vie communautaire primitive), 1 Corinthiens 12:12-27 (un seul corps, plusieurs membres), Éphésiens 4:11-16 (édification mutuelle), Hébreux 10:24-25 (stimuler à l'amour), 1 Pierre 2:9-10 (sacerdoce royal).",
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    verse_text = data.get('data', {}).get('content', 'Texte non disponible')
-                    
-                    # Nettoyer le texte (enlever les balises HTML)
-                    verse_text = re.sub(r'<[^>]+>', '', verse_text).strip()
-                    
-                    # Créer le contenu structuré avec Bible API - Contenu unique par verset
-                    # Variations basées sur le numéro de verset pour éviter les répétitions
-                    
-                    # Variations pour CHAPITRE (basées sur le numéro de verset)
-                    chapitre_variations = [
-                        f"Le verset {verse_num} ouvre une section importante du chapitre {chapter} de {book_name}. Placé stratégiquement au début de la péricope, il établit le cadre pour les enseignements qui suivent et introduit les thèmes centraux que l'auteur développera progressivement.",
-                        f"Situé au cœur du chapitre {chapter}, le verset {verse_num} marque un tournant dans la narration de {book_name}. Ce verset crée un pont entre les sections précédentes et suivantes, enrichissant la compréhension globale du message divin.",
-                        f"Le verset {verse_num} du chapitre {chapter} de {book_name} amplifie le thème principal développé depuis le début. L'auteur biblique utilise ce verset pour approfondir l'enseignement et préparer les développements théologiques ultérieurs.",
-                        f"Dans la structure du chapitre {chapter}, le verset {verse_num} occupe une position clé. Il fait écho aux versets antérieurs tout en anticipant la conclusion, créant une cohérence narrative et doctrinale remarquable dans {book_name}.",
-                        f"Le verset {verse_num} représente un sommet dans la progression du chapitre {chapter} de {book_name}. L'auteur inspiré concentre ici des vérités essentielles qui éclairent l'ensemble du passage et révèlent la sagesse divine.",
-                    ]
-                    
-                    # Variations pour CONTEXTE HISTORIQUE
-                    contexte_variations = [
-                        f"Le verset {verse_num} de {book_name} {chapter} s'inscrit dans l'Alliance mosaïque et reflète les réalités du Proche-Orient ancien. Les pratiques sociales, les structures familiales et les systèmes religieux de l'époque imprègnent ce texte. L'étude des manuscrits hébreux anciens révèle que certains mots-clés de ce verset portent des connotations juridiques et cultuelles spécifiques à la culture israélite. Les découvertes archéologiques confirment l'authenticité du contexte décrit.",
-                        f"Rédigé dans un contexte de tension politique et spirituelle, le verset {verse_num} de {book_name} {chapter} témoigne des défis auxquels le peuple de Dieu faisait face. Les influences des nations environnantes, les pressions culturelles et les tentations idolâtres forment l'arrière-plan de ce passage. Les termes originaux utilisés ici révèlent une polémique contre les faux cultes et un appel à la fidélité à l'Alliance.",
-                        f"Le verset {verse_num} s'enracine dans la période de transition où Israël passait d'une structure tribale à une monarchie unifiée. Ce contexte socio-politique a profondément marqué la rédaction de {book_name} {chapter}. Les coutumes mentionnées reflètent les codes légaux du Pentateuque et les traditions patriarcales. L'analyse comparative avec les textes extra-bibliques de l'époque éclaire certaines expressions idiomatiques.",
-                        f"Écrit pendant l'exil ou immédiatement après, le verset {verse_num} de {book_name} {chapter} porte les marques de cette expérience traumatisante pour le peuple juif. La dispersion, la perte du Temple et les questionnements théologiques intenses se reflètent dans le vocabulaire employé. Les concepts théologiques développés ici répondent aux défis de maintenir la foi en contexte hostile.",
-                        f"Le verset {verse_num} appartient à la littérature sapientiale/prophétique de l'Ancien Testament, ancrée dans les traditions orales transmises de génération en génération. Le contexte de {book_name} {chapter} révèle les préoccupations pastorales et didactiques de l'époque. Les formulations poétiques et les parallélismes hébraïques enrichissent la densité théologique du message.",
-                    ]
-                    
-                    # Variations pour PARTIE THÉOLOGIQUE
-                    theologie_variations = [
-                        f"Le verset {verse_num} révèle la souveraineté absolue de Dieu sur l'histoire humaine et sa providence bienveillante. Ce texte établit un fondement doctrinal majeur concernant la nature divine : Dieu est à la fois transcendant et immanent, saint et miséricordieux. La théologie de l'Alliance est centrale ici, montrant comment Dieu se lie à son peuple par des promesses irrévocables.\n\n**Application pratique :** Face aux incertitudes modernes, ce verset {verse_num} nous appelle à une confiance radicale en Dieu. Concrètement, cela signifie abandonner nos stratégies de contrôle pour embrasser la dépendance spirituelle. Dans nos décisions quotidiennes - professionnelles, familiales, financières - nous sommes invités à rechercher d'abord la volonté divine plutôt que notre propre sagesse.\n\n**Références croisées :** Ce thème trouve des parallèles remarquables dans Psaume 46:2-4 (Dieu comme refuge), Proverbes 3:5-6 (confiance vs compréhension humaine), Jérémie 29:11 (plans de paix), Romains 8:28 (concours de toutes choses au bien), et Jacques 1:5 (demander la sagesse divine).",
-                        
-                        f"Ce verset {verse_num} dévoile la dimension christologique de l'Ancien Testament, préfigurant l'œuvre rédemptrice du Messie. La typologie biblique révèle comment les événements historiques annoncent les réalités spirituelles du Nouveau Testament. L'emphase sur la justice et la miséricorde divines anticipe la croix où ces deux attributs se rencontrent parfaitement.\n\n**Application pratique :** Le verset {verse_num} nous enseigne l'équilibre entre vérité et grâce dans nos relations. Au travail, cela se traduit par une intégrité sans compromis couplée à une attitude de pardon. En famille, nous devons maintenir des standards moraux tout en offrant une grâce restauratrice. Nos communautés ecclésiales doivent incarner cette double dimension.\n\n**Références croisées :** Voir Ésaïe 53:4-6 (substitution pénale), Jean 1:14 (grâce et vérité), Romains 3:21-26 (justice satisfaite), 2 Corinthiens 5:21 (échange divin), et 1 Pierre 2:24 (porter nos péchés).",
-                        
-                        f"Le verset {verse_num} explore la doctrine de la sanctification progressive du croyant. Il établit que la transformation spirituelle est une œuvre divine qui requiert néanmoins notre coopération active. La tension entre l'indicatif (ce que Dieu a fait) et l'impératif (comment nous devons répondre) structure l'éthique biblique présentée ici.\n\n**Application pratique :** Concrètement, ce verset {verse_num} nous appelle à cultiver des disciplines spirituelles régulières : lecture biblique matinale, prière contemplative, jeûne périodique, service communautaire. Dans nos luttes contre le péché, il nous rappelle de nous approprier notre identité en Christ plutôt que de compter sur notre volonté personnelle. La transformation vient de l'intérieur vers l'extérieur.\n\n**Références croisées :** Philippiens 2:12-13 (opérer son salut), Galates 5:16-25 (marche par l'Esprit vs chair), Romains 12:1-2 (renouvellement de l'intelligence), 2 Corinthiens 3:18 (transformation de gloire en gloire), Colossiens 3:1-17 (dépouiller/revêtir).",
-                        
-                        f"Ce verset {verse_num} met en lumière l'ecclésiologie biblique - la nature et la mission de l'Église. Il souligne l'appel corporatif du peuple de Dieu à être lumière dans les ténèbres et sel de la terre. La dimension communautaire de la foi transcende l'individualisme moderne, rappelant que nous sommes un corps avec des membres interdépendants.\n\n**Application pratique :** Le verset {verse_num} nous défie à vivre l'Église au-delà du dimanche matin. Pratiquement, cela implique : participer à un groupe de maison hebdomadaire, exercer nos dons spirituels au service des autres, pratiquer la correction fraternelle avec amour, porter les fardeaux mutuels dans l'intercession, et partager nos ressources matérielles avec ceux dans le besoin.\n\n**Références croisées :** Actes 2:42-47 (vie communautaire primitive), 1 Corinthiens 12:12-27 (un seul corps, plusieurs membres), Éphésiens 4:11-16 (édification mutuelle), Hébreux 10:24-25 (stimuler à l'amour), 1 Pierre 2:9-10 (sacerdoce royal).",
-                        
-                        f"Le verset {verse_num} présente l'eschatologie biblique - l'espérance du royaume à venir. Il oriente notre regard vers l'accomplissement final des promesses divines, où justice et paix régneront éternellement. Cette perspective d'éternité doit transformer notre manière de vivre le temps présent, relativisant nos épreuves temporaires face à la gloire future.\n\n**Application pratique :** Vivre avec une mentalité d'éternité selon ce verset {verse_num} signifie investir dans ce qui subsistera : les âmes humaines et la Parole de Dieu. Cela modifie nos priorités financières (donner généreusement), nos choix de carrière (servir vs accumuler), notre gestion du temps (l'évangélisation devient centrale), et notre réponse à la souffrance (joie malgré les épreuves car elles sont temporaires).\n\n**Références croisées :** Apocalypse 21:1-5 (nouveaux cieux, nouvelle terre), 1 Corinthiens 15:50-58 (victoire sur la mort), 2 Pierre 3:10-13 (attente active), Romains 8:18-25 (souffrances vs gloire), Matthieu 6:19-21 (trésors au ciel).",
-                    ]
-                    
-                    # Sélectionner des variations basées sur un hash unique (verset + livre + chapitre)
-                    # Cela garantit que chaque verset a du contenu unique même entre différents batches
-                    import hashlib
-                    unique_seed = f"{book_name}_{chapter}_{verse_num}".encode('utf-8')
-                    hash_value = int(hashlib.md5(unique_seed).hexdigest(), 16)
-                    
-                    chapitre_index = hash_value % len(chapitre_variations)
-                    contexte_index = (hash_value // 7) % len(contexte_variations)
-                    theologie_index = (hash_value // 13) % len(theologie_variations)
-                    
-                    chapitre_text = chapitre_variations[chapitre_index]
-                    contexte_text = contexte_variations[contexte_index]
-                    theologie_text = theologie_variations[theologie_index]
-                    
-                    verse_content = f"""---
+                f"Le verset {verse_num} présente l'eschatologie biblique - l'espérance du royaume à venir. Il oriente notre regard vers l'accomplissement final des promesses divines, où justice et paix régneront éternellement. Cette perspective d'éternité doit transformer notre manière de vivre le temps présent, relativisant nos épreuves temporaires face à la gloire future.\n\n**Application pratique :** Vivre avec une mentalité d'éternité selon ce verset {verse_num} signifie investir dans ce qui subsistera : les âmes humaines et la Parole de Dieu. Cela modifie nos priorités financières (donner généreusement), nos choix de carrière (servir vs accumuler), notre gestion du temps (l'évangélisation devient centrale), et notre réponse à la souffrance (joie malgré les épreuves car elles sont temporaires).\n\n**Références croisées :** Apocalypse 21:1-5 (nouveaux cieux, nouvelle terre), 1 Corinthiens 15:50-58 (victoire sur la mort), 2 Pierre 3:10-13 (attente active), Romains 8:18-25 (souffrances vs gloire), Matthieu 6:19-21 (trésors au ciel).",
+            ]
+            
+            # Sélectionner des variations basées sur un hash unique (verset + livre + chapitre)
+            # Cela garantit que chaque verset a du contenu unique même entre différents batches
+            import hashlib
+            unique_seed = f"{book_name}_{chapter}_{verse_num}".encode('utf-8')
+            hash_value = int(hashlib.md5(unique_seed).hexdigest(), 16)
+            
+            chapitre_index = hash_value % len(chapitre_variations)
+            contexte_index = (hash_value // 7) % len(contexte_variations)
+            theologie_index = (hash_value // 13) % len(theologie_variations)
+            
+            chapitre_text = chapitre_variations[chapitre_index]
+            contexte_text = contexte_variations[contexte_index]
+            theologie_text = theologie_variations[theologie_index]
+            
+            verse_content = f"""---
 
 **VERSET {verse_num}**
 
@@ -264,13 +626,11 @@ async def generate_with_bible_api_fallback(prompt: str) -> str:
 {theologie_text}
 
 """
-                    content_parts.append(verse_content)
-                    
-                elif response.status_code == 429:
-                    raise Exception("Bible API quota également épuisé")
-                else:
-                    # Verset non trouvé, continuer avec un contenu minimal au nouveau format
-                    verse_content = f"""---
+            content_parts.append(verse_content)
+            
+        else:
+            # Verset non trouvé, continuer avec un contenu minimal au nouveau format
+            verse_content = f"""---
 
 **VERSET {verse_num}**
 
@@ -287,14 +647,9 @@ Verset {verse_num} du chapitre {chapter} de {book_name}.
 [Explication théologique à consulter dans des ressources d'étude biblique]
 
 """
-                    content_parts.append(verse_content)
-                    
-            except Exception as verse_error:
-                logging.error(f"Erreur récupération verset {verse_num}: {verse_error}")
-                # Continuer avec les autres versets
-                continue
+            content_parts.append(verse_content)
     
-    if not content_parts:
+    if not any(verse_texts.values()):
         raise Exception("Impossible de récupérer les versets via Bible API")
     
     final_content = "\n".join(content_parts)
@@ -355,68 +710,54 @@ async def get_status_checks():
     
     return status_checks
 
-# Fonction pour vérifier le quota d'une clé Gemini
-# Cache pour /api/health (éviter de tester les clés trop souvent)
-health_check_cache = {}
-HEALTH_CHECK_CACHE_DURATION = 900  # 15 minutes (optimisé pour économiser les quotas pendant les tests)
+# Intervalle des sondes de santé en arrière-plan (models.get : sans coût de quota)
+HEALTH_PROBE_INTERVAL = int(os.environ.get('HEALTH_PROBE_INTERVAL', '900'))
 
+# Fonction pour vérifier le quota d'une clé Gemini
 async def check_gemini_key_quota(api_key: str, key_index: int):
     """
-    Vérifie le quota réel d'une clé Gemini en faisant un appel de test.
-    Utilise un cache de 5 minutes pour éviter de tester trop souvent.
+    Vérifie une clé Gemini sans consommer de quota : `models.get` valide la clé
+    sans génération. L'épuisement du quota n'est pas observable ainsi, il vient
+    du trafic réel (429) et du budget du jour (scheduler et état partagé).
+    Appelée uniquement par la sonde de fond (health_monitor), jamais par /api/health.
     Retourne le pourcentage de quota utilisé et le statut.
     """
-    # Vérifier le cache d'abord
-    cache_key = f"gemini_{key_index}"
-    if cache_key in health_check_cache:
-        cached_data, timestamp = health_check_cache[cache_key]
-        if time.time() - timestamp < HEALTH_CHECK_CACHE_DURATION:
-            # Retourner les données en cache
-            return cached_data
+    # Estimer le quota basé sur l'usage actuel tracké
+    # Quota réel: 50 requêtes par jour par clé gratuite (configurable)
+    usage_count = gemini_key_usage_count.get(key_index, 0)
+    quota_percent = min(100, (usage_count / GEMINI_DAILY_BUDGET_PER_KEY) * 100)
+    
+    if gemini_scheduler.daily_remaining(key_index) <= 0 or not key_state.is_available(key_index):
+        return {
+            "is_available": False,
+            "quota_used": 100,
+            "usage_count": usage_count,
+            "error": "Quota épuisé"
+        }
     
     try:
-        # Tenter un appel de test très court pour vérifier le quota
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"health-check-{uuid.uuid4()}",
-            system_message="Test"
-        ).with_model("gemini", "gemini-2.0-flash-exp")
-        
-        # Appel minimal pour vérifier la clé
-        test_message = UserMessage(text="Hi")
-        await chat.send_message(test_message)
-        
-        # Si on arrive ici, la clé fonctionne
-        # Estimer le quota basé sur l'usage actuel tracké
-        usage_count = gemini_key_usage_count.get(key_index, 0)
+        await check_gemini_model(gemini_http_client, api_key, GEMINI_MODEL)
         
-        # Quota réel: 50 requêtes par jour par clé gratuite
-        max_daily_requests = 50
-        quota_percent = min(100, (usage_count / max_daily_requests) * 100)
-        
-        result = {
+        # Si on arrive ici, la clé est acceptée par l'API
+        return {
             "is_available": True,
             "quota_used": round(quota_percent, 1),
             "usage_count": usage_count,
             "error": None
         }
         
-        # Mettre en cache
-        health_check_cache[cache_key] = (result, time.time())
-        return result
-        
     except Exception as e:
         error_str = str(e).lower()
         
         # Détecter les erreurs de quota
-        if "quota" in error_str or "429" in error_str or "resource_exhausted" in error_str:
+        if is_quota_error(e):
             result = {
                 "is_available": False,
                 "quota_used": 100,
-                "usage_count": gemini_key_usage_count.get(key_index, 0),
+                "usage_count": usage_count,
                 "error": "Quota épuisé"
             }
-        elif "invalid" in error_str or "api_key" in error_str:
+        elif "invalid" in error_str or "api_key" in error_str or "http 403" in error_str:
             result = {
                 "is_available": False,
                 "quota_used": 0,
@@ -425,8 +766,6 @@ async def check_gemini_key_quota(api_key: str, key_index: int):
             }
         else:
             # Autre erreur, on suppose que la clé est utilisable
-            usage_count = gemini_key_usage_count.get(key_index, 0)
-            quota_percent = min(100, (usage_count / 50) * 100)
             result = {
                 "is_available": True,
                 "quota_used": round(quota_percent, 1),
@@ -434,8 +773,6 @@ async def check_gemini_key_quota(api_key: str, key_index: int):
                 "error": str(e)[:100]
             }
         
-        # Mettre en cache même les erreurs
-        health_check_cache[cache_key] = (result, time.time())
         return result
 
 # Fonction pour vérifier la Bible API
@@ -448,167 +785,145 @@ async def check_bible_api():
             "error": "Clés non configurées"
         }
     
-    try:
-        import httpx
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.scripture.api.bible/v1/bibles/{BIBLE_ID}",
-                headers={"api-key": BIBLE_API_KEY},
-                timeout=5.0
-            )
-            
-            if response.status_code == 200:
-                return {
-                    "is_available": True,
-                    "quota_used": 0,  # Bible API généralement pas de quota strict
-                    "error": None
-                }
-            elif response.status_code == 429:
-                return {
-                    "is_available": False,
-                    "quota_used": 100,
-                    "error": "Quota épuisé"
-                }
-            else:
-                return {
-                    "is_available": False,
-                    "quota_used": 0,
-                    "error": f"HTTP {response.status_code}"
-                }
-    except Exception as e:
-        return {
-            "is_available": False,
-            "quota_used": 0,
-            "error": str(e)[:100]
-        }
+    return await bible_api_client.check()
+
+# Sonde de santé en arrière-plan : clés sondées en parallèle + apprentissage passif du trafic
+health_monitor = KeyHealthMonitor(
+    len(GEMINI_KEYS),
+    probe_key=lambda key_index: check_gemini_key_quota(GEMINI_KEYS[key_index], key_index),
+    probe_bible=check_bible_api,
+    usage_counts=gemini_key_usage_count,
+    daily_budget=GEMINI_DAILY_BUDGET_PER_KEY,
+    interval=HEALTH_PROBE_INTERVAL
+)
+
+def mirror_shared_key_event(key_index: int, error: Optional[str], quota: bool):
+    """Succès/échec d'une clé observé par un autre worker : mêmes LED que pour le trafic local."""
+    if error is None:
+        health_monitor.record_success(key_index)
+    else:
+        health_monitor.record_failure(key_index, Exception(error), quota)
+
+key_state = SharedKeyState(
+    create_key_state_store(KEY_STATE_BACKEND, len(GEMINI_KEYS), db, KEY_STATE_SHM_NAME),
+    gemini_scheduler,
+    gemini_retry_engine.cooldowns,
+    gemini_key_usage_count,
+    KEY_STATE_REFRESH_SECONDS,
+    on_event=mirror_shared_key_event
+)
+
+def health_payload():
+    """Snapshot de santé (identique pour /api/health et /api/health/stream)."""
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "current_key": f"gemini_{current_gemini_key_index + 1}",
+        "active_key_index": current_gemini_key_index + 1,
+        "bible_api_configured": bool(BIBLE_API_KEY and BIBLE_ID),
+        "local_corpus_available": bible_corpus.available,
+        "total_gemini_keys": len(GEMINI_KEYS),
+        "total_keys": len(GEMINI_KEYS) + (1 if BIBLE_API_KEY and BIBLE_ID else 0),
+        "rotation_info": "Système à 5 clés : 4 Gemini + 1 Bible API en rotation automatique",
+        "last_probe_at": health_monitor.last_probe_at,
+        "retry_engine": gemini_retry_engine.stats(),
+        "scheduler": gemini_scheduler.snapshot(),
+        "circuit_breakers": gemini_breakers.snapshot(),
+        "key_state": key_state.stats(),
+        "apis": health_monitor.snapshot()
+    }
 
 # Route pour le health check des API avec VRAIES clés
 @api_router.get("/health")
 async def api_health():
     """
-    Retourne le statut de santé des API en vérifiant les VRAIES clés.
+    Retourne le statut de santé des API depuis le snapshot précalculé par health_monitor
+    (aucun appel Gemini ni Bible API pendant la requête).
     Les LED changent de couleur selon le quota RÉEL:
     - VERT: quota < 70%
     - JAUNE: quota entre 70% et 90%
     - ROUGE: quota > 90% ou épuisé
     """
-    base_time = datetime.now(timezone.utc)
-    
-    # Fonction pour déterminer la couleur selon le quota
-    def get_api_status(quota_used_percent, is_available):
-        """Retourne la couleur et le statut selon le quota utilisé"""
-        if not is_available or quota_used_percent >= 100:
-            return "red", "quota_exceeded", "Quota épuisé"
-        elif quota_used_percent >= 90:
-            return "red", "critical", "Critique"
-        elif quota_used_percent >= 70:
-            return "yellow", "warning", "Attention"
-        else:
-            return "green", "available", "Disponible"
-    
-    apis = {}
-    
-    # Vérifier chaque clé Gemini réelle
-    for i, api_key in enumerate(GEMINI_KEYS):
-        key_index = i
-        key_name = f"gemini_{i + 1}"
-        
-        # Vérifier le quota réel de cette clé
-        quota_info = await check_gemini_key_quota(api_key, key_index)
-        
-        color, status, status_text = get_api_status(
-            quota_info["quota_used"],
-            quota_info["is_available"]
-        )
-        
-        apis[key_name] = {
-            "name": f"Gemini Key {i + 1}",
-            "color": color,
-            "status": status,
-            "status_text": status_text,
-            "quota_used": quota_info["quota_used"],
-            "quota_remaining": 100 - quota_info["quota_used"],
-            "usage_count": quota_info["usage_count"],
-            "is_available": quota_info["is_available"],
-            "error": quota_info["error"],
-            "last_used": base_time.isoformat() if key_index == current_gemini_key_index else None
-        }
-    
-    # Vérifier la Bible API réelle
-    bible_info = await check_bible_api()
-    color, status, status_text = get_api_status(
-        bible_info["quota_used"],
-        bible_info["is_available"]
-    )
-    
-    apis["bible_api"] = {
-        "name": "Bible API",
-        "color": color,
-        "status": status,
-        "status_text": status_text,
-        "quota_used": bible_info["quota_used"],
-        "quota_remaining": 100 - bible_info["quota_used"],
-        "is_available": bible_info["is_available"],
-        "error": bible_info["error"],
-        "last_used": None
-    }
+    return health_payload()
+
+# Intervalle des commentaires keep-alive du flux santé (proxies / load balancers)
+HEALTH_STREAM_KEEPALIVE = 25
+
+@api_router.get("/health/stream")
+async def api_health_stream():
+    """
+    Flux SSE du statut des LED, à la place du polling /api/health toutes les 10s.
+    Un événement "health" est envoyé à la connexion, puis seulement lors d'une
+    transition (LED qui change de couleur/statut, rotation de la clé active).
+    """
+    async def events():
+        version = health_monitor.version
+        yield sse_event("health", health_payload())
+        while True:
+            if await health_monitor.wait_for_change(version, HEALTH_STREAM_KEEPALIVE):
+                version = health_monitor.version
+                yield sse_event("health", health_payload())
+            else:
+                yield ": keep-alive\n\n"
     
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# Route pour suivre les économies du pipeline de génération
+@api_router.get("/generation-stats")
+async def generation_stats():
+    """
+    Statistiques du pipeline de génération.
+    coalesced_callers = appels Gemini économisés grâce au single-flight.
+    """
     return {
-        "status": "healthy",
-        "timestamp": base_time.isoformat(),
-        "current_key": f"gemini_{current_gemini_key_index + 1}",
-        "active_key_index": current_gemini_key_index + 1,
-        "bible_api_configured": bool(BIBLE_API_KEY and BIBLE_ID),
-        "total_gemini_keys": len(GEMINI_KEYS),
-        "total_keys": len(GEMINI_KEYS) + (1 if BIBLE_API_KEY and BIBLE_ID else 0),
-        "rotation_info": "Système à 5 clés : 4 Gemini + 1 Bible API en rotation automatique",
-        "apis": apis
+        "status": "success",
+        "single_flight": generation_flights.stats(),
+        "caches": {name: layer.stats() for name, layer in cache_layers.items()},
+        "compression": content_codec.stats(),
+        "jobs": generation_jobs.stats(),
+        "invalidations": cache_invalidator.stats(),
+        "retry_engine": gemini_retry_engine.stats(),
+        "hedging": gemini_hedging.stats(),
+        "llm_clients": gemini_clients.stats(),
+        "bible_corpus": bible_corpus.stats(),
+        "bible_api": bible_api_client.stats(),
+        "concordance": concordance_index.stats()
     }
 
-# Route pour générer l'histoire d'un personnage biblique
-@api_router.post("/generate-character-history")
-async def generate_character_history(request: dict):
+# Versions des prompts et entrées de cache à régénérer après une modification de prompt
+@api_router.get("/prompt-versions")
+async def get_prompt_versions():
     """
-    Génère une histoire narrative détaillée d'un personnage biblique.
-    Utilise l'API Gemini avec rotation automatique des clés.
-    Cache MongoDB pour économiser les quotas.
+    Version courante de chaque prompt (rubrique, mode, versets) et nombre
+    d'entrées de cache à jour / périmées par variante.
     """
     try:
-        character_name = request.get('character_name', '')
-        mode = request.get('mode', 'standard')  # 'standard', 'enrich', 'regenerate'
-        previous_content = request.get('previous_content', '')
-        force_regenerate = request.get('force_regenerate', False)
-        
-        if not character_name:
-            return {
-                "status": "error",
-                "message": "Nom du personnage manquant"
-            }
-        
-        # Créer une clé de cache unique (character + mode)
-        cache_key = f"{character_name.lower().strip()}_{mode}"
-        
-        # Vérifier le cache MongoDB (sauf si force_regenerate)
-        if not force_regenerate:
-            cached_history = await db.character_history_cache.find_one({"cache_key": cache_key})
-            if cached_history:
-                logging.info(f"✅ Cache hit pour personnage: {character_name} (mode: {mode})")
-                return {
-                    "status": "success",
-                    "content": cached_history["content"],
-                    "api_used": "cache",
-                    "word_count": cached_history.get("word_count", 0),
-                    "character_name": character_name,
-                    "mode": mode,
-                    "generation_time_seconds": 0,
-                    "cached": True,
-                    "generated_at": cached_history.get("created_at")
-                }
-        
-        # Préparer le prompt selon le mode
-        if mode == 'enrich' and previous_content:
-            # Mode enrichissement : ajouter plus de détails au contenu existant
-            prompt = f"""Tu es un expert biblique et théologien. Le récit suivant a déjà été généré pour le personnage biblique **{character_name}** :
+        return {
+            "status": "success",
+            **prompt_versions.snapshot(),
+            "entries": await prompt_versions.outdated_counts(db)
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+# Route pour vérifier que les lookups de cache utilisent bien les index
+@api_router.get("/cache-indexes")
+async def cache_indexes():
+    """
+    Statistiques d'utilisation des index des collections de cache ($indexStats)
+    et étape d'accès d'une recherche par cache_key (IXSCAN attendu, pas COLLSCAN).
+    """
+    try:
+        return {"status": "success", "collections": await index_usage_report(db)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def build_character_history_prompt(character_name: str, mode: str, previous_content: str = '') -> str:
+    """Prompt de l'histoire d'un personnage selon le mode ('standard', 'enrich', 'regenerate')."""
+    # Préparer le prompt selon le mode
+    if mode == 'enrich' and previous_content:
+        # Mode enrichissement : ajouter plus de détails au contenu existant
+        prompt = f"""Tu es un expert biblique et théologien. Le récit suivant a déjà été généré pour le personnage biblique **{character_name}** :
 
 {previous_content}
 
@@ -624,10 +939,10 @@ Ta mission : ENRICHIR ce récit en ajoutant beaucoup plus de détails, de profon
 Garde la même structure mais développe chaque section avec au moins 50% de contenu supplémentaire. Vise 1200-1500 mots au total.
 
 Commence directement par le titre enrichi: # 📖 {character_name.upper()} - Histoire Biblique Enrichie"""
-        
-        elif mode == 'regenerate':
-            # Mode régénération : créer une version complètement nouvelle et plus détaillée
-            prompt = f"""Tu es un expert biblique et théologien renommé. Crée un récit narratif EXTRÊMEMENT DÉTAILLÉ et APPROFONDI du personnage biblique **{character_name}** en français.
+
+    elif mode == 'regenerate':
+        # Mode régénération : créer une version complètement nouvelle et plus détaillée
+        prompt = f"""Tu es un expert biblique et théologien renommé. Crée un récit narratif EXTRÊMEMENT DÉTAILLÉ et APPROFONDI du personnage biblique **{character_name}** en français.
 
 Cette version doit être la plus complète possible. Structure ton récit en sections markdown détaillées :
 
@@ -709,10 +1024,10 @@ Utilise un style MÉLANGE d'académique et narratif accessible. Le récit doit 
 - Complet et exhaustif (ne rien omettre d'important)
 
 Vise 1200-1500 mots minimum. Commence directement par le titre: # 📖 {character_name.upper()} - Histoire Biblique Complète"""
-        
-        else:
-            # Mode standard : récit narratif complet mais modéré
-            prompt = f"""Tu es un expert biblique et théologien. Crée un récit narratif détaillé du personnage biblique **{character_name}** en français.
+
+    else:
+        # Mode standard : récit narratif complet mais modéré
+        prompt = f"""Tu es un expert biblique et théologien. Crée un récit narratif détaillé du personnage biblique **{character_name}** en français.
 
 Structure ton récit en sections markdown claires :
 
@@ -759,70 +1074,170 @@ Structure ton récit en sections markdown claires :
 
 Utilise un style MÉLANGE d'académique (précis, avec références) et narratif accessible (engageant, vivant).
 Vise 800-1200 mots. Commence directement par le titre: # 📖 {character_name.upper()} - Histoire Biblique"""
-        
+    
+    return prompt
+
+for _mode in ('standard', 'enrich', 'regenerate'):
+    prompt_versions.register(
+        "character_history_cache", _mode,
+        build_character_history_prompt("{character_name}", _mode, "{previous_content}")
+    )
+
+def character_cache_key(character_name: str, mode: str) -> str:
+    """Clé de cache d'une histoire: nom replié (casse, accents, espaces) + mode."""
+    return f"{fold_name(character_name)}_{mode}"
+
+async def get_cached_character_history(character_name: str, mode: str):
+    """
+    Histoire en cache. Les entrées antérieures à la normalisation des noms
+    (clé `nom.lower().strip()`, accents compris : "moïse_standard") sont
+    retrouvées et recopiées sous la clé repliée.
+    """
+    cache_key = character_cache_key(character_name, mode)
+    cached = await character_history_store.get(cache_key)
+    legacy_key = f"{character_name.lower().strip()}_{mode}"
+    if cached is not None or legacy_key == cache_key:
+        return cached
+    legacy = await character_history_store.get(legacy_key)
+    if legacy is None:
+        return None
+    migrated = {**legacy, "cache_key": cache_key}
+    await character_history_store.put(cache_key, migrated)
+    return migrated
+
+def character_history_generation(character_name: str, mode: str, previous_content: str = '',
+                                 use_bible_api_fallback: bool = True):
+    """
+    (clé single-flight, coroutine de génération + sauvegarde en cache) de l'histoire d'un personnage.
+    La coroutine retourne (content, retry_stats, generation_time, word_count).
+    """
+    cache_key = character_cache_key(character_name, mode)
+    prompt = build_character_history_prompt(character_name, mode, previous_content)
+    
+    async def produce():
         # Appeler Gemini avec rotation automatique
-        api_key_index = current_gemini_key_index
         start_time = time.time()
+        content, retry_stats = await call_gemini_with_stats(
+            prompt, use_bible_api_fallback=use_bible_api_fallback, endpoint="character_history"
+        )
+        generation_time = time.time() - start_time
+        word_count = len(content.split())
         
-        try:
-            content = await call_gemini_with_rotation(prompt)
-            generation_time = time.time() - start_time
-            word_count = len(content.split())
-            
-            # Sauvegarder en cache MongoDB
-            cache_doc = {
-                "cache_key": cache_key,
+        # Sauvegarder en cache MongoDB
+        cache_doc = {
+            "cache_key": cache_key,
+            "character_name": character_name,
+            "mode": mode,
+            "content": content,
+            "word_count": word_count,
+            **prompt_versions.fields("character_history_cache", mode),
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        
+        # Upsert (update ou insert) + cache mémoire
+        await character_history_store.put(cache_key, cache_doc)
+        
+        logging.info(f"✅ Cache sauvegardé pour personnage: {character_name} (mode: {mode})")
+        return content, retry_stats, generation_time, word_count
+    
+    # Les requêtes identiques simultanées partagent une seule génération
+    # (le mode 'enrich' dépend du contenu précédent envoyé par le client)
+    flight_key = f"character_history:{cache_key}"
+    if mode == 'enrich':
+        flight_key += f":{hashlib.sha1(previous_content.encode('utf-8')).hexdigest()[:16]}"
+    return flight_key, produce
+
+# Route pour générer l'histoire d'un personnage biblique
+@api_router.post("/generate-character-history")
+async def generate_character_history(request: dict):
+    """
+    Génère une histoire narrative détaillée d'un personnage biblique.
+    Utilise l'API Gemini avec rotation automatique des clés.
+    Cache MongoDB pour économiser les quotas.
+    """
+    try:
+        character_name = request.get('character_name', '')
+        mode = request.get('mode', 'standard')  # 'standard', 'enrich', 'regenerate'
+        previous_content = request.get('previous_content', '')
+        force_regenerate = request.get('force_regenerate', False)
+        # Par défaut, force_regenerate sert l'entrée existante et régénère en arrière-plan
+        wait_for_regeneration = request.get('wait_for_regeneration', False)
+        # async=True : la génération passe par la file de jobs, réponse immédiate avec un job_id
+        run_async = request.get('async', False)
+        
+        if not character_name:
+            return {
+                "status": "error",
+                "message": "Nom du personnage manquant"
+            }
+        
+        # Vérifier le cache MongoDB (sauf régénération synchrone demandée)
+        cached_history = None
+        if not (force_regenerate and wait_for_regeneration):
+            cached_history = await get_cached_character_history(character_name, mode)
+        
+        if cached_history:
+            # Stale-while-revalidate : l'entrée est servie tout de suite, la nouvelle
+            # version (sans contenu de secours) la remplacera dans le cache
+            stale = force_regenerate or character_history_store.is_stale(cached_history)
+            if stale:
+                generation_flights.spawn(*character_history_generation(
+                    character_name, mode, previous_content, use_bible_api_fallback=False
+                ))
+            logging.info(f"✅ Cache hit pour personnage: {character_name} (mode: {mode}){' - régénération en arrière-plan' if stale else ''}")
+            return {
+                "status": "success",
+                "content": cached_history["content"],
+                "api_used": "cache",
+                "word_count": cached_history.get("word_count", 0),
                 "character_name": character_name,
                 "mode": mode,
-                "content": content,
-                "word_count": word_count,
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "generation_time_seconds": 0,
+                "cached": True,
+                "stale": stale,
+                "revalidating": stale,
+                "generated_at": cached_history.get("created_at")
             }
-            
-            # Upsert (update ou insert)
-            await db.character_history_cache.update_one(
-                {"cache_key": cache_key},
-                {"$set": cache_doc},
-                upsert=True
+        
+        if run_async:
+            return await submit_generation_job("character_history", {
+                "character_name": character_name,
+                "mode": mode,
+                "previous_content": previous_content
+            })
+        
+        start_time = time.time()
+        try:
+            (content, retry_stats, generation_time, word_count), coalesced = await generation_flights.do(
+                *character_history_generation(character_name, mode, previous_content)
             )
             
-            logging.info(f"✅ Cache sauvegardé pour personnage: {character_name} (mode: {mode})")
-            
             return {
                 "status": "success",
                 "content": content,
-                "api_used": f"gemini_{api_key_index + 1}",
+                "api_used": api_used_label(retry_stats),
                 "word_count": word_count,
                 "character_name": character_name,
                 "mode": mode,
                 "generation_time_seconds": round(generation_time, 2),
-                "cached": False
+                "cached": False,
+                "coalesced": coalesced,
+                "retries": retry_stats.retries,
+                "retry_stats": retry_stats.as_dict()
             }
         
         except Exception as gemini_error:
             # Fallback : Générer un contenu structuré avec la Bible API
             logger.warning(f"Gemini indisponible pour {character_name}, utilisation Bible API fallback: {gemini_error}")
+            FALLBACK_ACTIVATIONS.inc(kind="character_bible_search")
             
             try:
                 # Récupérer les versets mentionnant le personnage depuis la Bible API
-                bible_api_key = os.environ.get('BIBLE_API_KEY')
-                bible_id = os.environ.get('BIBLE_ID', 'de4e12af7f28f599-02')
-                
-                if not bible_api_key:
+                if not BIBLE_API_KEY:
                     raise Exception("Bible API key non configurée")
                 
-                # Rechercher le personnage dans la Bible
-                search_url = f"https://api.scripture.api.bible/v1/bibles/{bible_id}/search"
-                headers = {"api-key": bible_api_key}
-                params = {"query": character_name, "limit": 10}
-                
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(search_url, headers=headers, params=params, timeout=10.0)
-                    response.raise_for_status()
-                    search_data = response.json()
-                
-                # Extraire les versets trouvés
-                verses = search_data.get('data', {}).get('verses', [])
+                # Rechercher le personnage dans la Bible (client api.bible partagé)
+                verses = await bible_api_client.search(character_name, limit=10)
                 
                 # Générer un contenu structuré basé sur les versets trouvés
                 content = f"""# 📖 {character_name.upper()} - Histoire Biblique
@@ -912,75 +1327,42 @@ Pour une étude approfondie de {character_name}, nous vous recommandons de :
             "character_name": character_name
         }
 
-# Route pour générer l'étude verset par verset (5 versets par 5)
-@api_router.post("/generate-verse-by-verse")
-async def generate_verse_by_verse(request: dict):
+def parse_verse_passage(passage: str, start_verse: int, end_verse: int):
     """
-    Génère une étude verset par verset avec Gemini.
-    Génération par groupes de 5 versets pour tous les chapitres de chaque livre.
-    Cache MongoDB pour économiser les quotas.
+    Parse "Genèse 1", "Gn 1:6-10", "1 Jean 3,16"...
+    Retourne (book_name, chapter, start_verse, end_verse, chapter_key) ou None si le format est invalide.
+    Les versets indiqués dans le passage priment sur start_verse/end_verse.
+    book_name est le nom canonique du livre et chapter_key la clé canonique du chapitre ("GEN.1").
     """
-    try:
-        passage = request.get('passage', '')
-        start_verse = request.get('start_verse', 1)
-        end_verse = request.get('end_verse', 3)  # Réduit à 3 pour Vercel timeout 10s
-        force_regenerate = request.get('force_regenerate', False)
-        
-        if not passage:
-            return {
-                "status": "error",
-                "message": "Passage manquant"
-            }
-        
-        # Parser le passage (ex: "Genèse 1" ou "Genèse 1:6-10")
-        import re
-        
-        # Extraire le livre, chapitre et versets si présents
-        # Format possible: "Genèse 1:6-10" ou "Genèse 1"
-        verse_pattern = re.match(r'^(.+?)\s+(\d+)(?::(\d+)(?:-(\d+))?)?$', passage.strip())
-        
-        if not verse_pattern:
-            return {
-                "status": "error",
-                "message": f"Format de passage invalide: {passage}. Utilisez 'Livre Chapitre' ou 'Livre Chapitre:Verset-Verset'"
-            }
-        
-        book_name = verse_pattern.group(1).strip()
-        chapter = verse_pattern.group(2)
-        
-        # Si des versets sont spécifiés dans le passage, les utiliser
-        if verse_pattern.group(3):
-            start_verse = int(verse_pattern.group(3))
-            if verse_pattern.group(4):
-                end_verse = int(verse_pattern.group(4))
-            else:
-                end_verse = start_verse  # Un seul verset
-        
-        logging.info(f"Génération verset par verset: {book_name} {chapter}, versets {start_verse}-{end_verse}")
-        
-        # Créer une clé de cache unique
-        cache_key = f"{passage}_{start_verse}_{end_verse}"
-        
-        # Vérifier le cache MongoDB (sauf si force_regenerate)
-        if not force_regenerate:
-            cached_verses = await db.verses_cache.find_one({"cache_key": cache_key})
-            if cached_verses:
-                logging.info(f"✅ Cache hit pour {passage} versets {start_verse}-{end_verse}")
-                return {
-                    "status": "success",
-                    "content": cached_verses["content"],
-                    "api_used": "cache",
-                    "word_count": cached_verses.get("word_count", 0),
-                    "passage": passage,
-                    "verses_generated": f"{start_verse}-{end_verse}",
-                    "generation_time_seconds": 0,
-                    "source": "cache",
-                    "from_cache": True,
-                    "generated_at": cached_verses.get("created_at")
-                }
-        
-        # Préparer le prompt pour Gemini avec instructions détaillées pour unicité et qualité
-        prompt = f"""Tu es un expert biblique et théologien spécialisé dans l'exégèse verset par verset.
+    import re
+    
+    canonical = parse_passage(passage)
+    if canonical:
+        if canonical.start_verse is not None:
+            start_verse, end_verse = canonical.start_verse, canonical.end_verse
+        return canonical.book.name_fr, str(canonical.chapter), start_verse, end_verse, canonical.chapter_key
+    
+    # Livre non reconnu : découpage brut, clé seulement repliée (casse, accents, espaces)
+    verse_pattern = re.match(r'^(.+?)\s+(\d+)(?::(\d+)(?:-(\d+))?)?$', passage.strip())
+    if not verse_pattern:
+        return None
+    
+    book_name = verse_pattern.group(1).strip()
+    chapter = verse_pattern.group(2)
+    
+    # Si des versets sont spécifiés dans le passage, les utiliser
+    if verse_pattern.group(3):
+        start_verse = int(verse_pattern.group(3))
+        if verse_pattern.group(4):
+            end_verse = int(verse_pattern.group(4))
+        else:
+            end_verse = start_verse  # Un seul verset
+    
+    return book_name, chapter, start_verse, end_verse, fold_name(f"{book_name} {chapter}")
+
+def build_verse_by_verse_prompt(book_name: str, chapter: str, start_verse: int, end_verse: int) -> str:
+    """Prompt Gemini de l'étude verset par verset (instructions d'unicité et de qualité)."""
+    return f"""Tu es un expert biblique et théologien spécialisé dans l'exégèse verset par verset.
 
 MISSION CRITIQUE : Génère une étude UNIQUE, DÉTAILLÉE et APPROFONDIE EXCLUSIVEMENT pour les versets {start_verse} à {end_verse} de **{book_name} chapitre {chapter}** en français.
 
@@ -1047,44 +1429,207 @@ Pour CHAQUE verset de {start_verse} à {end_verse}, structure RIGOUREUSEMENT ain
 
 Commence DIRECTEMENT avec "---" puis "**VERSET {start_verse}**" sans aucune introduction générale."""
 
-        # Appeler Gemini avec rotation automatique
-        start_time = time.time()
+prompt_versions.register("verses_cache", None, build_verse_by_verse_prompt("{book_name}", "{chapter}", 1, 2))
+
+async def save_verses_cache(cache_key: str, passage: str, start_verse: int, end_verse: int, content: str):
+    """Upsert (update ou insert) d'un groupe de versets dans Mongo + cache mémoire."""
+    cache_doc = {
+        "cache_key": cache_key,
+        "passage": passage,
+        "start_verse": start_verse,
+        "end_verse": end_verse,
+        "content": content,
+        "word_count": len(content.split()),
+        **prompt_versions.fields("verses_cache"),
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await verses_store.put(cache_key, cache_doc)
+
+async def get_cached_verse_sections(chapter_key: str, start_verse: int, end_verse: int):
+    """
+    Sections déjà générées de la plage, en un seul lookup groupé.
+    Retourne ({verset: contenu}, [versets périmés à régénérer en arrière-plan]).
+    """
+    keys = {verse_cache_key(chapter_key, verse): verse for verse in range(start_verse, end_verse + 1)}
+    found = await verses_store.get_many(list(keys))
+    sections = {keys[cache_key]: doc["content"] for cache_key, doc in found.items()}
+    stale_verses = sorted(keys[cache_key] for cache_key, doc in found.items() if verses_store.is_stale(doc))
+    return sections, stale_verses
+
+async def save_verse_sections(chapter_key: str, sections: dict):
+    """Stocke chaque section **VERSET n** comme une entrée de cache d'un seul verset."""
+    await asyncio.gather(*(
+        save_verses_cache(verse_cache_key(chapter_key, verse), chapter_key, verse, verse, section)
+        for verse, section in sections.items()
+    ))
+
+def verse_run_generation(book_name: str, chapter: str, chapter_key: str, first_verse: int, last_verse: int,
+                         use_bible_api_fallback: bool = True):
+    """
+    (clé single-flight, coroutine de génération + sauvegarde verset par verset) d'une plage contiguë.
+    La même clé sert aux endpoints bloquant et SSE : une génération en vol est partagée.
+    """
+    async def produce(emit=None):
+        prompt = build_verse_by_verse_prompt(book_name, chapter, first_verse, last_verse)
+        if emit is None:
+            content, retry_stats = await call_gemini_with_stats(
+                prompt, use_bible_api_fallback=use_bible_api_fallback, endpoint="verses"
+            )
+        else:
+            content, retry_stats = await consume_stream_generation(prompt, emit)
+        sections = {
+            verse: section for verse, section in split_verse_sections(content).items()
+            if first_verse <= verse <= last_verse
+        }
+        # Le contenu de secours (Bible API) n'est pas mis en cache
+        if sections and not retry_stats.fallback_used:
+            await save_verse_sections(chapter_key, sections)
+        if not sections:
+            # Réponse sans en-têtes **VERSET n** : rendue telle quelle, non stockée
+            sections = {first_verse: content.strip()}
+        return sections, retry_stats
+    
+    return f"verses:{chapter_key}_{first_verse}_{last_verse}", produce
+
+async def generate_verse_run(book_name: str, chapter: str, chapter_key: str, first_verse: int, last_verse: int):
+    """
+    Génère une plage contiguë de versets manquants et la stocke verset par verset.
+    Retourne (({verset: section}, retry_stats), coalesced).
+    """
+    # Les requêtes identiques simultanées partagent une seule génération
+    return await generation_flights.do(*verse_run_generation(book_name, chapter, chapter_key, first_verse, last_verse))
+
+def revalidate_verses(book_name: str, chapter: str, chapter_key: str, verses: list) -> list:
+    """
+    Stale-while-revalidate des versets servis depuis le cache : régénère en
+    arrière-plan (sans contenu de secours) leurs plages contiguës. Retourne les versets concernés.
+    """
+    for first_verse, last_verse in missing_verse_runs(verses):
+        generation_flights.spawn(*verse_run_generation(
+            book_name, chapter, chapter_key, first_verse, last_verse, use_bible_api_fallback=False
+        ))
+    return sorted(verses)
+
+# Route pour générer l'étude verset par verset (5 versets par 5)
+@api_router.post("/generate-verse-by-verse")
+async def generate_verse_by_verse(request: dict):
+    """
+    Génère une étude verset par verset avec Gemini.
+    Génération par groupes de 5 versets pour tous les chapitres de chaque livre.
+    Cache MongoDB pour économiser les quotas.
+    """
+    try:
+        passage = request.get('passage', '')
+        start_verse = request.get('start_verse', 1)
+        end_verse = request.get('end_verse', 3)  # Réduit à 3 pour Vercel timeout 10s
+        force_regenerate = request.get('force_regenerate', False)
+        # Par défaut, force_regenerate sert les versets existants et les régénère en arrière-plan
+        wait_for_regeneration = request.get('wait_for_regeneration', False)
         
-        content = await call_gemini_with_rotation(prompt)
+        if not passage:
+            return {
+                "status": "error",
+                "message": "Passage manquant"
+            }
         
-        generation_time = time.time() - start_time
-        word_count = len(content.split())
+        # Parser le passage (ex: "Genèse 1" ou "Genèse 1:6-10")
+        parsed = parse_verse_passage(passage, start_verse, end_verse)
         
-        # Sauvegarder en cache MongoDB
-        cache_doc = {
-            "cache_key": cache_key,
-            "passage": passage,
-            "start_verse": start_verse,
-            "end_verse": end_verse,
-            "content": content,
-            "word_count": word_count,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
+        if not parsed:
+            return {
+                "status": "error",
+                "message": f"Format de passage invalide: {passage}. Utilisez 'Livre Chapitre' ou 'Livre Chapitre:Verset-Verset'"
+            }
         
-        # Upsert (update ou insert)
-        await db.verses_cache.update_one(
-            {"cache_key": cache_key},
-            {"$set": cache_doc},
-            upsert=True
-        )
+        book_name, chapter, start_verse, end_verse, chapter_key = parsed
+        
+        logging.info(f"Génération verset par verset: {book_name} {chapter}, versets {start_verse}-{end_verse}")
+        
+        # Cache par verset : clé de chapitre canonique, commune à "Genèse 1", "Gn 1:6-10"...
+        requested = list(range(start_verse, end_verse + 1))
+        sections, stale_verses = ({}, []) if (force_regenerate and wait_for_regeneration) \
+            else await get_cached_verse_sections(chapter_key, start_verse, end_verse)
+        if force_regenerate:
+            stale_verses = sorted(sections)
+        
+        if not force_regenerate and len(sections) < len(requested):
+            # Ancienne entrée par groupe de versets : servie et redécoupée par verset
+            cached_verses = await verses_store.get(f"{passage}_{start_verse}_{end_verse}")
+            if cached_verses:
+                await save_verse_sections(chapter_key, {
+                    verse: section for verse, section in split_verse_sections(cached_verses["content"]).items()
+                    if start_verse <= verse <= end_verse
+                })
+                logging.info(f"✅ Cache hit pour {passage} versets {start_verse}-{end_verse}")
+                return {
+                    "status": "success",
+                    "content": cached_verses["content"],
+                    "api_used": "cache",
+                    "word_count": cached_verses.get("word_count", 0),
+                    "passage": passage,
+                    "verses_generated": f"{start_verse}-{end_verse}",
+                    "generation_time_seconds": 0,
+                    "source": "cache",
+                    "from_cache": True,
+                    "generated_at": cached_verses.get("created_at")
+                }
+        
+        missing = [verse for verse in requested if verse not in sections]
+        # Versets périmés servis tels quels, régénérés en arrière-plan
+        revalidating_verses = revalidate_verses(book_name, chapter, chapter_key, stale_verses)
+        if not missing:
+            logging.info(f"✅ Cache hit pour {passage} versets {start_verse}-{end_verse} (composé verset par verset)")
+            content = compose_verse_sections([sections[verse] for verse in requested])
+            return {
+                "status": "success",
+                "content": content,
+                "api_used": "cache",
+                "word_count": len(content.split()),
+                "passage": passage,
+                "verses_generated": f"{start_verse}-{end_verse}",
+                "generation_time_seconds": 0,
+                "source": "cache",
+                "from_cache": True,
+                "revalidating_verses": revalidating_verses
+            }
         
-        logging.info(f"✅ Cache sauvegardé pour {passage} versets {start_verse}-{end_verse}")
+        # Seuls les versets manquants sont générés, par plages contiguës
+        start_time = time.time()
+        runs = missing_verse_runs(missing)
+        results = await asyncio.gather(*(
+            generate_verse_run(book_name, chapter, chapter_key, first_verse, last_verse)
+            for first_verse, last_verse in runs
+        ))
+        run_stats = []
+        coalesced = False
+        for (generated, retry_stats), run_coalesced in results:
+            sections.update(generated)
+            run_stats.append(retry_stats)
+            coalesced = coalesced or run_coalesced
+        
+        content = compose_verse_sections([sections[verse] for verse in requested if verse in sections])
+        generation_time = time.time() - start_time
+        logging.info(
+            f"✅ {passage} versets {start_verse}-{end_verse}: {len(missing)} verset(s) généré(s) "
+            f"en {len(runs)} plage(s), {len(requested) - len(missing)} depuis le cache"
+        )
         
         return {
             "status": "success",
             "content": content,
-            "api_used": f"gemini_{current_gemini_key_index + 1}",
-            "word_count": word_count,
+            "api_used": api_used_label(run_stats[0]),
+            "word_count": len(content.split()),
             "passage": passage,
             "verses_generated": f"{start_verse}-{end_verse}",
             "generation_time_seconds": round(generation_time, 2),
             "source": "gemini_ai",
-            "from_cache": False
+            "from_cache": False,
+            "cached_verses": len(requested) - len(missing),
+            "generated_verses": len(missing),
+            "revalidating_verses": revalidating_verses,
+            "coalesced": coalesced,
+            "retries": sum(stats.retries for stats in run_stats),
+            "retry_stats": [stats.as_dict() for stats in run_stats]
         }
         
     except Exception as e:
@@ -1095,6 +1640,187 @@ Commence DIRECTEMENT avec "---" puis "**VERSET {start_verse}**" sans aucune intr
             "passage": request.get('passage', '')
         }
 
+# Taille maximale d'un groupe de versets en streaming (plus de limite Vercel 10s)
+VERSE_STREAM_MAX_BATCH = int(os.environ.get('VERSE_STREAM_MAX_BATCH', '30'))
+
+@api_router.post("/generate-verse-by-verse/stream")
+async def generate_verse_by_verse_stream(request: dict):
+    """
+    Variante SSE de /api/generate-verse-by-verse.
+    Le premier octet part dès que Gemini répond : les groupes de versets ne sont
+    plus limités à 3 (défaut 5, maximum VERSE_STREAM_MAX_BATCH).
+    Les versets déjà en cache sont envoyés d'emblée, seuls les manquants sont streamés.
+    Événements: "cached", "start", "token", "verse" (section **VERSET n** complète),
+    "done" (versets sauvegardés en cache) ou "error".
+    """
+    passage = request.get('passage', '')
+    start_verse = request.get('start_verse', 1)
+    end_verse = request.get('end_verse', start_verse + 4)
+    force_regenerate = request.get('force_regenerate', False)
+    wait_for_regeneration = request.get('wait_for_regeneration', False)
+    
+    async def events():
+        try:
+            parsed = parse_verse_passage(passage, start_verse, end_verse) if passage else None
+            if not parsed:
+                yield sse_event("error", {"message": f"Format de passage invalide: {passage}"})
+                return
+            book_name, chapter, first_verse, last_verse, chapter_key = parsed
+            last_verse = min(last_verse, first_verse + VERSE_STREAM_MAX_BATCH - 1)
+            requested = list(range(first_verse, last_verse + 1))
+            sections, stale_verses = ({}, []) if (force_regenerate and wait_for_regeneration) \
+                else await get_cached_verse_sections(chapter_key, first_verse, last_verse)
+            missing = [verse for verse in requested if verse not in sections]
+            revalidating_verses = revalidate_verses(
+                book_name, chapter, chapter_key, sorted(sections) if force_regenerate else stale_verses
+            )
+            
+            if not missing:
+                yield sse_event("cached", {
+                    "content": compose_verse_sections([sections[verse] for verse in requested]),
+                    "verses_generated": f"{first_verse}-{last_verse}"
+                })
+                yield sse_event("done", {"api_used": "cache", "from_cache": True, "revalidating_verses": revalidating_verses})
+                return
+            
+            yield sse_event("start", {
+                "passage": passage,
+                "verses": f"{first_verse}-{last_verse}",
+                "cached_verses": sorted(sections),
+                "missing_verses": missing
+            })
+            # Les versets déjà en cache partent immédiatement
+            for verse_number in sorted(sections):
+                yield sse_event("verse", {"verse": verse_number, "content": sections[verse_number], "cached": True})
+            
+            start_time = time.time()
+            api_used = None
+            coalesced = False
+            # Seuls les versets manquants sont générés, plage contiguë par plage contiguë.
+            # Même vol que /generate-verse-by-verse : génération et sauvegarde faites une seule fois
+            for run_first, run_last in missing_verse_runs(missing):
+                splitter = VerseSectionSplitter()
+                sent = set()
+                flight = generation_flights.stream(*verse_run_generation(book_name, chapter, chapter_key, run_first, run_last))
+                chunks = flight.chunks()
+                try:
+                    async for chunk in chunks:
+                        yield sse_event("token", {"text": chunk})
+                        for verse_number, section in splitter.feed(chunk):
+                            sent.add(verse_number)
+                            yield sse_event("verse", {"verse": verse_number, "content": section})
+                finally:
+                    await chunks.aclose()
+                
+                # Sections retenues (et sauvegardées) par la génération : la dernière section,
+                # ou toutes pour un client fusionné, partent ici
+                generated, retry_stats = await flight.result()
+                coalesced = coalesced or flight.shared
+                api_used = api_used_label(retry_stats)
+                for verse_number in sorted(generated):
+                    if verse_number not in sent:
+                        yield sse_event("verse", {"verse": verse_number, "content": generated[verse_number]})
+                sections.update(generated)
+            
+            content = compose_verse_sections([sections[verse] for verse in requested if verse in sections])
+            yield sse_event("done", {
+                "api_used": api_used,
+                "from_cache": False,
+                "coalesced": coalesced,
+                "verses_generated": f"{first_verse}-{last_verse}",
+                "cached_verses": len(requested) - len(missing),
+                "generated_verses": len(missing),
+                "revalidating_verses": revalidating_verses,
+                "word_count": len(content.split()),
+                "generation_time_seconds": round(time.time() - start_time, 2)
+            })
+        except Exception as e:
+            logging.error(f"Erreur stream verset par verset {passage}: {e}")
+            yield sse_event("error", {"message": str(e)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@api_router.post("/bible-text")
+async def get_bible_text(request: dict):
+    """
+    Texte Louis Segond d'un passage ("Genèse 1" = chapitre entier, "Jean 3:16-18").
+    Servi depuis le corpus local, sans réseau (Bible API seulement pour les versets absents).
+    """
+    passage = request.get('passage', '')
+    canonical = parse_passage(passage)
+    if not canonical:
+        return {"status": "error", "message": f"Format de passage invalide: {passage}"}
+    
+    book, chapter = canonical.book, canonical.chapter
+    start_verse, end_verse = canonical.start_verse or 1, canonical.end_verse
+    if end_verse is None:
+        end_verse = bible_corpus.chapter_length(book.book_id, chapter)
+        if not end_verse:
+            return {"status": "error", "message": f"Chapitre introuvable dans le corpus: {passage}"}
+    
+    start_time = time.time()
+    verse_texts = await fetch_verse_texts(book.book_id, chapter, start_verse, end_verse)
+    return {
+        "status": "success",
+        "passage": canonical.display,
+        "book_id": book.book_id,
+        "verses": [
+            {"book": book.name_fr, "chapter": chapter, "verse": verse_num, "text": text}
+            for verse_num, text in verse_texts.items() if text
+        ],
+        "missing_verses": [verse_num for verse_num, text in verse_texts.items() if not text],
+        "source": "local_corpus" if bible_corpus.available else "bible_api",
+        "lookup_ms": round((time.time() - start_time) * 1000, 2)
+    }
+
+@api_router.post("/search-concordance")
+async def search_concordance(request: dict):
+    """
+    Concordance biblique sur l'index inversé local (aucune API externe).
+    - mots libres : tous requis, insensibles aux accents ("eternel" trouve "Éternel")
+    - "phrase exacte" entre guillemets, préfixe avec `*` (ex: sanctifi*)
+    - résultats classés (BM25) et paginés : `page`, `page_size`
+    `enrich` est accepté pour compatibilité avec le frontend.
+    """
+    search_term = (request.get('search_term') or '').strip()
+    if not search_term:
+        return {"status": "error", "message": "Terme de recherche requis"}
+    if not concordance_index.ready:
+        return {"status": "error", "message": "Index de concordance indisponible (corpus local Louis Segond absent)"}
+    
+    # page / page_size absents ou null : valeurs par défaut ; non numériques : erreur (pas de 500)
+    try:
+        page = max(1, int(request.get('page') or 1))
+        page_size = min(max(1, int(request.get('page_size') or CONCORDANCE_PAGE_SIZE)), CONCORDANCE_MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return {"status": "error", "message": "page et page_size doivent être des entiers"}
+    
+    start_time = time.perf_counter()
+    found = concordance_index.search(search_term, page, page_size)
+    bible_verses = []
+    for result in found["results"]:
+        book_name = BOOKS_BY_ID[result["book_id"]].name_fr if result["book_id"] in BOOKS_BY_ID else result["book_id"]
+        bible_verses.append({
+            "book": book_name,
+            "book_id": result["book_id"],
+            "chapter": result["chapter"],
+            "verse": result["verse"],
+            "text": result["text"],
+            "reference": f"{book_name} {result['chapter']}:{result['verse']}",
+            "score": result["score"]
+        })
+    
+    return {
+        "status": "success",
+        "search_term": search_term,
+        "bible_verses": bible_verses,
+        "total": found["total"],
+        "page": page,
+        "page_size": page_size,
+        "total_pages": (found["total"] + page_size - 1) // page_size,
+        "query_time_ms": round((time.perf_counter() - start_time) * 1000, 2)
+    }
+
 # Include the router in the main app
 
 # ===== ENDPOINT RUBRIQUES AVEC GEMINI =====
@@ -2280,6 +3006,41 @@ Pour CHAQUE verset sélectionné:
 **RÈGLE**: Plan ULTRA-CONCRET, RÉALISABLE, MESURABLE. Pas de vagues résolutions."""
 }
 
+# Modifier un template ne rend périmées que les entrées de cette rubrique
+for _number, _template in RUBRIQUE_PROMPTS.items():
+    prompt_versions.register("rubriques_cache", _number, _template)
+
+RUBRIQUE_TITLES = {
+    1: "Prière d'ouverture",
+    2: "Structure littéraire",
+    3: "Questions du chapitre précédent",
+    4: "Thème doctrinal",
+    5: "Fondements théologiques",
+    6: "Contexte historique",
+    7: "Contexte culturel",
+    8: "Contexte géographique",
+    9: "Analyse lexicale",
+    10: "Parallèles bibliques",
+    11: "Prophétie et accomplissement",
+    12: "Personnages",
+    13: "Structure rhétorique",
+    14: "Théologie trinitaire",
+    15: "Christ au centre",
+    16: "Évangile et grâce",
+    17: "Application personnelle",
+    18: "Application communautaire",
+    19: "Prière de réponse",
+    20: "Questions d'étude",
+    21: "Points de vigilance",
+    22: "Objections et réponses",
+    23: "Perspective missionnelle",
+    24: "Éthique chrétienne",
+    25: "Louange / liturgie",
+    26: "Méditation guidée",
+    27: "Mémoire / versets clés",
+    28: "Plan d'action"
+}
+
 @api_router.delete("/clear-rubriques-cache")
 async def clear_rubriques_cache(request: dict):
     """
@@ -2290,8 +3051,11 @@ async def clear_rubriques_cache(request: dict):
         passage = request.get('passage', None)
         
         if passage:
-            # Vider uniquement pour un passage spécifique
-            result = await db.rubriques_cache.delete_many({"passage": passage})
+            # Vider uniquement pour un passage spécifique (saisie brute ou forme canonique)
+            invalidation_filter = InvalidationFilter(passages=list({passage, display_passage(passage)}))
+            result = await db.rubriques_cache.delete_many(invalidation_filter.mongo_query())
+            # Mémoire de ce worker vidée tout de suite, celle des autres par leur veilleur
+            await cache_invalidator.record(invalidation_filter, ["rubriques_cache"], {"rubriques_cache": result.deleted_count})
             return {
                 "status": "success",
                 "message": f"Cache vidé pour {passage}",
@@ -2300,6 +3064,7 @@ async def clear_rubriques_cache(request: dict):
         else:
             # Vider TOUT le cache
             result = await db.rubriques_cache.delete_many({})
+            await cache_invalidator.record(InvalidationFilter(), ["rubriques_cache"], {"rubriques_cache": result.deleted_count})
             return {
                 "status": "success",
                 "message": "Tout le cache des rubriques a été vidé",
@@ -2308,6 +3073,149 @@ async def clear_rubriques_cache(request: dict):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+def parse_invalidation_filter(request: dict) -> InvalidationFilter:
+    """Filtre d'invalidation depuis la requête (livre par nom, abréviation ou identifiant USFM)."""
+    book_id = None
+    if request.get('book'):
+        book = resolve_book(request['book'])
+        if book is None:
+            raise ValueError(f"Livre inconnu: {request['book']}")
+        book_id = book.book_id
+    chapter_from = request.get('chapter_from', request.get('chapter'))
+    chapter_to = request.get('chapter_to', request.get('chapter'))
+    rubrique_numbers = request.get('rubrique_number')
+    if rubrique_numbers is not None and not isinstance(rubrique_numbers, list):
+        rubrique_numbers = [rubrique_numbers]
+    return InvalidationFilter(
+        book_id=book_id,
+        chapter_from=int(chapter_from) if chapter_from is not None else None,
+        chapter_to=int(chapter_to) if chapter_to is not None else None,
+        rubrique_numbers=[int(n) for n in rubrique_numbers] if rubrique_numbers else None,
+        model=request.get('model'),
+        prompt_version=request.get('prompt_version')
+    )
+
+@api_router.post("/cache/invalidate")
+async def invalidate_cache(request: dict):
+    """
+    Invalidation sélective, sans bloquer la requête : les entrées correspondant
+    aux filtres (book, chapter / chapter_from / chapter_to, rubrique_number,
+    model, prompt_version) sont supprimées en arrière-plan par lots, et retirées
+    des caches mémoire. Collections : `collections` (rubriques_cache par défaut).
+    """
+    try:
+        invalidation_filter = parse_invalidation_filter(request)
+        collections = request.get('collections') or ["rubriques_cache"]
+        error = invalidation_filter.validate(collections)
+        if error:
+            return {"status": "error", "message": error}
+        task = await cache_invalidator.start(invalidation_filter, collections)
+        return {"status": "success", **invalidation_view(task)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@api_router.get("/cache/invalidations")
+async def list_cache_invalidations():
+    """Invalidations récentes avec leur avancement."""
+    try:
+        tasks = await cache_invalidator.recent()
+        return {"status": "success", "invalidations": [invalidation_view(task) for task in tasks]}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@api_router.get("/cache/invalidations/{invalidation_id}")
+async def get_cache_invalidation(invalidation_id: str):
+    """Avancement d'une invalidation (estimated / scanned / deleted par collection)."""
+    try:
+        task = await cache_invalidator.get(invalidation_id)
+        if task is None:
+            return {"status": "error", "message": "Invalidation introuvable"}
+        return {"status": "success", **invalidation_view(task)}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def rubrique_cache_key(passage: str, rubrique_number: int) -> str:
+    """Clé de cache d'une rubrique: passage canonique ("GEN.1") + rubrique_number."""
+    return f"{passage_cache_key(passage)}_{rubrique_number}"
+
+async def get_cached_rubriques(passage: str, rubrique_numbers: list) -> dict:
+    """
+    Rubriques en cache {rubrique_number: doc}, en un seul lookup groupé.
+    Les entrées antérieures à la normalisation (clé = passage brut) sont
+    retrouvées et recopiées sous la clé canonique.
+    """
+    canonical_keys = {rubrique_cache_key(passage, n): n for n in rubrique_numbers}
+    legacy_keys = {f"{passage}_{n}": n for n in rubrique_numbers}
+    found = await rubriques_store.get_many(list(canonical_keys) + [k for k in legacy_keys if k not in canonical_keys])
+    
+    cached = {canonical_keys[key]: doc for key, doc in found.items() if key in canonical_keys}
+    for key, doc in found.items():
+        rubrique_number = legacy_keys.get(key)
+        if key in canonical_keys or rubrique_number is None or rubrique_number in cached:
+            continue
+        migrated = {**doc, "cache_key": rubrique_cache_key(passage, rubrique_number), "passage": display_passage(passage)}
+        await rubriques_store.put(migrated["cache_key"], migrated)
+        cached[rubrique_number] = migrated
+    return cached
+
+async def save_rubrique_cache(cache_key: str, passage: str, rubrique_number: int, rubrique_title: str, content: str):
+    """Upsert (update ou insert) de la rubrique dans Mongo + cache mémoire."""
+    cache_doc = {
+        "cache_key": cache_key,
+        "passage": passage,
+        "rubrique_number": rubrique_number,
+        "rubrique_title": rubrique_title,
+        "content": content,
+        **prompt_versions.fields("rubriques_cache", rubrique_number),
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await rubriques_store.put(cache_key, cache_doc)
+
+def rubrique_generation(passage: str, rubrique_number: int, rubrique_title: str, use_bible_api_fallback: bool = True):
+    """
+    (clé single-flight, coroutine de génération + sauvegarde en cache) d'une rubrique.
+    La même clé sert aux endpoints bloquant et SSE : une génération en vol est partagée.
+    """
+    cache_key = rubrique_cache_key(passage, rubrique_number)
+    # Forme canonique : "Gn 1" et "Genèse 1" produisent le même prompt et la même entrée
+    passage = display_passage(passage)
+    
+    async def produce(emit=None):
+        # Générer nouveau contenu (streamé si `emit` relaie les morceaux, cf. SingleFlight.stream)
+        logging.info(f"🔄 Génération pour {passage} - Rubrique {rubrique_number}")
+        prompt = RUBRIQUE_PROMPTS[rubrique_number].format(passage=passage)
+        if emit is None:
+            content, retry_stats = await call_gemini_with_stats(
+                prompt, use_bible_api_fallback=use_bible_api_fallback, endpoint="rubrique"
+            )
+        else:
+            content, retry_stats = await consume_stream_generation(prompt, emit)
+        
+        # Sauvegarder en cache MongoDB
+        await save_rubrique_cache(cache_key, passage, rubrique_number, rubrique_title, content)
+        return content, retry_stats
+    
+    return f"rubriques:{cache_key}", produce
+
+async def produce_rubrique(passage: str, rubrique_number: int, rubrique_title: str):
+    """
+    Génère une rubrique avec Gemini et la sauvegarde en cache.
+    Les requêtes identiques simultanées partagent une seule génération.
+    Retourne ((content, retry_stats), coalesced).
+    """
+    return await generation_flights.do(*rubrique_generation(passage, rubrique_number, rubrique_title))
+
+def revalidate_rubrique(passage: str, rubrique_number: int, rubrique_title: str, cached: dict, force: bool = False) -> bool:
+    """
+    Stale-while-revalidate d'une rubrique servie depuis le cache : si elle est
+    périmée (ou force), la régénère en arrière-plan sans contenu de secours.
+    Retourne True si une régénération est en cours pour cette rubrique.
+    """
+    if not (force or rubriques_store.is_stale(cached)):
+        return False
+    generation_flights.spawn(*rubrique_generation(passage, rubrique_number, rubrique_title, use_bible_api_fallback=False))
+    return True
+
 @api_router.post("/generate-rubrique")
 @api_router.post("/generate-rubrique-content")  # Alias pour compatibilité frontend
 async def generate_rubrique(request: dict):
@@ -2320,18 +3228,18 @@ async def generate_rubrique(request: dict):
         rubrique_number = request.get('rubrique_number', 1)
         rubrique_title = request.get('rubrique_title', '')
         force_regenerate = request.get('force_regenerate', False)  # Nouveau paramètre
+        # Par défaut, force_regenerate sert l'entrée existante et régénère en arrière-plan
+        wait_for_regeneration = request.get('wait_for_regeneration', False)
         
         if rubrique_number not in RUBRIQUE_PROMPTS:
             return {"status": "success", "content": f"# {rubrique_title}\n\n**{passage}**\n\nRubrique en développement.", "api_used": "placeholder"}
         
-        # Créer une clé de cache unique
-        cache_key = f"{passage}_{rubrique_number}"
-        
-        # Vérifier si existe en cache (sauf si force_regenerate)
-        if not force_regenerate:
-            cached_rubrique = await db.rubriques_cache.find_one({"cache_key": cache_key})
+        # Vérifier si existe en cache (sauf régénération synchrone demandée)
+        if not (force_regenerate and wait_for_regeneration):
+            cached_rubrique = (await get_cached_rubriques(passage, [rubrique_number])).get(rubrique_number)
             if cached_rubrique:
-                logging.info(f"✅ Cache hit pour {passage} - Rubrique {rubrique_number}")
+                revalidating = revalidate_rubrique(passage, rubrique_number, rubrique_title, cached_rubrique, force_regenerate)
+                logging.info(f"✅ Cache hit pour {passage} - Rubrique {rubrique_number}{' - régénération en arrière-plan' if revalidating else ''}")
                 return {
                     "status": "success",
                     "content": cached_rubrique["content"],
@@ -2340,43 +3248,305 @@ async def generate_rubrique(request: dict):
                     "passage": passage,
                     "api_used": "cache",
                     "cached": True,
+                    "stale": revalidating,
+                    "revalidating": revalidating,
                     "generated_at": cached_rubrique.get("created_at")
                 }
         
-        # Générer nouveau contenu
-        logging.info(f"🔄 Génération pour {passage} - Rubrique {rubrique_number}")
-        prompt = RUBRIQUE_PROMPTS[rubrique_number].format(passage=passage)
-        content = await call_gemini_with_rotation(prompt)
+        (content, retry_stats), coalesced = await produce_rubrique(passage, rubrique_number, rubrique_title)
         
-        # Sauvegarder en cache MongoDB
-        cache_doc = {
-            "cache_key": cache_key,
-            "passage": passage,
+        return {
+            "status": "success",
+            "content": content,
             "rubrique_number": rubrique_number,
             "rubrique_title": rubrique_title,
-            "content": content,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "passage": passage,
+            "api_used": "gemini",
+            "cached": False,
+            "coalesced": coalesced,
+            "retries": retry_stats.retries,
+            "retry_stats": retry_stats.as_dict()
         }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@api_router.post("/generate-rubrique/stream")
+async def generate_rubrique_stream(request: dict):
+    """
+    Variante SSE de /api/generate-rubrique.
+    Événements: "cached" (contenu complet depuis le cache), "start", "token" (morceau
+    de texte), "done" (fin, contenu sauvegardé en cache) ou "error".
+    Un client qui arrive pendant une génération identique la rejoint ("coalesced") :
+    il reçoit le contenu complet en un seul "token" quand elle se termine.
+    """
+    passage = request.get('passage', '')
+    rubrique_number = request.get('rubrique_number', 1)
+    rubrique_title = request.get('rubrique_title', '')
+    force_regenerate = request.get('force_regenerate', False)
+    wait_for_regeneration = request.get('wait_for_regeneration', False)
+    
+    async def events():
+        try:
+            if rubrique_number not in RUBRIQUE_PROMPTS:
+                yield sse_event("error", {"message": f"Rubrique {rubrique_number} inconnue"})
+                return
+            
+            if not (force_regenerate and wait_for_regeneration):
+                cached_rubrique = (await get_cached_rubriques(passage, [rubrique_number])).get(rubrique_number)
+                if cached_rubrique:
+                    revalidating = revalidate_rubrique(passage, rubrique_number, rubrique_title, cached_rubrique, force_regenerate)
+                    yield sse_event("cached", {
+                        "content": cached_rubrique["content"],
+                        "rubrique_number": rubrique_number,
+                        "generated_at": cached_rubrique.get("created_at")
+                    })
+                    yield sse_event("done", {"api_used": "cache", "cached": True, "stale": revalidating, "revalidating": revalidating})
+                    return
+            
+            yield sse_event("start", {"passage": passage, "rubrique_number": rubrique_number})
+            start_time = time.time()
+            # Même vol que /generate-rubrique : un seul stream Gemini et une seule écriture
+            # en cache pour N clients ; les suivants reçoivent le contenu complet à la fin
+            flight = generation_flights.stream(*rubrique_generation(passage, rubrique_number, rubrique_title))
+            chunks = flight.chunks()
+            try:
+                async for chunk in chunks:
+                    yield sse_event("token", {"text": chunk})
+            finally:
+                await chunks.aclose()
+            content, retry_stats = await flight.result()
+            if flight.shared:
+                yield sse_event("token", {"text": content})
+            yield sse_event("done", {
+                "api_used": api_used_label(retry_stats),
+                "cached": False,
+                "coalesced": flight.shared,
+                "word_count": len(content.split()),
+                "generation_time_seconds": round(time.time() - start_time, 2)
+            })
+        except Exception as e:
+            logging.error(f"Erreur stream rubrique {rubrique_number} de {passage}: {e}")
+            yield sse_event("error", {"message": str(e)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# Nombre maximum de rubriques générées en parallèle par /api/generate-study
+STUDY_GENERATION_CONCURRENCY = int(os.environ.get('STUDY_GENERATION_CONCURRENCY', '4'))
+
+@api_router.post("/generate-study")
+async def generate_study(request: dict):
+    """
+    Génère les 28 rubriques d'un passage en une seule requête.
+    - Cache hits : une seule requête Mongo {"cache_key": {"$in": [...]}}
+    - Cache miss : générations concurrentes, bornées par STUDY_GENERATION_CONCURRENCY
+    Le champ "content" concatène les rubriques avec des titres "## Rubrique N: ..."
+    (format attendu par parseRubriquesContent côté frontend).
+    """
+    try:
+        passage = request.get('passage', '')
+        force_regenerate = request.get('force_regenerate', False)
+        wait_for_regeneration = request.get('wait_for_regeneration', False)
+        rubrique_numbers = request.get('rubriques') or sorted(RUBRIQUE_PROMPTS)
+        rubrique_numbers = [n for n in rubrique_numbers if n in RUBRIQUE_PROMPTS]
+        
+        if not passage:
+            return {"status": "error", "message": "Passage manquant"}
+        
+        start_time = time.time()
+        cached_docs = {} if (force_regenerate and wait_for_regeneration) else await get_cached_rubriques(passage, rubrique_numbers)
+        
+        semaphore = asyncio.Semaphore(STUDY_GENERATION_CONCURRENCY)
+        
+        async def resolve(rubrique_number: int):
+            rubrique_title = RUBRIQUE_TITLES.get(rubrique_number, "")
+            cached = cached_docs.get(rubrique_number)
+            if cached:
+                revalidating = revalidate_rubrique(passage, rubrique_number, rubrique_title, cached, force_regenerate)
+                return {
+                    "status": "success",
+                    "rubrique_number": rubrique_number,
+                    "rubrique_title": rubrique_title,
+                    "content": cached["content"],
+                    "api_used": "cache",
+                    "cached": True,
+                    "stale": revalidating,
+                    "revalidating": revalidating,
+                    "generated_at": cached.get("created_at")
+                }
+            try:
+                async with semaphore:
+                    (content, retry_stats), coalesced = await produce_rubrique(passage, rubrique_number, rubrique_title)
+                return {
+                    "status": "success",
+                    "rubrique_number": rubrique_number,
+                    "rubrique_title": rubrique_title,
+                    "content": content,
+                    "api_used": api_used_label(retry_stats),
+                    "cached": False,
+                    "coalesced": coalesced,
+                    "retries": retry_stats.retries
+                }
+            except Exception as e:
+                logging.error(f"❌ Rubrique {rubrique_number} de {passage} en échec: {e}")
+                return {
+                    "status": "error",
+                    "rubrique_number": rubrique_number,
+                    "rubrique_title": rubrique_title,
+                    "message": str(e)
+                }
         
-        # Upsert (update ou insert)
-        await db.rubriques_cache.update_one(
-            {"cache_key": cache_key},
-            {"$set": cache_doc},
-            upsert=True
+        rubriques = await asyncio.gather(*(resolve(n) for n in rubrique_numbers))
+        succeeded = [r for r in rubriques if r["status"] == "success"]
+        
+        content = "\n\n".join(
+            f"## Rubrique {r['rubrique_number']}: {r['rubrique_title']}\n\n{r['content']}" for r in succeeded
         )
         
         return {
-            "status": "success",
-            "content": content,
-            "rubrique_number": rubrique_number,
-            "rubrique_title": rubrique_title,
+            "status": "success" if succeeded else "error",
             "passage": passage,
-            "api_used": "gemini",
-            "cached": False
+            "content": content,
+            "rubriques": rubriques,
+            "cached_count": sum(1 for r in succeeded if r["cached"]),
+            "revalidating_count": sum(1 for r in succeeded if r.get("revalidating")),
+            "generated_count": sum(1 for r in succeeded if not r["cached"]),
+            "failed_count": len(rubriques) - len(succeeded),
+            "generation_time_seconds": round(time.time() - start_time, 2)
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+# ----- Jobs de génération asynchrones -----
+
+async def run_character_history_job(params: dict) -> dict:
+    """Job "character_history" : génère et met en cache l'histoire d'un personnage."""
+    character_name = params["character_name"]
+    mode = params.get("mode", "standard")
+    # Pas de contenu de secours : en cas d'échec, le job est retenté plus tard
+    (content, retry_stats, generation_time, word_count), coalesced = await generation_flights.do(
+        *character_history_generation(character_name, mode, params.get("previous_content", ""), use_bible_api_fallback=False)
+    )
+    return {
+        "content": content,
+        "api_used": api_used_label(retry_stats),
+        "word_count": word_count,
+        "character_name": character_name,
+        "mode": mode,
+        "generation_time_seconds": round(generation_time, 2),
+        "coalesced": coalesced,
+        "retries": retry_stats.retries
+    }
+
+async def run_rubrique_job(params: dict) -> dict:
+    """Job "rubrique" : génère et met en cache une rubrique d'un passage."""
+    passage = params["passage"]
+    rubrique_number = int(params["rubrique_number"])
+    rubrique_title = params.get("rubrique_title") or RUBRIQUE_TITLES.get(rubrique_number, "")
+    start_time = time.time()
+    (content, retry_stats), coalesced = await generation_flights.do(
+        *rubrique_generation(passage, rubrique_number, rubrique_title, use_bible_api_fallback=False)
+    )
+    return {
+        "content": content,
+        "api_used": api_used_label(retry_stats),
+        "word_count": len(content.split()),
+        "passage": display_passage(passage),
+        "rubrique_number": rubrique_number,
+        "rubrique_title": rubrique_title,
+        "generation_time_seconds": round(time.time() - start_time, 2),
+        "coalesced": coalesced,
+        "retries": retry_stats.retries
+    }
+
+generation_jobs.register("character_history", run_character_history_job)
+generation_jobs.register("rubrique", run_rubrique_job)
+
+def job_dedupe_key(kind: str, params: dict) -> str:
+    """Clé single-flight du job : deux soumissions identiques partagent le même job."""
+    if kind == "character_history":
+        return character_history_generation(
+            params["character_name"], params.get("mode", "standard"), params.get("previous_content", "")
+        )[0]
+    return f"rubriques:{rubrique_cache_key(params['passage'], int(params['rubrique_number']))}"
+
+async def submit_generation_job(kind: str, params: dict) -> dict:
+    job, deduplicated = await generation_jobs.submit(kind, params, job_dedupe_key(kind, params))
+    return {
+        "status": "success",
+        **job_view(job),
+        "deduplicated": deduplicated,
+        "poll_url": f"/api/jobs/{job['_id']}",
+        "stream_url": f"/api/jobs/{job['_id']}/stream"
+    }
+
+@api_router.post("/jobs")
+async def create_generation_job(request: dict):
+    """
+    Soumet une génération longue à la file de jobs et répond immédiatement.
+    Types : "character_history" (character_name, mode, previous_content),
+    "rubrique" (passage, rubrique_number, rubrique_title).
+    Le résultat est mis en cache même si le client se déconnecte.
+    """
+    try:
+        kind = request.get('kind', '')
+        params = request.get('params') or {}
+        if kind == "character_history" and not params.get('character_name'):
+            return {"status": "error", "message": "Nom du personnage manquant"}
+        if kind == "rubrique" and (not params.get('passage') or params.get('rubrique_number') not in RUBRIQUE_PROMPTS):
+            return {"status": "error", "message": "Passage ou numéro de rubrique invalide"}
+        if kind not in generation_jobs.kinds:
+            return {"status": "error", "message": f"Type de job inconnu: {kind}", "kinds": generation_jobs.kinds}
+        return await submit_generation_job(kind, params)
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@api_router.get("/jobs")
+async def generation_jobs_status():
+    """Nombre de jobs par statut + compteurs des workers de ce process."""
+    try:
+        return {"status": "success", "queue": await generation_jobs.counts(), "workers": generation_jobs.stats()}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+@api_router.get("/jobs/{job_id}")
+async def get_generation_job(job_id: str):
+    """Statut d'un job (polling) ; "result" est rempli une fois le job terminé."""
+    job = await generation_jobs.get(job_id)
+    if job is None:
+        return {"status": "error", "message": "Job introuvable ou expiré", "job_id": job_id}
+    return {"status": "success", **job_view(job)}
+
+# Intervalle de consultation du job pour le flux SSE
+JOB_STREAM_POLL_SECONDS = float(os.environ.get('JOB_STREAM_POLL_SECONDS', '2'))
+
+@api_router.get("/jobs/{job_id}/stream")
+async def stream_generation_job(job_id: str):
+    """
+    Flux SSE d'un job : événement "job" à chaque changement de statut, puis
+    "done" (avec le résultat) ou "failed". Se reconnecter reprend le suivi.
+    """
+    async def events():
+        last_status = None
+        waited = 0.0
+        while True:
+            job = await generation_jobs.get(job_id)
+            if job is None:
+                yield sse_event("error", {"message": "Job introuvable ou expiré", "job_id": job_id})
+                return
+            if job["status"] in ("done", "failed"):
+                yield sse_event(job["status"], job_view(job))
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                waited = 0.0
+                yield sse_event("job", job_view(job))
+            elif waited >= HEALTH_STREAM_KEEPALIVE:
+                waited = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(JOB_STREAM_POLL_SECONDS)
+            waited += JOB_STREAM_POLL_SECONDS
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 app.include_router(api_router)
 
@@ -2393,6 +3563,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def route_template(request: Request) -> str:
+    """Chemin déclaré de la route ("/api/jobs/{job_id}"), pour borner la cardinalité des labels."""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        endpoint = route_template(request)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=status)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Métriques du pipeline au format texte Prometheus (à scraper par process/worker)."""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -2400,6 +3596,92 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_cache_indexes():
+    """Crée les index des collections de cache (idempotent)."""
+    try:
+        await ensure_cache_indexes(db)
+    except Exception as e:
+        # Le serveur doit démarrer même si Mongo refuse la création d'index
+        logger.error(f"❌ Création des index de cache impossible: {e}")
+
+@app.on_event("startup")
+async def tag_unversioned_cache_entries():
+    """Marque les entrées antérieures au versionnement des prompts avec la version courante."""
+    try:
+        await prompt_versions.tag_unversioned(db)
+    except Exception as e:
+        logger.error(f"❌ Marquage des versions de prompts impossible: {e}")
+
+@app.on_event("startup")
+async def load_compression_dictionaries():
+    """Charge les dictionnaires zstd partagés (entraînés avec compression_dictionary.py)."""
+    try:
+        await content_codec.load_dictionaries(db)
+    except Exception as e:
+        logger.warning(f"⚠️  Dictionnaires zstd non chargés (compression sans dictionnaire): {e}")
+
+@app.on_event("startup")
+async def build_concordance_index():
+    """Construit l'index de concordance hors de la boucle d'événements."""
+    if not bible_corpus.available:
+        logger.warning("⚠️  Corpus local absent: /api/search-concordance indisponible")
+        return
+    try:
+        await asyncio.to_thread(concordance_index.build, bible_corpus.iter_verses())
+    except Exception as e:
+        logger.error(f"❌ Construction de l'index de concordance impossible: {e}")
+
+@app.on_event("startup")
+async def start_cache_invalidation_watcher():
+    """Éviction mémoire des invalidations lancées par les autres workers."""
+    cache_invalidator.start_watcher()
+
+@app.on_event("startup")
+async def start_generation_jobs():
+    """Index de la file de jobs puis démarrage des workers de ce process."""
+    try:
+        await generation_jobs.ensure_indexes()
+    except Exception as e:
+        logger.error(f"❌ Création des index de la file de jobs impossible: {e}")
+    generation_jobs.start()
+
+def adopt_shared_active_key(key_index: int):
+    """La clé active choisie par les autres workers devient la clé active de ce process."""
+    global current_gemini_key_index
+    if 0 <= key_index < len(GEMINI_KEYS):
+        current_gemini_key_index = key_index
+        health_monitor.set_active_key(key_index)
+
+@app.on_event("startup")
+async def start_gemini_clients():
+    """Crée le pool de clients LlmChat (une fois par process)."""
+    try:
+        gemini_clients.start()
+    except Exception as e:
+        logger.error(f"❌ Pool LlmChat non créé (création à la première requête): {e}")
+
+@app.on_event("startup")
+async def start_key_state():
+    """Charge l'état partagé des clés puis le rafraîchit périodiquement."""
+    try:
+        adopt_shared_active_key(await key_state.refresh())
+    except Exception as e:
+        logger.warning(f"⚠️  État partagé des clés non chargé ({key_state.store.backend}): {e}")
+    key_state.start(on_refresh=adopt_shared_active_key)
+
+@app.on_event("startup")
+async def start_health_monitor():
+    """Lance les sondes de santé en arrière-plan."""
+    health_monitor.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await health_monitor.stop()
+    await key_state.stop()
+    await generation_jobs.stop()
+    await cache_invalidator.stop()
+    client.close()
+    await gemini_http_client.aclose()
+    await bible_api_client.aclose()
+    bible_corpus.close()
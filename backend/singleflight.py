@@ -0,0 +1,142 @@
+"""
+Single-flight : fusionne les générations identiques en cours.
+
+Si deux utilisateurs ouvrent le même passage en même temps, les deux requêtes
+ratent le cache Mongo. Sans coalescing, chacune appelle Gemini pour la même
+clé de cache. Ici, la première requête lance la génération et les suivantes
+attendent le même futur partagé.
+
+La génération tourne dans sa propre tâche : si le client qui l'a lancée se
+déconnecte, les autres appelants reçoivent quand même le résultat (et le cache
+est quand même rempli).
+
+`spawn` lance la même génération en arrière-plan sans l'attendre
+(stale-while-revalidate) : une requête qui arrive pendant la régénération
+partage la tâche déjà en vol.
+
+`stream` est la variante des endpoints SSE : même clé et même tâche que `do`,
+mais l'appelant qui lance la génération reçoit aussi les morceaux de texte au
+fil de l'eau. Les appelants fusionnés (stream ou non) attendent le résultat final.
+"""
+
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+
+class FlightStream:
+    """Abonnement à une génération en vol : morceaux (premier appelant uniquement) puis résultat."""
+
+    def __init__(self, task: asyncio.Task, queue: Optional[asyncio.Queue], shared: bool):
+        self._task = task
+        self._queue = queue
+        self.shared = shared
+
+    async def chunks(self) -> AsyncIterator[str]:
+        """Morceaux émis par la génération ; vide pour un appelant fusionné."""
+        if self._queue is None:
+            return
+        while True:
+            chunk = await self._queue.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    async def result(self):
+        """Résultat final (lève l'exception de la génération en cas d'échec)."""
+        return await asyncio.shield(self._task)
+
+
+class SingleFlight:
+    """Une seule exécution en vol par clé ; les autres appelants partagent le résultat."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.coalesced_by_namespace: Dict[str, int] = {}
+        self._background: Set[str] = set()
+        self.background_started = 0
+        self.background_failed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]) -> Tuple[object, bool]:
+        """
+        Exécute `fn()` une seule fois pour `key`.
+        Retourne (résultat, shared) où shared=True si l'appelant a été fusionné.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count_coalesced(key)
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        self.executions += 1
+        task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task), False
+
+    def stream(self, key: str, fn: Callable[[Callable[[str], None]], Awaitable]) -> FlightStream:
+        """
+        Comme `do`, pour une génération streamée : `fn(emit)` appelle emit(morceau)
+        à chaque morceau reçu et retourne le même résultat que la version bloquante.
+        La génération continue si l'abonné se déconnecte : le cache est quand même rempli.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count_coalesced(key)
+            return FlightStream(task, None, True)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        task = asyncio.ensure_future(fn(queue.put_nowait))
+        self._inflight[key] = task
+        self.executions += 1
+        task.add_done_callback(lambda t: self._finish(key, t))
+        # Fin des morceaux, en succès comme en échec
+        task.add_done_callback(lambda t: queue.put_nowait(None))
+        return FlightStream(task, queue, False)
+
+    def spawn(self, key: str, fn: Callable[[], Awaitable]) -> bool:
+        """
+        Lance `fn()` en arrière-plan pour `key`, sans attendre le résultat.
+        Retourne False si une exécution est déjà en vol pour cette clé.
+        """
+        if key in self._inflight:
+            return False
+        task = asyncio.ensure_future(fn())
+        self._inflight[key] = task
+        self._background.add(key)
+        self.executions += 1
+        self.background_started += 1
+        task.add_done_callback(lambda t: self._finish(key, t))
+        logging.info(f"♻️  Régénération en arrière-plan: {key}")
+        return True
+
+    def _count_coalesced(self, key: str):
+        self.coalesced += 1
+        namespace = key.split(":", 1)[0]
+        self.coalesced_by_namespace[namespace] = self.coalesced_by_namespace.get(namespace, 0) + 1
+        logging.info(f"🔗 Génération fusionnée avec une requête identique en cours: {key}")
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        background = key in self._background
+        self._background.discard(key)
+        # Marquer l'exception comme lue même si tous les appelants ont disparu
+        if not task.cancelled() and task.exception() is not None and background:
+            self.background_failed += 1
+            logging.warning(f"⚠️  Régénération en arrière-plan en échec ({key}): {task.exception()}")
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        return {
+            "executions": self.executions,
+            "coalesced_callers": self.coalesced,
+            "coalesced_by_collection": dict(self.coalesced_by_namespace),
+            "in_flight": self.in_flight(),
+            "background_started": self.background_started,
+            "background_failed": self.background_failed,
+            "background_in_flight": len(self._background),
+        }
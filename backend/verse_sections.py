@@ -0,0 +1,43 @@
+"""
+Cache verset par verset de l'étude "verset par verset".
+
+Les réponses Gemini sont découpées en sections `**VERSET n**` et chaque verset
+est stocké séparément dans `verses_cache` (clé "<chapitre canonique>_<n>_<n>",
+ex: "GEN.1_3_3").
+Une plage demandée est recomposée depuis les versets déjà générés : seuls les
+versets manquants sont envoyés à Gemini, regroupés en plages contiguës.
+Genèse 1:1-5 puis Genèse 1:3-7 ne coûtent plus qu'une génération pour 6-7.
+"""
+
+from typing import Dict, List, Tuple
+
+from gemini_stream import VerseSectionSplitter
+
+
+def verse_cache_key(chapter_key: str, verse: int) -> str:
+    """Clé d'un verset seul, au format des clés de plage `<passage>_<début>_<fin>`."""
+    return f"{chapter_key}_{verse}_{verse}"
+
+
+def split_verse_sections(content: str) -> Dict[int, str]:
+    """{verset: section `**VERSET n** ...`} d'une réponse complète."""
+    splitter = VerseSectionSplitter()
+    sections = dict(splitter.feed(content))
+    sections.update(splitter.flush())
+    return sections
+
+
+def compose_verse_sections(sections: List[str]) -> str:
+    """Recompose une étude au format généré par Gemini ("---" puis chaque verset)."""
+    return "\n\n".join(f"---\n\n{section}" for section in sections)
+
+
+def missing_verse_runs(verses: List[int]) -> List[Tuple[int, int]]:
+    """Regroupe des numéros de versets en plages contiguës : [1, 2, 3, 6, 7] -> [(1, 3), (6, 7)]."""
+    runs: List[Tuple[int, int]] = []
+    for verse in sorted(verses):
+        if runs and verse == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], verse)
+        else:
+            runs.append((verse, verse))
+    return runs
@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { subscribeToHealth } from './healthStream';
 
 const ApiControlPanel = ({ backendUrl }) => {
   const [isOpen, setIsOpen] = useState(false);
@@ -30,6 +31,20 @@ const ApiControlPanel = ({ backendUrl }) => {
   const [showHistory, setShowHistory] = useState(false);
   const [showTooltip, setShowTooltip] = useState(false);
 
+  const applyHealthData = (healthData) => {
+    // Utiliser directement les données du backend
+    const adaptedStatus = {
+      timestamp: healthData.timestamp || new Date().toISOString(),
+      apis: healthData.apis || {},
+      call_history: [],
+      active_api: healthData.current_key || 'gemini_1'
+    };
+    
+    setApiStatus(adaptedStatus);
+    setLastUpdate(new Date().toLocaleTimeString());
+    console.log('[API STATUS] Mise à jour réussie');
+  };
+
   // Fonction pour récupérer le statut des API
   const fetchApiStatus = async () => {
     try {
@@ -41,18 +56,7 @@ const ApiControlPanel = ({ backendUrl }) => {
       if (response.ok) {
         const healthData = await response.json();
         console.log('[API STATUS] Données reçues:', healthData);
-        
-        // Utiliser directement les données du backend
-        const adaptedStatus = {
-          timestamp: healthData.timestamp || new Date().toISOString(),
-          apis: healthData.apis || {},
-          call_history: [],
-          active_api: healthData.current_key || 'gemini_1'
-        };
-        
-        setApiStatus(adaptedStatus);
-        setLastUpdate(new Date().toLocaleTimeString());
-        console.log('[API STATUS] Mise à jour réussie');
+        applyHealthData(healthData);
       } else {
         console.error('[API STATUS] Réponse non-OK:', response.status);
         // Afficher un état d'erreur
@@ -103,19 +107,10 @@ const ApiControlPanel = ({ backendUrl }) => {
     }
   };
 
-  // Mise à jour toutes les 30 secondes
+  // Statut poussé par SSE (/api/health/stream), polling uniquement en secours
   useEffect(() => {
-    // Première récupération
-    fetchApiStatus();
     fetchApiHistory();
-    
-    // Mise à jour automatique toutes les 30 secondes
-    const interval = setInterval(() => {
-      fetchApiStatus();
-      fetchApiHistory();
-    }, 30000);
-    
-    return () => clearInterval(interval);
+    return subscribeToHealth(backendUrl, applyHealthData, fetchApiStatus);
   }, [backendUrl]);
 
   // Fonction pour obtenir la couleur LED selon le quota
@@ -0,0 +1,47 @@
+/* =========================
+   Statut des API poussé par le serveur (SSE)
+   /api/health/stream envoie le snapshot à la connexion puis seulement lors
+   d'une transition (LED qui change, rotation de clé). Si EventSource n'est
+   pas disponible ou que le flux tombe, on repasse au polling de /api/health.
+========================= */
+
+const FALLBACK_POLL_MS = 10000;
+
+export function subscribeToHealth(backendUrl, onHealth, poll) {
+  let source = null;
+  let pollTimer = null;
+
+  const startPolling = () => {
+    if (pollTimer) return;
+    poll();
+    pollTimer = setInterval(poll, FALLBACK_POLL_MS);
+  };
+
+  const stopPolling = () => {
+    if (pollTimer) {
+      clearInterval(pollTimer);
+      pollTimer = null;
+    }
+  };
+
+  if (typeof window !== "undefined" && window.EventSource) {
+    source = new EventSource(`${backendUrl}/api/health/stream`);
+    source.addEventListener("health", (event) => {
+      try {
+        onHealth(JSON.parse(event.data));
+      } catch (e) {
+        console.error("[API STATUS] Événement SSE invalide:", e);
+      }
+      stopPolling();
+    });
+    // EventSource se reconnecte tout seul ; on poll en attendant
+    source.onerror = () => startPolling();
+  } else {
+    startPolling();
+  }
+
+  return () => {
+    if (source) source.close();
+    stopPolling();
+  };
+}
@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react';
+import { subscribeToHealth } from './healthStream';
 
 const ApiControlPanel = ({ backendUrl }) => {
   const [isOpen, setIsOpen] = useState(false);
@@ -21,23 +22,25 @@ const ApiControlPanel = ({ backendUrl }) => {
   const [showTooltip, setShowTooltip] = useState(false);
 
   // Fonction pour récupérer le statut des API
+  const applyHealthData = (healthData) => {
+    // Utiliser directement les données du backend
+    const adaptedStatus = {
+      timestamp: healthData.timestamp || new Date().toISOString(),
+      apis: healthData.apis || {},
+      call_history: [],
+      active_api: healthData.current_key || 'gemini_1'
+    };
+    
+    setApiStatus(adaptedStatus);
+    setLastUpdate(new Date().toLocaleTimeString());
+    console.log('[API STATUS] Mise à jour:', adaptedStatus);
+  };
+
   const fetchApiStatus = async () => {
     try {
       const response = await fetch(`${backendUrl}/api/health`);
       if (response.ok) {
-        const healthData = await response.json();
-        
-        // Utiliser directement les données du backend
-        const adaptedStatus = {
-          timestamp: healthData.timestamp || new Date().toISOString(),
-          apis: healthData.apis || {},
-          call_history: [],
-          active_api: healthData.current_key || 'gemini_1'
-        };
-        
-        setApiStatus(adaptedStatus);
-        setLastUpdate(new Date().toLocaleTimeString());
-        console.log('[API STATUS] Mise à jour:', adaptedStatus);
+        applyHealthData(await response.json());
       }
     } catch (error) {
       console.error('[API STATUS] Erreur:', error);
@@ -66,19 +69,10 @@ const ApiControlPanel = ({ backendUrl }) => {
     }
   };
 
-  // Mise à jour toutes les 30 secondes
+  // Statut poussé par SSE (/api/health/stream), polling uniquement en secours
   useEffect(() => {
-    // Première récupération
-    fetchApiStatus();
     fetchApiHistory();
-    
-    // Mise à jour automatique toutes les 30 secondes
-    const interval = setInterval(() => {
-      fetchApiStatus();
-      fetchApiHistory();
-    }, 30000);
-    
-    return () => clearInterval(interval);
+    return subscribeToHealth(backendUrl, applyHealthData, fetchApiStatus);
   }, [backendUrl]);
 
   // Fonction pour obtenir la couleur LED selon le quota
@@ -0,0 +1,80 @@
+import asyncio
+import zipfile
+
+from bible_books import BOOKS_BY_ID
+from bible_corpus import BibleCorpus
+from build_lsg_corpus import check_corpus, load_usfm, main, parse_usfm, write_corpus
+from concordance import ConcordanceIndex
+
+
+GENESIS_USFM = r"""\id GEN Louis Segond 1910
+\h Genèse
+\mt1 Genèse
+\c 1
+\s1 La création
+\p
+\v 1 Au commencement, Dieu créa les cieux et la terre.
+\v 2 La terre était informe et vide: il y avait des ténèbres à la surface de l'abîme,
+\q1 et l'esprit de Dieu se mouvait au-dessus des eaux.
+\p \v 3 Dieu dit: \wj Que la lumière soit!\wj*\f + \fr 1.3 \ft note\f* Et la lumière fut.
+\c 2
+\v 1 Ainsi furent achevés les cieux et la terre, et toute leur armée.
+"""
+
+JUDE_USFM = r"""\id JUD
+\c 1
+\v 1-2 Jude, serviteur de Jésus Christ, \w frère|strong="G80"\w* de Jacques,
+\v 3 Bien-aimés, comme je désirais vivement vous écrire au sujet de notre salut commun,
+"""
+
+
+def test_parse_usfm_strips_markup_and_joins_lines():
+    verses = parse_usfm(GENESIS_USFM)
+
+    assert verses[("GEN", 1, 1)] == "Au commencement, Dieu créa les cieux et la terre."
+    assert verses[("GEN", 1, 2)].endswith("l'esprit de Dieu se mouvait au-dessus des eaux.")
+    assert verses[("GEN", 1, 3)] == "Dieu dit: Que la lumière soit! Et la lumière fut."
+    assert ("GEN", 2, 1) in verses
+
+
+def test_parse_usfm_grouped_verses_and_word_attributes():
+    verses = parse_usfm(JUDE_USFM)
+
+    assert verses[("JUD", 1, 1)] == "Jude, serviteur de Jésus Christ, frère de Jacques,"
+    assert ("JUD", 1, 3) in verses
+
+
+def test_build_from_zip_is_readable_by_corpus_and_concordance(tmp_path):
+    archive = tmp_path / "lsg_usfm.zip"
+    with zipfile.ZipFile(archive, "w") as out:
+        out.writestr("02-GENfraLSG.usfm", GENESIS_USFM)
+        out.writestr("66-JUDfraLSG.usfm", JUDE_USFM)
+        out.writestr("00-FRTfraLSG.usfm", "\\id FRT\n\\c 1\n\\v 1 Préface\n")
+    output = tmp_path / "lsg.tsv"
+
+    assert write_corpus(load_usfm(str(archive)), str(output)) == 6
+
+    corpus = BibleCorpus.load(str(output))
+    try:
+        assert corpus.available
+        assert corpus.chapter_length("GEN", 1) == 3
+        assert corpus.verse("GEN", 1, 1).startswith("Au commencement")
+        assert corpus.stats()["unknown_books"] == []
+        index = ConcordanceIndex()
+        index.build(corpus.iter_verses())
+        assert index.search("lumière")["total"] >= 1
+    finally:
+        corpus.close()
+
+    # Seuls la Genèse (2 chapitres sur 50) et Jude sont présents
+    assert check_corpus(str(output), [BOOKS_BY_ID["JUD"]]) == []
+    assert check_corpus(str(output), [BOOKS_BY_ID["GEN"]]) == ["GEN: 48 chapitre(s) manquant(s) (ex: 3)"]
+
+
+def test_cli_reports_incomplete_corpus(tmp_path):
+    source = tmp_path / "usfm"
+    source.mkdir()
+    (source / "GEN.usfm").write_text(GENESIS_USFM, encoding="utf-8")
+
+    assert asyncio.run(main(["usfm", str(source), "--output", str(tmp_path / "lsg.tsv")])) == 1
+    assert (tmp_path / "lsg.tsv").exists()
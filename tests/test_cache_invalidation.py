@@ -0,0 +1,151 @@
+import asyncio
+import re
+from types import SimpleNamespace
+
+from cache_invalidation import CacheInvalidator, InvalidationFilter, canonical_cache_key
+from generation_cache import GenerationCache, MemoryCache
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, branch) for branch in condition):
+                return False
+            continue
+        value = doc.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        for operator, operand in condition.items():
+            if operator == "$regex" and not re.search(operand, value or ""):
+                return False
+            if operator == "$not" and operand.search(value or ""):
+                return False
+            if operator == "$gt" and not value > operand:
+                return False
+            if operator == "$gte" and not value >= operand:
+                return False
+            if operator == "$ne" and value == operand:
+                return False
+            if operator == "$in" and value not in operand:
+                return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+    def __aiter__(self):
+        async def iterate():
+            for doc in self.docs:
+                yield doc
+        return iterate()
+
+
+class FakeCollection:
+    """Sous-ensemble de l'API Motor utilisé par CacheInvalidator et GenerationCache."""
+
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(doc) for doc in self.docs if _matches(doc, query)])
+
+    async def find_one(self, query, projection=None):
+        return next((dict(doc) for doc in self.docs if _matches(doc, query)), None)
+
+    async def count_documents(self, query):
+        return sum(1 for doc in self.docs if _matches(doc, query))
+
+    async def delete_many(self, query):
+        kept = [doc for doc in self.docs if not _matches(doc, query)]
+        deleted, self.docs = len(self.docs) - len(kept), kept
+        return SimpleNamespace(deleted_count=deleted)
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def update_one(self, query, update, upsert=False):
+        target = next((d for d in self.docs if _matches(d, query)), None)
+        if target is None and upsert:
+            target = dict(query)
+            self.docs.append(target)
+        if target is not None:
+            target.update(update.get("$set", {}))
+
+
+def test_canonical_cache_key_reads_legacy_keys():
+    assert canonical_cache_key("Genèse 1_3") == "GEN.1_3"
+    assert canonical_cache_key("Genèse 1_1_5") == "GEN.1_1_5"
+    assert canonical_cache_key("GEN.1.3-5_3") == "GEN.1.3-5_3"
+
+
+def test_book_invalidation_deletes_legacy_entries():
+    rubriques = FakeCollection([
+        {"cache_key": "Genèse 1_3", "passage": "Genèse 1", "rubrique_number": 3, "content": "ancien"},
+        {"cache_key": "GEN.1_4", "passage": "Genèse 1", "rubrique_number": 4, "content": "récent"},
+        {"cache_key": "Exode 1_3", "passage": "Exode 1", "rubrique_number": 3, "content": "autre livre"},
+        {"cache_key": "Genèse 2_3", "passage": "Genèse 2", "rubrique_number": 3, "content": "hors plage"},
+    ])
+    verses = FakeCollection([
+        {"cache_key": "Genèse 1_1_5", "passage": "Genèse 1", "content": "ancien"},
+        {"cache_key": "EXO.1_1_1", "passage": "Exode 1", "content": "autre livre"},
+    ])
+    stores = {
+        "rubriques_cache": GenerationCache(rubriques, "rubriques_cache", MemoryCache(1 << 20, 60)),
+        "verses_cache": GenerationCache(verses, "verses_cache", MemoryCache(1 << 20, 60)),
+    }
+
+    async def scenario():
+        # Entrée ancienne déjà chargée en mémoire par une lecture précédente
+        await stores["rubriques_cache"].get("Genèse 1_3")
+        invalidator = CacheInvalidator(FakeCollection(), stores, pause_seconds=0)
+        task = await invalidator.start(InvalidationFilter(book_id="GEN", chapter_from=1, chapter_to=1),
+                                       ["rubriques_cache", "verses_cache"])
+        await invalidator._tasks[task["_id"]]
+        return await stores["rubriques_cache"].get("Genèse 1_3")
+
+    assert asyncio.run(scenario()) is None
+    assert sorted(doc["cache_key"] for doc in rubriques.docs) == ["Exode 1_3", "Genèse 2_3"]
+    assert [doc["cache_key"] for doc in verses.docs] == ["EXO.1_1_1"]
+
+
+def test_recorded_clear_is_evicted_by_other_workers():
+    docs = [
+        {"cache_key": "GEN.1_3", "passage": "Genèse 1", "rubrique_number": 3, "content": "effacé"},
+        {"cache_key": "EXO.1_3", "passage": "Exode 1", "rubrique_number": 3, "content": "gardé"},
+    ]
+    invalidations = FakeCollection()
+
+    def worker(worker_id):
+        store = GenerationCache(FakeCollection(docs), "rubriques_cache", MemoryCache(1 << 20, 60))
+        invalidator = CacheInvalidator(invalidations, {"rubriques_cache": store}, watch_seconds=0.01)
+        invalidator.worker_id = worker_id
+        return store, invalidator
+
+    async def scenario():
+        (store_a, invalidator_a), (store_b, invalidator_b) = worker("a"), worker("b")
+        for store in (store_a, store_b):
+            await store.get_many(["GEN.1_3", "EXO.1_3"])
+        invalidator_b.start_watcher()
+        await invalidator_a.record(InvalidationFilter(passages=["Genèse 1"]), ["rubriques_cache"],
+                                   {"rubriques_cache": 1})
+        await asyncio.sleep(0.05)
+        await invalidator_b.stop()
+        return [(store.memory.get("GEN.1_3"), store.memory.get("EXO.1_3") is not None)
+                for store in (store_a, store_b)]
+
+    assert asyncio.run(scenario()) == [(None, True), (None, True)]
@@ -0,0 +1,84 @@
+import asyncio
+import random
+
+import pytest
+
+zstandard = pytest.importorskip("zstandard")
+
+from content_codec import DICTIONARIES_COLLECTION, ContentCodec, train_dictionary
+
+
+WORDS = ("Dieu", "alliance", "grâce", "foi", "Israël", "prophète", "royaume", "salut", "loi", "peuple",
+         "## Introduction", "## Contexte historique", "**Verset**", "théologie", "Christ", "esprit")
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def __aiter__(self):
+        async def iterate():
+            for doc in self.docs:
+                yield doc
+        return iterate()
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+        self.lookups = 0
+
+    def find(self, *args):
+        return FakeCursor(list(self.docs))
+
+    async def find_one(self, query, projection=None):
+        self.lookups += 1
+        return next((doc for doc in self.docs if doc["dict_id"] == query["dict_id"]), None)
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.append(update["$set"])
+
+
+def sample_markdown(seed: int) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(400))
+
+
+def test_unknown_dictionary_is_loaded_on_demand():
+    db = {DICTIONARIES_COLLECTION: FakeCollection()}
+
+    async def scenario():
+        old_worker = ContentCodec()
+        await old_worker.load_dictionaries(db)
+
+        # Un worker redémarré après `compression_dictionary.py train` écrit avec le nouveau dictionnaire
+        new_worker = ContentCodec()
+        await new_worker.store_dictionary(db, train_dictionary([sample_markdown(i) for i in range(300)], 16 * 1024), 300)
+        doc = new_worker.encode({"cache_key": "GEN.1_1", "content": sample_markdown(1000)})
+        assert doc["content_dict_id"] == new_worker.dict_id != 0
+
+        assert old_worker.decode(doc) is None
+        decoded = await old_worker.decode_loading(doc)
+        assert decoded["content"] == sample_markdown(1000)
+        assert old_worker.stats()["loaded_on_demand"] == 1
+        # Écritures inchangées dans l'ancien worker
+        assert old_worker.dict_id == 0
+
+    asyncio.run(scenario())
+
+
+def test_missing_dictionary_is_not_looked_up_on_every_read():
+    db = {DICTIONARIES_COLLECTION: FakeCollection()}
+
+    async def scenario():
+        codec = ContentCodec()
+        await codec.load_dictionaries(db)
+        doc = {"cache_key": "GEN.1_1", "content_z": b"\x28\xb5\x2f\xfd", "content_dict_id": 12345}
+        assert await codec.decode_loading(doc) is None
+        assert await codec.decode_loading(doc) is None
+        assert db[DICTIONARIES_COLLECTION].lookups == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,83 @@
+import asyncio
+
+from pymongo.errors import DuplicateKeyError
+
+from gemini_backoff import KeyCooldowns
+from gemini_scheduler import GeminiKeyScheduler
+from key_state import MongoKeyStateStore, SharedKeyState
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(field)
+            if "$ne" in condition and value == condition["$ne"]:
+                return False
+            if "$lt" in condition and not (value is not None and value < condition["$lt"]):
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class FakeKeyStateCollection:
+    """
+    find_one_and_update limité au pipeline de réservation de MongoKeyStateStore.
+    Comme Mongo, un upsert concurrent dont le filtre n'est pas une égalité simple
+    perd la course avec une DuplicateKeyError (pas de nouvelle tentative serveur).
+    """
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one_and_update(self, query, pipeline, upsert=False, return_document=None):
+        doc = self.docs.get(query["_id"])
+        if doc is None or not _matches(doc, query):
+            if not upsert:
+                return None
+            # Laisse les autres workers passer la lecture avant l'insertion
+            await asyncio.sleep(0)
+            if query["_id"] in self.docs:
+                raise DuplicateKeyError("E11000 duplicate key error")
+            doc = {"_id": query["_id"]}
+            self.docs[query["_id"]] = doc
+        stage = pipeline[0]["$set"]
+        doc["daily_used"] = doc["daily_used"] + 1 if doc.get("quota_day") == stage["quota_day"] else 1
+        doc["key_index"] = stage["key_index"]
+        doc["quota_day"] = stage["quota_day"]
+        return dict(doc)
+
+
+def _shared_state(store, daily_budget=50):
+    scheduler = GeminiKeyScheduler(1, requests_per_minute=60, daily_budget=daily_budget)
+    return SharedKeyState(store, scheduler, KeyCooldowns(), {0: 0})
+
+
+def test_concurrent_first_reservation_does_not_exhaust_the_key():
+    async def scenario():
+        collection = FakeKeyStateCollection()
+        workers = [_shared_state(MongoKeyStateStore(collection, 1)) for _ in range(3)]
+        granted = await asyncio.gather(*(worker.reserve(0) for worker in workers))
+        return granted, workers, collection
+
+    granted, workers, collection = asyncio.run(scenario())
+    assert granted == [True, True, True]
+    assert all(worker.is_available(0) and worker.refusals == 0 for worker in workers)
+    assert collection.docs["gemini_0"]["daily_used"] == 3
+
+
+def test_spent_shared_budget_is_still_refused():
+    async def scenario():
+        collection = FakeKeyStateCollection()
+        worker = _shared_state(MongoKeyStateStore(collection, 1), daily_budget=1)
+        first = await worker.reserve(0)
+        second = await worker.reserve(0)
+        return first, second, worker
+
+    first, second, worker = asyncio.run(scenario())
+    assert (first, second) == (True, False)
+    assert not worker.is_available(0)
+    assert worker.refusals == 1
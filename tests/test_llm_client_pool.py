@@ -0,0 +1,55 @@
+import asyncio
+
+from llm_client_pool import LlmClientPool
+
+
+class FakeLlmChat:
+    """Garde l'historique de sa session, comme LlmChat, et enregistre chaque payload envoyé."""
+
+    payloads = []
+
+    def __init__(self, session_id: str, system_message: str):
+        self.session_id = session_id
+        self._history = [{"role": "system", "content": system_message}]
+
+    async def send_message(self, text: str):
+        self._history.append({"role": "user", "content": text})
+        FakeLlmChat.payloads.append(list(self._history))
+        self._history.append({"role": "assistant", "content": "Amen"})
+        return "Amen"
+
+
+def test_second_call_on_a_pooled_client_sends_only_system_and_new_prompt():
+    FakeLlmChat.payloads = []
+    pool = LlmClientPool(lambda key_index, session_id: FakeLlmChat(session_id, "Tu es un expert biblique."), 1, size=1)
+
+    async def scenario():
+        async with pool.client(0) as chat:
+            await chat.send_message("Genèse 1")
+        async with pool.client(0) as chat:
+            await chat.send_message("Jean 3")
+
+    asyncio.run(scenario())
+    assert FakeLlmChat.payloads[1] == [
+        {"role": "system", "content": "Tu es un expert biblique."},
+        {"role": "user", "content": "Jean 3"},
+    ]
+    assert pool.stats()["borrowed"] == 2
+
+
+def test_client_is_replaced_after_an_error():
+    pool = LlmClientPool(lambda key_index, session_id: FakeLlmChat(session_id, "système"), 1, size=1)
+
+    async def scenario():
+        try:
+            async with pool.client(0) as chat:
+                await chat.send_message("prompt en échec")
+                raise RuntimeError("429 RESOURCE_EXHAUSTED")
+        except RuntimeError:
+            pass
+        async with pool.client(0) as chat:
+            return chat._history, pool.in_use(0)
+
+    history, in_use = asyncio.run(scenario())
+    assert history == [{"role": "system", "content": "système"}]
+    assert in_use == 1
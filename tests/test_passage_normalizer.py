@@ -0,0 +1,70 @@
+import pytest
+
+from passage_normalizer import display_passage, parse_passage, passage_cache_key, resolve_book
+
+
+@pytest.mark.parametrize("text", ["Genèse 1", "genese 1", "Gn 1", "Gen. 1", "Genèse  1", "GEN 1", "Genesis 1"])
+def test_spellings_of_a_chapter_share_one_key(text):
+    assert passage_cache_key(text) == "GEN.1"
+    assert display_passage(text) == "Genèse 1"
+
+
+@pytest.mark.parametrize("text, cache_key, display", [
+    ("Gn 1:3-5", "GEN.1.3-5", "Genèse 1:3-5"),
+    ("gn 1.3", "GEN.1.3", "Genèse 1:3"),
+    ("Ps 23.1-4", "PSA.23.1-4", "Psaumes 23:1-4"),
+    ("Ps 23 v 1", "PSA.23.1", "Psaumes 23:1"),
+    ("Jean 3:16–18", "JHN.3.16-18", "Jean 3:16-18"),
+    ("Jean 3:16 à 18", "JHN.3.16-18", "Jean 3:16-18"),
+    ("Jean 3:16-16", "JHN.3.16", "Jean 3:16"),
+])
+def test_verse_ranges(text, cache_key, display):
+    assert parse_passage(text).cache_key == cache_key
+    assert parse_passage(text).display == display
+
+
+@pytest.mark.parametrize("text, book_id", [
+    ("1 Jean 3", "1JN"),
+    ("I Jean 3", "1JN"),
+    ("1er Jean 3", "1JN"),
+    ("Première épître de Jean 3", "1JN"),
+    ("III Jean 1", "3JN"),
+    ("2 Rois 3", "2KI"),
+    ("Évangile selon Jean 3", "JHN"),
+    ("Cantique des cantiques 2", "SNG"),
+    ("Apocalypse 22", "REV"),
+    ("Ap 22", "REV"),
+])
+def test_numbered_and_long_book_names(text, book_id):
+    assert parse_passage(text).book.book_id == book_id
+
+
+@pytest.mark.parametrize("text, cache_key, display", [
+    ("Jude 3", "JUD.1.3", "Jude 1:3"),
+    ("Jude 3-5", "JUD.1.3-5", "Jude 1:3-5"),
+    ("Jude 1-4", "JUD.1.1-4", "Jude 1:1-4"),
+    ("Philémon 4", "PHM.1.4", "Philémon 1:4"),
+    ("2 Jean 5", "2JN.1.5", "2 Jean 1:5"),
+    ("Abdias 1:2", "OBA.1.2", "Abdias 1:2"),
+    ("Jude 1", "JUD.1", "Jude 1"),
+])
+def test_single_chapter_books_accept_verse_only_references(text, cache_key, display):
+    passage = parse_passage(text)
+    assert passage.cache_key == cache_key
+    assert passage.display == display
+
+
+@pytest.mark.parametrize("text", ["", "Gn", "Gn 51", "Gn 0", "Gn 1:0", "Gn 1:5-3", "Gn 1-3", "Xyz 1", "1 2"])
+def test_invalid_references(text):
+    assert parse_passage(text) is None
+
+
+def test_unrecognized_input_is_only_folded():
+    assert passage_cache_key("Sermon  sur la Montagne") == "sermon sur la montagne"
+    assert display_passage("  Sermon  sur la Montagne ") == "Sermon sur la Montagne"
+
+
+def test_resolve_book():
+    assert resolve_book("Ésaïe").book_id == "ISA"
+    assert resolve_book("esaie").book_id == "ISA"
+    assert resolve_book("inconnu") is None
@@ -0,0 +1,79 @@
+import asyncio
+
+from singleflight import SingleFlight
+
+
+def test_stream_coalesces_on_the_blocking_flight_key():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def produce(emit=None):
+            calls.append(emit is not None)
+            if emit:
+                emit("Au commencement, ")
+                emit("Dieu créa")
+            await release.wait()
+            return "Au commencement, Dieu créa", "stats"
+
+        leader = flights.stream("rubriques:genese_1_1", produce)
+        follower = flights.stream("rubriques:genese_1_1", produce)
+        blocking = asyncio.ensure_future(flights.do("rubriques:genese_1_1", produce))
+        await asyncio.sleep(0)
+        release.set()
+
+        chunks = [chunk async for chunk in leader.chunks()]
+        follower_chunks = [chunk async for chunk in follower.chunks()]
+        return (calls, chunks, follower_chunks, await leader.result(), await follower.result(),
+                follower.shared, await blocking, flights.stats())
+
+    calls, chunks, follower_chunks, result, follower_result, shared, blocking, stats = asyncio.run(scenario())
+    assert calls == [True]
+    assert chunks == ["Au commencement, ", "Dieu créa"]
+    assert follower_chunks == []
+    assert result == follower_result == ("Au commencement, Dieu créa", "stats")
+    assert shared
+    assert blocking == (result, True)
+    assert stats["executions"] == 1
+    assert stats["coalesced_callers"] == 2
+    assert stats["in_flight"] == 0
+
+
+def test_stream_keeps_generating_after_the_subscriber_leaves():
+    async def scenario():
+        flights = SingleFlight()
+        saved = []
+
+        async def produce(emit):
+            emit("morceau")
+            await asyncio.sleep(0.01)
+            saved.append("cache")
+            return "morceau", None
+
+        flight = flights.stream("verses:jean_3_16_16", produce)
+        chunks = flight.chunks()
+        assert await chunks.__anext__() == "morceau"
+        await chunks.aclose()
+        await flight.result()
+        return saved
+
+    assert asyncio.run(scenario()) == ["cache"]
+
+
+def test_stream_failure_ends_chunks_and_raises_on_result():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def produce(emit):
+            emit("début")
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+
+        flight = flights.stream("rubriques:x", produce)
+        chunks = [chunk async for chunk in flight.chunks()]
+        try:
+            await flight.result()
+        except RuntimeError as e:
+            return chunks, str(e), flights.in_flight()
+
+    assert asyncio.run(scenario()) == (["début"], "429 RESOURCE_EXHAUSTED", 0)